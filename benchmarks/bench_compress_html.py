@@ -0,0 +1,69 @@
+"""
+对比 utils.compress_html（单遍tokenizer）与旧的多遍正则压缩在内置模板上的耗时和压缩结果
+
+用法（项目根目录）：python benchmarks/bench_compress_html.py [重复次数]
+"""
+
+import glob
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from src.ai_auto_wxgzh.utils import utils  # noqa: E402
+from src.ai_auto_wxgzh.utils import html_tokenizer  # noqa: E402
+
+
+def compress_html_regex(content):
+    """旧实现：5次全文正则替换，会去掉文本和CSS值中有意义的空格"""
+    content = re.sub(r"<!--.*?-->", "", content, flags=re.DOTALL)
+    content = re.sub(r"[\n\t]+", "", content)
+    content = re.sub(r"\s+", " ", content)
+    content = re.sub(r"\s*([=><;,:])\s*", r"\1", content)
+    content = re.sub(r">\s+<", "><", content)
+    return content
+
+
+def compress_html_cold(content):
+    # 清空CSS压缩缓存，按首次压缩计时，与正则实现公平对比
+    html_tokenizer.minify_css.cache_clear()
+    return utils.compress_html(content)
+
+
+def bench(func, content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = func(content)
+    return (time.perf_counter() - start) / repeat * 1000, result
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    template_dir = os.path.join(utils.get_current_dir(), "knowledge/templates")
+    files = sorted(glob.glob(os.path.join(template_dir, "*.html")))
+    if not files:
+        print(f"在目录 '{template_dir}' 中未找到任何模板文件")
+        return
+
+    print(f"{'模板':<18}{'原始':>8}{'正则':>8}{'单遍':>8}{'正则ms':>9}{'单遍ms':>9}")
+    total_regex = total_single = 0.0
+    for path in files:
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+
+        regex_ms, regex_result = bench(compress_html_regex, content, repeat)
+        single_ms, single_result = bench(compress_html_cold, content, repeat)
+        total_regex += regex_ms
+        total_single += single_ms
+        print(
+            f"{os.path.basename(path):<18}{len(content):>8}{len(regex_result):>8}"
+            f"{len(single_result):>8}{regex_ms:>9.2f}{single_ms:>9.2f}"
+        )
+
+    print(f"{'合计':<42}{total_regex:>9.2f}{total_single:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
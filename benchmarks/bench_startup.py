@@ -0,0 +1,77 @@
+"""
+统计各启动路径的导入耗时：在子进程中用 python -X importtime 导入，输出总耗时和最耗时的包
+
+- 界面启动（time-to-window）：导入 gui.MainGUI，即创建主窗口前需要的全部模块
+- 命令行启动：导入 crew_main，即解析参数、加载配置前需要的全部模块
+- 首个任务（time-to-first-task）：再导入 crew 和 custom_tool，即开始执行 CrewAI 前需要的全部模块
+
+用法（项目根目录）：python benchmarks/bench_startup.py [重复次数] [显示的包数]
+"""
+
+import os
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+PATHS = [
+    ("界面启动", "import src.ai_auto_wxgzh.gui.MainGUI"),
+    ("命令行启动", "import src.ai_auto_wxgzh.crew_main"),
+    (
+        "首个任务",
+        "import src.ai_auto_wxgzh.crew_main, src.ai_auto_wxgzh.crew, "
+        "src.ai_auto_wxgzh.tools.custom_tool",
+    ),
+]
+
+
+def measure(code):
+    """返回 (进程耗时ms, 导入总耗时ms, {顶层包: 导入自身耗时ms})，导入失败时返回错误信息"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    if proc.returncode != 0:
+        return proc.stderr.strip().splitlines()[-1]
+
+    total_us = 0
+    packages = defaultdict(int)
+    for line in proc.stderr.splitlines():
+        # import time:  self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:") :].split("|")
+        if not name[1:].startswith(" "):  # 最外层导入，累计耗时之和即总耗时
+            total_us += int(cumulative_us)
+        packages[name.strip().split(".")[0]] += int(self_us)
+
+    return wall_ms, total_us / 1000, {name: us / 1000 for name, us in packages.items()}
+
+
+def main():
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 3
+    top = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+
+    for label, code in PATHS:
+        results = [measure(code) for _ in range(repeat)]
+        errors = [result for result in results if isinstance(result, str)]
+        if errors:
+            print(f"{label}：导入失败（{errors[0]}）\n")
+            continue
+
+        # 取进程耗时最短的一次，减少系统抖动的影响
+        wall_ms, total_ms, packages = min(results, key=lambda result: result[0])
+        print(f"{label}：进程 {wall_ms:.0f}ms，导入 {total_ms:.0f}ms")
+        for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]:
+            print(f"    {name:<24}{ms:>9.1f}ms")
+        print()
+
+
+if __name__ == "__main__":
+    main()
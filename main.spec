@@ -0,0 +1,65 @@
+# -*- mode: python ; coding: utf-8 -*-
+# PyInstaller 打包配置，在项目根目录执行：pyinstaller main.spec
+#
+# 为了加快启动，crewai、dashscope、bs4 等在首次使用时才导入（见 crew_main._crew 等），
+# 打包需要的模块在这里列出，不再在 main.py 中全部提前导入
+
+from PyInstaller.utils.hooks import collect_data_files, collect_submodules
+
+hiddenimports = [
+    # 延迟导入的本项目模块
+    "src.ai_auto_wxgzh.crew",
+    "src.ai_auto_wxgzh.tools.custom_tool",
+    "src.ai_auto_wxgzh.jobs.worker",
+    "src.ai_auto_wxgzh.jobs.scheduler",
+    # 延迟导入的第三方库
+    "bs4",
+    "lxml",
+    "dashscope",
+    "yaml",
+    "PySimpleGUI",
+]
+hiddenimports += collect_submodules("crewai")
+
+datas = [
+    # 配置、CrewAI agent/task 配置（CrewBase 按 crew.py 所在目录查找）
+    ("src/ai_auto_wxgzh/config/config.yaml", "."),
+    ("src/ai_auto_wxgzh/config/agents.yaml", "src/ai_auto_wxgzh/config"),
+    ("src/ai_auto_wxgzh/config/tasks.yaml", "src/ai_auto_wxgzh/config"),
+    # 界面资源、模板
+    ("src/ai_auto_wxgzh/gui/UI", "UI"),
+    ("knowledge", "knowledge"),
+]
+# crewai 的提示词翻译、litellm 的模型价格表等运行时读取的数据文件
+datas += collect_data_files("crewai")
+datas += collect_data_files("litellm")
+
+a = Analysis(
+    ["main.py"],
+    pathex=[],
+    binaries=[],
+    datas=datas,
+    hiddenimports=hiddenimports,
+    hookspath=[],
+    hooksconfig={},
+    runtime_hooks=[],
+    excludes=[],
+    noarchive=False,
+)
+pyz = PYZ(a.pure)
+
+exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.datas,
+    [],
+    name="ai_auto_wxgzh",
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    runtime_tmpdir=None,
+    console=False,
+    icon="src/ai_auto_wxgzh/gui/UI/icon.ico",
+)
@@ -1,6 +1,10 @@
 import os
 import yaml
 import threading
+from collections.abc import Mapping
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Any, Optional, Tuple
 from src.ai_auto_wxgzh.utils import comm
 from src.ai_auto_wxgzh.utils import utils
 
@@ -12,15 +16,192 @@ class IndentedDumper(yaml.SafeDumper):
         return super().increase_indent(flow, False)
 
 
+def _freeze(value):
+    """转换为只读结构：dict -> MappingProxyType，list -> tuple"""
+    if isinstance(value, dict):
+        return MappingProxyType({key: _freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    return value
+
+
+def _thaw(value):
+    """_freeze 的逆转换，返回可修改的副本"""
+    if isinstance(value, Mapping):
+        return {key: _thaw(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(item) for item in value]
+    return value
+
+
+def _pick(getter, default=None):
+    # 配置不完整（如缺少当前平台、索引越界）时返回默认值，由 validate_config 提示
+    try:
+        return getter()
+    except (KeyError, IndexError, TypeError):
+        return default
+
+
+_EMPTY = MappingProxyType({})
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigSnapshot:
+    """
+    一次加载/保存后的配置，各配置项在创建时解析一次，之后不可修改
+    Config 更新配置时整体替换快照，读取方不加锁，同一快照中的各项总是来自同一份配置
+    """
+
+    raw: Mapping[str, Any]
+    platforms: Tuple[Mapping[str, Any], ...]
+    wechat_credentials: Tuple[Mapping[str, Any], ...]
+    wechat_token_disk_cache: bool
+    wechat_media_cache: bool
+    api_type: Optional[str]
+    api_key_name: Optional[str]
+    api_key: Optional[str]
+    api_model: Optional[str]
+    api_apibase: Optional[str]
+    api_list: Tuple[str, ...]
+    agent_models: Mapping[str, Any]
+    img_api_type: Optional[str]
+    img_api_key: Optional[str]
+    img_api_model: Optional[str]
+    use_template: bool
+    need_auditor: bool
+    max_workers: int
+    publish_mode: str
+    hotnews_cache_ttl: int
+    hotnews_stale_ttl: int
+    hotnews_disk_cache: bool
+    hotnews_sources: Tuple[str, ...]
+    hotnews_source_timeout: float
+    hotnews_fetch_budget: float
+    topic_dedup_enabled: bool
+    topic_dedup_window_hours: float
+    topic_dedup_threshold: float
+    template_select_mode: str
+    template_token_budget: int
+    template_strip_content: bool
+    task_cache_enabled: bool
+    task_cache_ttl_hours: float
+    task_cache_max_entries: int
+    jobs_concurrency: int
+    jobs_lease_seconds: int
+    jobs_max_attempts: int
+    jobs_retry_delay: int
+    jobs_poll_interval: int
+    schedule: Mapping[str, Any]
+    schedule_check_interval: int
+
+    @classmethod
+    def from_dict(cls, config, default_config):
+        raw = _freeze(config)
+        wechat = raw.get("wechat") or _EMPTY
+        api = raw.get("api") or _EMPTY
+        api_current = _pick(lambda: api[api["api_type"]], _EMPTY)
+        img_api = raw.get("img_api") or _EMPTY
+        img_api_current = _pick(lambda: img_api[img_api["api_type"]], _EMPTY)
+        hotnews = raw.get("hotnews") or _EMPTY
+        topic_dedup = raw.get("topic_dedup") or _EMPTY
+        template = raw.get("template") or _EMPTY
+        task_cache = raw.get("task_cache") or _EMPTY
+        jobs = raw.get("jobs") or _EMPTY
+        schedule = raw.get("schedule") or _EMPTY
+
+        return cls(
+            raw=raw,
+            platforms=raw.get("platforms") or (),
+            wechat_credentials=wechat.get("credentials") or (),
+            wechat_token_disk_cache=wechat.get("token_disk_cache", True),
+            wechat_media_cache=wechat.get("media_cache", True),
+            api_type=api.get("api_type"),
+            api_key_name=api_current.get("key"),
+            api_key=_pick(lambda: api_current["api_key"][api_current["key_index"]]),
+            api_model=_pick(lambda: api_current["model"][api_current["model_index"]]),
+            api_apibase=api_current.get("api_base"),
+            api_list=tuple(name for name in api if name != "api_type"),
+            agent_models=raw.get("agent_models") or _EMPTY,
+            img_api_type=img_api.get("api_type"),
+            img_api_key=img_api_current.get("api_key"),
+            img_api_model=img_api_current.get("model"),
+            use_template=raw.get("use_template", True),
+            need_auditor=raw.get("need_auditor", False),
+            # 兼容旧版本配置文件，未配置时串行执行
+            max_workers=raw.get("max_workers", 1),
+            # direct：CrewAI 执行完成后直接发布；agent：由发布专家调用工具发布（多一轮大模型调用）
+            publish_mode=raw.get("publish_mode", "direct"),
+            hotnews_cache_ttl=hotnews.get("cache_ttl", 600),
+            hotnews_stale_ttl=hotnews.get("stale_ttl", 3600),
+            hotnews_disk_cache=hotnews.get("disk_cache", True),
+            hotnews_sources=hotnews.get("sources", tuple(default_config["hotnews"]["sources"])),
+            hotnews_source_timeout=hotnews.get("source_timeout", 5),
+            hotnews_fetch_budget=hotnews.get("fetch_budget", 8),
+            topic_dedup_enabled=topic_dedup.get("enabled", True),
+            topic_dedup_window_hours=topic_dedup.get("window_hours", 72),
+            topic_dedup_threshold=topic_dedup.get("threshold", 0.6),
+            template_select_mode=template.get("select_mode", "random"),
+            template_token_budget=template.get("token_budget", 12000),
+            template_strip_content=template.get("strip_content", False),
+            task_cache_enabled=task_cache.get("enabled", True),
+            task_cache_ttl_hours=task_cache.get("ttl_hours", 24),
+            task_cache_max_entries=task_cache.get("max_entries", 200),
+            jobs_concurrency=jobs.get("concurrency", 1),
+            jobs_lease_seconds=jobs.get("lease_seconds", 900),
+            jobs_max_attempts=jobs.get("max_attempts", 3),
+            jobs_retry_delay=jobs.get("retry_delay", 300),
+            jobs_poll_interval=jobs.get("poll_interval", 5),
+            schedule=schedule,
+            schedule_check_interval=schedule.get("check_interval", 60),
+        )
+
+    def agent_llm_config(self, agent_name):
+        """
+        agent_models 中为该 agent 单独配置的模型及参数，未配置时返回None（使用全局模型）
+        api_type 可指定 api 中的其他平台，未指定时使用当前平台的 api_key、api_base
+        其余参数（temperature、max_tokens 等）原样传给 LLM
+        """
+        route = self.agent_models.get(agent_name) or _EMPTY
+        if not route.get("model"):
+            return None
+
+        api = self.raw["api"][route.get("api_type") or self.api_type]
+        llm_config = {
+            "model": route["model"],
+            "api_key": api["api_key"][api["key_index"]],
+            "base_url": api["api_base"],
+        }
+        llm_config.update(
+            {
+                key: _thaw(value)
+                for key, value in route.items()
+                if key not in ("api_type", "model") and value is not None
+            }
+        )
+        return llm_config
+
+    def schedule_account(self, appid):
+        """
+        公众号的定时发布配置，返回 (发布时间段列表, 每天最多发布篇数)
+        schedule.accounts 中按appid单独配置的优先，未配置的项使用 schedule 中的默认值
+        """
+        account = (self.schedule.get("accounts") or _EMPTY).get(appid) or _EMPTY
+        windows = account.get("windows", self.schedule.get("windows", ("08:00-09:00",)))
+        daily_limit = account.get("daily_limit", self.schedule.get("daily_limit", 1))
+        return windows, daily_limit
+
+
 class Config:
     _instance = None
-    _lock = threading.Lock()
+    _lock = threading.Lock()  # 仅用于创建单例
 
     def __init__(self):
         if hasattr(self, "_initialized"):
             return
         self._initialized = True
-        self.config = None
+        # 当前配置快照，加载、保存时整体替换（引用赋值是原子的），读取不加锁
+        self._snapshot = None
+        self._write_lock = threading.Lock()  # 加载、保存串行执行
         self.error_message = None
         self._config_path = self.__get_config_path()
         self.default_config = {
@@ -40,7 +221,9 @@ class Config:
                     {"appid": "", "appsecret": "", "author": "作者01"},
                     {"appid": "", "appsecret": "", "author": "作者02"},
                     {"appid": "", "appsecret": "", "author": "作者03"},
-                ]
+                ],
+                "token_disk_cache": True,
+                "media_cache": True,
             },
             "api": {
                 "api_type": "OpenRouter",
@@ -111,6 +294,42 @@ class Config:
             },
             "use_template": True,
             "need_auditor": False,
+            "max_workers": 1,
+            "publish_mode": "direct",
+            "hotnews": {
+                "cache_ttl": 600,
+                "stale_ttl": 3600,
+                "disk_cache": True,
+                "sources": [
+                    "vvhan",
+                    "weibo",
+                    "douyin",
+                    "bilibili",
+                    "zhihu",
+                    "baidu",
+                    "toutiao",
+                    "thepaper",
+                ],
+                "source_timeout": 5,
+                "fetch_budget": 8,
+            },
+            "topic_dedup": {"enabled": True, "window_hours": 72, "threshold": 0.6},
+            "template": {"select_mode": "random", "token_budget": 12000, "strip_content": False},
+            "task_cache": {"enabled": True, "ttl_hours": 24, "max_entries": 200},
+            "agent_models": {},
+            "jobs": {
+                "concurrency": 1,
+                "lease_seconds": 900,
+                "max_attempts": 3,
+                "retry_delay": 300,
+                "poll_interval": 5,
+            },
+            "schedule": {
+                "windows": ["08:00-09:00", "20:00-21:00"],
+                "daily_limit": 1,
+                "check_interval": 60,
+                "accounts": {},
+            },
         }
 
     @classmethod
@@ -120,106 +339,170 @@ class Config:
                 cls._instance = cls()
             return cls._instance
 
+    def snapshot(self) -> ConfigSnapshot:
+        """当前配置快照，需要读取多项配置时使用，保证各项来自同一次加载"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            raise ValueError("配置未加载")
+        return snapshot
+
     @property
     def platforms(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config["platforms"]
+        return self.snapshot().platforms
 
     @property
     def wechat_credentials(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config["wechat"]["credentials"]
+        return self.snapshot().wechat_credentials
+
+    @property
+    def wechat_token_disk_cache(self):
+        return self.snapshot().wechat_token_disk_cache
+
+    @property
+    def wechat_media_cache(self):
+        return self.snapshot().wechat_media_cache
 
     @property
     def api_type(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config["api"]["api_type"]
+        return self.snapshot().api_type
 
     @property
     def api_key_name(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config["api"][self.config["api"]["api_type"]]["key"]
+        return self.snapshot().api_key_name
 
     @property
     def api_key(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            api_key = self.config["api"][self.config["api"]["api_type"]]["api_key"]
-            key_index = self.config["api"][self.config["api"]["api_type"]]["key_index"]
-            return api_key[key_index]
+        return self.snapshot().api_key
 
     @property
     def api_model(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            model = self.config["api"][self.config["api"]["api_type"]]["model"]
-            model_index = self.config["api"][self.config["api"]["api_type"]]["model_index"]
-            return model[model_index]
+        return self.snapshot().api_model
 
     @property
     def api_apibase(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config["api"][self.config["api"]["api_type"]]["api_base"]
+        return self.snapshot().api_apibase
+
+    def agent_llm_config(self, agent_name):
+        return self.snapshot().agent_llm_config(agent_name)
 
     @property
     def img_api_type(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config["img_api"]["api_type"]
+        return self.snapshot().img_api_type
 
     @property
     def img_api_key(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config["img_api"][self.config["img_api"]["api_type"]]["api_key"]
+        return self.snapshot().img_api_key
 
     @property
     def img_api_model(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config["img_api"][self.config["img_api"]["api_type"]]["model"]
+        return self.snapshot().img_api_model
 
     @property
     def use_template(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config["use_template"]
+        return self.snapshot().use_template
 
     @property
     def need_auditor(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config["need_auditor"]
+        return self.snapshot().need_auditor
 
     @property
-    def api_list(self):
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
+    def max_workers(self):
+        return self.snapshot().max_workers
 
-            api_keys_list = list(self.config["api"].keys())
-            # 移除 "api_type" 这个键，得到您需要的列表
-            if "api_type" in api_keys_list:
-                api_keys_list.remove("api_type")
+    @property
+    def publish_mode(self):
+        return self.snapshot().publish_mode
+
+    @property
+    def hotnews_cache_ttl(self):
+        return self.snapshot().hotnews_cache_ttl
+
+    @property
+    def hotnews_stale_ttl(self):
+        return self.snapshot().hotnews_stale_ttl
 
-            return api_keys_list
+    @property
+    def hotnews_disk_cache(self):
+        return self.snapshot().hotnews_disk_cache
+
+    @property
+    def hotnews_sources(self):
+        return self.snapshot().hotnews_sources
+
+    @property
+    def hotnews_source_timeout(self):
+        return self.snapshot().hotnews_source_timeout
+
+    @property
+    def hotnews_fetch_budget(self):
+        return self.snapshot().hotnews_fetch_budget
+
+    @property
+    def topic_dedup_enabled(self):
+        return self.snapshot().topic_dedup_enabled
+
+    @property
+    def topic_dedup_window_hours(self):
+        return self.snapshot().topic_dedup_window_hours
+
+    @property
+    def topic_dedup_threshold(self):
+        return self.snapshot().topic_dedup_threshold
+
+    @property
+    def template_select_mode(self):
+        return self.snapshot().template_select_mode
+
+    @property
+    def template_token_budget(self):
+        return self.snapshot().template_token_budget
+
+    @property
+    def template_strip_content(self):
+        return self.snapshot().template_strip_content
+
+    @property
+    def task_cache_enabled(self):
+        return self.snapshot().task_cache_enabled
+
+    @property
+    def task_cache_ttl_hours(self):
+        return self.snapshot().task_cache_ttl_hours
+
+    @property
+    def task_cache_max_entries(self):
+        return self.snapshot().task_cache_max_entries
+
+    @property
+    def jobs_concurrency(self):
+        return self.snapshot().jobs_concurrency
+
+    @property
+    def jobs_lease_seconds(self):
+        return self.snapshot().jobs_lease_seconds
+
+    @property
+    def jobs_max_attempts(self):
+        return self.snapshot().jobs_max_attempts
+
+    @property
+    def jobs_retry_delay(self):
+        return self.snapshot().jobs_retry_delay
+
+    @property
+    def jobs_poll_interval(self):
+        return self.snapshot().jobs_poll_interval
+
+    def schedule_account(self, appid):
+        return self.snapshot().schedule_account(appid)
+
+    @property
+    def schedule_check_interval(self):
+        return self.snapshot().schedule_check_interval
+
+    @property
+    def api_list(self):
+        return self.snapshot().api_list
 
     def __get_config_path(self):
         config_path = utils.get_res_path("", os.path.dirname(__file__))
@@ -235,54 +518,100 @@ class Config:
 
     def load_config(self):
         """加载配置，从 config.yaml 或默认配置，不验证"""
-        with self._lock:
+        with self._write_lock:
             if os.path.exists(self._config_path):
                 try:
                     with open(self._config_path, "r", encoding="utf-8") as f:
-                        self.config = yaml.safe_load(f)
-                        if self.config is None:
-                            self.config = self.default_config
+                        config = yaml.safe_load(f)
+                    self._snapshot = ConfigSnapshot.from_dict(
+                        config if config is not None else self.default_config,
+                        self.default_config,
+                    )
                     return True
                 except Exception as e:
                     self.error_message = f"加载 config.yaml 失败: {e}"
                     comm.send_update("error", self.error_message)
-                    self.config = self.default_config
+                    self._snapshot = ConfigSnapshot.from_dict(
+                        self.default_config, self.default_config
+                    )
                     return False
             else:
-                self.config = self.default_config
+                self._snapshot = ConfigSnapshot.from_dict(self.default_config, self.default_config)
                 return True
 
     def validate_config(self):
         """验证配置，仅在 CrewAI 执行时调用"""
         try:
-            if self.api_key == "":
-                self.error_message = f"未配置API KEY，请打开配置填写{self.api_type}的api_key"
+            # 整个验证过程使用同一个快照，期间保存配置不影响本次验证
+            config = self.snapshot()
+            if not config.api_key:
+                self.error_message = f"未配置API KEY，请打开配置填写{config.api_type}的api_key"
                 return False
 
-            if self.api_model == "":
-                self.error_message = f"未配置Model，请打开配置填写{self.api_type}的model"
+            if not config.api_model:
+                self.error_message = f"未配置Model，请打开配置填写{config.api_type}的model"
                 return False
 
-            if self.img_api_type != "picsum":
-                if self.img_api_key == "":
+            if config.img_api_type != "picsum":
+                if not config.img_api_key:
                     self.error_message = (
-                        f"未配置图片生成模型的API KEY，请打开配置填写{self.img_api_type}的api_key"
+                        f"未配置图片生成模型的API KEY，请打开配置填写{config.img_api_type}的api_key"
                     )
                     return False
-                elif self.img_api_model == "":
+                elif not config.img_api_model:
                     self.error_message = (
-                        f"未配置图片生成的模型，请打开配置填写{self.img_api_type}的model"
+                        f"未配置图片生成的模型，请打开配置填写{config.img_api_type}的model"
                     )
                     return False
 
             valid_cred = any(
-                cred["appid"] and cred["appsecret"] for cred in self.wechat_credentials
+                cred["appid"] and cred["appsecret"] for cred in config.wechat_credentials
             )
             if not valid_cred:
                 self.error_message = "未配置有效的微信公众号appid和appsecret，请打开配置填写"
                 return False
 
-            total_weight = sum(platform["weight"] for platform in self.platforms)
+            if not isinstance(config.max_workers, int) or config.max_workers < 1:
+                self.error_message = f"并发数 {config.max_workers} 无效，必须是大于0的整数"
+                return False
+
+            if not isinstance(config.jobs_concurrency, int) or config.jobs_concurrency < 1:
+                self.error_message = (
+                    f"任务队列并发数 {config.jobs_concurrency} 无效，必须是大于0的整数"
+                )
+                return False
+
+            for credential in config.wechat_credentials:
+                windows, daily_limit = config.schedule_account(credential["appid"])
+                for window in windows:
+                    utils.parse_time_window(window)  # 格式错误时抛出ValueError，提示错误信息
+                if not isinstance(daily_limit, int) or daily_limit < 0:
+                    self.error_message = f"每天发布篇数 {daily_limit} 无效，必须是不小于0的整数"
+                    return False
+
+            if config.publish_mode not in ("direct", "agent"):
+                self.error_message = f"发布方式 {config.publish_mode} 无效，只支持 direct 或 agent"
+                return False
+
+            for agent_name, route in config.agent_models.items():
+                route = route or {}
+                if route.get("api_type") and route["api_type"] not in config.api_list:
+                    self.error_message = f"{agent_name} 的模型平台 {route['api_type']} 不存在"
+                    return False
+                if route.get("api_type") and not route.get("model"):
+                    self.error_message = f"未配置 {agent_name} 的模型，请填写 agent_models 的 model"
+                    return False
+                if route.get("model") and not config.agent_llm_config(agent_name)["api_key"]:
+                    self.error_message = f"未配置 {agent_name} 所用模型平台的API KEY"
+                    return False
+
+            if config.template_select_mode not in ("random", "budget"):
+                self.error_message = (
+                    f"模板选择方式 {config.template_select_mode} 无效，只支持 random 或 budget"
+                )
+                return False
+
+            total_weight = sum(platform["weight"] for platform in config.platforms)
             if abs(total_weight - 1.0) > 0.01:
                 self.error_message = f"平台权重之和 {total_weight} 不等于 1"
                 return True  # 这里可以不失败，会默认使用微博
@@ -294,17 +623,14 @@ class Config:
             return False
 
     def get_config(self):
-        """获取配置，不验证"""
-        with self._lock:
-            if self.config is None:
-                raise ValueError("配置未加载")
-            return self.config
+        """获取配置（可修改的副本，修改后通过 save_config 保存），不验证"""
+        return _thaw(self.snapshot().raw)
 
     def save_config(self, config):
         """保存配置到 config.yaml，不验证"""
-        with self._lock:
-            self.config = config
+        with self._write_lock:
             try:
+                self._snapshot = ConfigSnapshot.from_dict(config, self.default_config)
                 with open(self._config_path, "w", encoding="utf-8") as f:
                     yaml.dump(
                         config,
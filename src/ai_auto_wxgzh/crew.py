@@ -1,7 +1,10 @@
-from crewai import Agent, Crew, Process, Task
+from crewai import LLM, Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 
 from src.ai_auto_wxgzh.tools.custom_tool import PublisherTool, ReadTemplateTool
+from src.ai_auto_wxgzh.utils.workspace import RunWorkspace
+from src.ai_auto_wxgzh.utils.task_cache import CachedTask
+from src.ai_auto_wxgzh.config.config import Config
 
 
 @CrewBase
@@ -11,14 +14,38 @@ class AutowxGzh:
     agents_config = "config/agents.yaml"
     tasks_config = "config/tasks.yaml"
 
-    def __init__(self, use_template=False, need_auditor=False):
+    def __init__(
+        self,
+        use_template=False,
+        need_auditor=False,
+        workspace=None,
+        publish_mode="direct",
+        credential=None,
+        on_publish=None,
+    ):
         self.use_template = use_template  # 是否使用本地模板
         self.need_auditor = need_auditor  # 是否开启质量审核，关闭降低token消耗
+        # direct：不使用发布专家，CrewAI 执行完成后由 crew_main 直接发布
+        self.publish_mode = publish_mode
+        # agent 模式下绑定到发布工具的公众号配置，不经过提示词
+        self.credential = credential or {}
+        self.on_publish = on_publish  # agent 模式下发布工具开始发布前调用
+        # 每次运行独立的工作目录，任务之间通过该目录交接文件，支持多个运行同时进行
+        self.workspace = workspace or RunWorkspace()
+
+    def _llm(self, agent_name):
+        """按 agent_models 为该 agent 创建模型，未单独配置时返回None，使用全局模型（环境变量 MODEL）"""
+        try:
+            llm_config = Config.get_instance().agent_llm_config(agent_name)
+        except ValueError:  # 配置未加载时使用全局模型
+            return None
+        return LLM(**llm_config) if llm_config else None
 
     @agent
     def researcher(self) -> Agent:
         return Agent(
             config=self.agents_config["researcher"],
+            llm=self._llm("researcher"),
             verbose=True,
         )
 
@@ -26,6 +53,7 @@ class AutowxGzh:
     def writer(self) -> Agent:
         return Agent(
             config=self.agents_config["writer"],
+            llm=self._llm("writer"),
             verbose=True,
         )
 
@@ -33,6 +61,7 @@ class AutowxGzh:
     def auditor(self) -> Agent:
         return Agent(
             config=self.agents_config["auditor"],
+            llm=self._llm("auditor"),
             verbose=True,
         )
 
@@ -40,6 +69,7 @@ class AutowxGzh:
     def designer(self) -> Agent:
         return Agent(
             config=self.agents_config["designer"],
+            llm=self._llm("designer"),
             verbose=True,
         )
 
@@ -47,6 +77,7 @@ class AutowxGzh:
     def templater(self) -> Agent:
         return Agent(
             config=self.agents_config["templater"],
+            llm=self._llm("templater"),
             tools=[ReadTemplateTool()],
             verbose=True,
         )
@@ -55,40 +86,62 @@ class AutowxGzh:
     def publisher(self) -> Agent:
         return Agent(
             config=self.agents_config["publisher"],
-            tools=[PublisherTool()],
+            llm=self._llm("publisher"),
+            tools=[self._publisher_tool()],
             verbose=True,
         )
 
+    def _publisher_tool(self) -> PublisherTool:
+        if self.publish_mode != "agent":
+            return PublisherTool(run_id=self.workspace.run_id)  # 不会被使用，不绑定配置
+
+        config = Config.get_instance()
+        return PublisherTool(
+            run_id=self.workspace.run_id,
+            appid=self.credential.get("appid", ""),
+            appsecret=self.credential.get("appsecret", ""),
+            author=self.credential.get("author", ""),
+            img_api_type=config.img_api_type,
+            img_api_key=config.img_api_key,
+            img_api_model=config.img_api_model,
+            on_publish=self.on_publish,
+        )
+
     @task
     def analyze_topic(self) -> Task:
-        return Task(
+        return CachedTask(
             config=self.tasks_config["analyze_topic"],
+            run_workspace=self.workspace,
         )
 
     @task
     def write_content(self) -> Task:
-        return Task(
+        return CachedTask(
             config=self.tasks_config["write_content"],
+            run_workspace=self.workspace,
         )
 
     @task
     def audit_content(self) -> Task:
-        return Task(
+        return CachedTask(
             config=self.tasks_config["audit_content"],
+            run_workspace=self.workspace,
         )
 
     @task
     def design_content(self) -> Task:
-        return Task(
+        return CachedTask(
             config=self.tasks_config["design_content"],
-            output_file="tmp_article.html",
+            run_workspace=self.workspace,
+            output_file=self.workspace.output_file(RunWorkspace.TMP_ARTICLE),
         )
 
     @task
     def template_content(self) -> Task:
-        return Task(
+        return CachedTask(
             config=self.tasks_config["template_content"],
-            output_file="tmp_article.html",
+            run_workspace=self.workspace,
+            output_file=self.workspace.output_file(RunWorkspace.TMP_ARTICLE),
         )
 
     @task
@@ -115,6 +168,11 @@ class AutowxGzh:
             no_use_agent.append("质量审核专家")
             no_use_task.append("audit_content")
 
+        # 直接发布，不需要发布专家
+        if self.publish_mode == "direct":
+            no_use_agent.append("文章发布专家")
+            no_use_task.append("publish_task")
+
         # 过滤不使用的
         self.agents = [agent for agent in self.agents if agent.role not in no_use_agent]
         self.tasks = [task for task in self.tasks if task.name not in no_use_task]
@@ -1,13 +1,21 @@
 #!/usr/bin/env python
 import sys
 import os
+import time
 import warnings
 import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
 
 from src.ai_auto_wxgzh.tools import hotnews
-from src.ai_auto_wxgzh.crew import AutowxGzh
+from src.ai_auto_wxgzh.tools import wx_publish_poller
+from src.ai_auto_wxgzh.jobs import job_queue
+from src.ai_auto_wxgzh.utils import http_client
 from src.ai_auto_wxgzh.utils import utils
 from src.ai_auto_wxgzh.utils import log
+from src.ai_auto_wxgzh.utils import topic_index
+from src.ai_auto_wxgzh.utils import workspace as run_workspace
+from src.ai_auto_wxgzh.utils.workspace import RunWorkspace
 from src.ai_auto_wxgzh.config.config import Config
 
 
@@ -20,6 +28,16 @@ warnings.filterwarnings("ignore", category=SyntaxWarning, module="pysbd")
 # interpolate any tasks and agents information
 
 
+def _crew(*args):
+    """
+    创建 AutowxGzh，CrewAI 及其依赖（litellm、openai等）导入耗时较长，首次执行任务时才导入，
+    界面、命令行启动和只加入任务队列时不需要等待
+    """
+    from src.ai_auto_wxgzh.crew import AutowxGzh
+
+    return AutowxGzh(*args)
+
+
 # 为了能结束任务，需要异步执行
 class StopCrewException(Exception):
     """自定义异常，用于中断 CrewAI"""
@@ -27,12 +45,25 @@ class StopCrewException(Exception):
     pass
 
 
-async def run_crew_async(stop_event, inputs, use_template=False, need_auditor=False):
+async def run_crew_async(
+    stop_event,
+    inputs,
+    use_template=False,
+    need_auditor=False,
+    workspace=None,
+    publish_mode="direct",
+    credential=None,
+    on_publish=None,
+):
     """异步运行 CrewAI，检查终止信号"""
     try:
         if stop_event.is_set():
             raise StopCrewException("CrewAI 任务被终止")
-        result = await AutowxGzh(use_template, need_auditor).crew().kickoff_async(inputs=inputs)
+        result = (
+            await _crew(use_template, need_auditor, workspace, publish_mode, credential, on_publish)
+            .crew()
+            .kickoff_async(inputs=inputs)
+        )
         return result
     except StopCrewException as e:
         raise e
@@ -40,12 +71,24 @@ async def run_crew_async(stop_event, inputs, use_template=False, need_auditor=Fa
         raise e
 
 
-def run(inputs, use_template=False, need_auditor=False):
+def run(
+    inputs,
+    use_template=False,
+    need_auditor=False,
+    workspace=None,
+    publish_mode="direct",
+    credential=None,
+    on_publish=None,
+):
     """
     Run the crew.
     """
     try:
-        AutowxGzh(use_template, need_auditor).crew().kickoff(inputs=inputs)
+        return (
+            _crew(use_template, need_auditor, workspace, publish_mode, credential, on_publish)
+            .crew()
+            .kickoff(inputs=inputs)
+        )
     except Exception as e:
         raise Exception(f"An error occurred while running the crew: {e}")
 
@@ -56,7 +99,7 @@ def train():
     """
     inputs = {"topic": "AI LLMs"}
     try:
-        AutowxGzh().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
+        _crew().crew().train(n_iterations=int(sys.argv[1]), filename=sys.argv[2], inputs=inputs)
 
     except Exception as e:
         raise Exception(f"An error occurred while training the crew: {e}")
@@ -67,7 +110,7 @@ def replay():
     Replay the crew execution from a specific task.
     """
     try:
-        AutowxGzh().crew().replay(task_id=sys.argv[1])
+        _crew().crew().replay(task_id=sys.argv[1])
 
     except Exception as e:
         raise Exception(f"An error occurred while replaying the crew: {e}")
@@ -79,7 +122,7 @@ def test():
     """
     inputs = {"topic": "AI LLMs"}
     try:
-        AutowxGzh().crew().test(
+        _crew().crew().test(
             n_iterations=int(sys.argv[1]), openai_model_name=sys.argv[2], inputs=inputs
         )
 
@@ -87,7 +130,265 @@ def test():
         raise Exception(f"An error occurred while testing the crew: {e}")
 
 
-def autowx_gzh(stop_event=None, ui_mode=False):
+def select_topic(platforms):
+    """
+    按权重随机选取平台并选取未使用过的话题，该平台的话题都已使用时依次尝试其他平台
+    选中的话题会立即记录为已使用，并发执行的公众号不会选中同一话题
+    """
+    index = topic_index.get_index()
+    platform = utils.get_random_platform(platforms)
+    candidates = [platform] + [pf["name"] for pf in platforms if pf["name"] != platform]
+    for name in candidates:
+        for topic in hotnews.get_platform_news(name, 10):
+            if index is None or index.claim(topic, platform=name):
+                return name, topic
+
+    return platform, None
+
+
+def publish_article(credential, workspace, ui_mode=False, on_publish=None):
+    """
+    直接发布本次运行排版后的文章（publish_mode: direct），不经过大模型
+    与 PublisherTool 使用同一发布流程，返回发布结果
+    """
+    from src.ai_auto_wxgzh.tools import custom_tool
+
+    config = Config.get_instance()
+    log.print_log(f"[{credential['author']}] 开始发布文章到微信公众号", ui_mode)
+    return custom_tool.publish_run(
+        workspace,
+        credential["appid"],
+        credential["appsecret"],
+        credential["author"],
+        config.img_api_type,
+        config.img_api_key,
+        config.img_api_model,
+        on_publish,
+    )
+
+
+def run_credential(credential, stop_event=None, ui_mode=False, resume_run_id=None, on_publish=None):
+    """
+    执行单个公众号的完整流程（热点->写作->排版->发布），返回本次执行结果
+    每次执行都有独立的inputs和AutowxGzh实例，可在多个线程中同时运行
+    指定 resume_run_id 时继续该运行：沿用原话题，已完成的阶段（见检查点）不再执行，
+    该运行还没有开始时（如任务队列预先分配的运行ID）按新运行执行
+    on_publish 在开始发布前调用（任务队列据此更新任务状态）
+    """
+    config = Config.get_instance()
+    author = credential["author"]
+    workspace = RunWorkspace(resume_run_id)
+    meta = workspace.read_meta() if resume_run_id else {}
+    ret = {
+        "run_id": workspace.run_id,
+        "author": author,
+        "appid": credential["appid"],
+        "success": False,
+        "mass_sent": False,
+        "result": None,
+    }
+
+    if stop_event is not None and stop_event.is_set():
+        ret["result"] = "CrewAI 任务被终止"
+        return ret
+
+    if meta.get("topic"):
+        platform, topic = meta.get("platform"), meta["topic"]
+        if topic_index.get_index() is not None:
+            topic_index.get_index().claim(topic, platform=platform)  # 失败时已释放，重新占用
+        log.print_log(
+            f"[{author}] 继续运行 {resume_run_id}，话题：{topic}，已完成阶段：{meta.get('stage')}",
+            ui_mode,
+        )
+    else:
+        platform, topic = select_topic(config.platforms)
+        if topic is None:
+            topic = "DeepSeek AI 提效秘籍"
+            log.print_log("---------无法获取到未使用的热榜话题，请检查网络！------------", ui_mode)
+
+    # 公众号、文生图配置不放入inputs，避免插入到提示词中
+    inputs = {"platform": platform, "topic": topic}
+
+    # 元数据不保存appsecret等敏感信息
+    workspace.write_meta(
+        status="running",
+        author=author,
+        appid=credential["appid"],
+        platform=platform,
+        topic=topic,
+    )
+
+    log.print_log(f"[{author}] CrewAI开始工作，运行ID：{workspace.run_id}", ui_mode)
+    try:
+        if ui_mode:
+            # 每个线程使用独立的事件循环运行异步 kickoff
+            loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(loop)
+            try:
+                result = loop.run_until_complete(
+                    run_crew_async(
+                        stop_event,
+                        inputs,
+                        config.use_template,
+                        config.need_auditor,
+                        workspace,
+                        config.publish_mode,
+                        credential,
+                        on_publish,
+                    )
+                )
+            finally:
+                loop.close()
+        else:
+            result = run(
+                inputs,
+                config.use_template,
+                config.need_auditor,
+                workspace,
+                config.publish_mode,
+                credential,
+                on_publish,
+            )
+
+        if config.publish_mode == "direct":
+            if stop_event is not None and stop_event.is_set():
+                raise StopCrewException("CrewAI 任务被终止")
+            result = publish_article(credential, workspace, ui_mode, on_publish)
+
+        ret["result"] = str(result)
+        log.print_log(f"[{author}] 执行完成！结果: {result}", ui_mode)
+    except StopCrewException as e:
+        ret["result"] = str(e)
+        log.print_log(f"[{author}] {str(e)}", ui_mode)
+    except Exception as e:
+        ret["result"] = str(e)
+        log.print_log(f"[{author}] 执行出错：{str(e)}", ui_mode)
+
+    from src.ai_auto_wxgzh.tools import custom_tool
+
+    # 两种发布方式都以发布检查点判断是否发布成功：文章已发布即成功（之后出错也一样），不再重试，
+    # 未群发单独报告（已发布未群发），可 --resume 从群发步骤继续
+    ret["success"] = custom_tool.is_published(workspace)
+    ret["mass_sent"] = custom_tool.is_mass_sent(workspace)
+    # 只有文章还没有发布（没有发布检查点）才释放话题，已发布的话题不能再被其他运行选中
+    if not ret["success"] and topic_index.get_index() is not None:
+        topic_index.get_index().release(topic)  # 执行失败，话题可以再次使用
+    if ret["mass_sent"]:
+        status = "done"
+    elif ret["success"]:
+        status = "published"
+    else:
+        status = "failed"
+    workspace.write_meta(status=status, result=ret["result"])
+    return ret
+
+
+def report_results(results, ui_mode=False):
+    """汇总所有公众号的执行结果，并通知界面"""
+    success = [ret for ret in results if ret["success"]]
+    failed = [ret for ret in results if not ret["success"]]
+    not_sent = [ret for ret in success if not ret.get("mass_sent")]
+
+    summary = f"共执行 {len(results)} 个公众号，成功 {len(success)} 个，失败 {len(failed)} 个"
+    if not_sent:
+        summary += f"，其中已发布未群发 {len(not_sent)} 个：" + "；".join(
+            f"{ret['author']}({ret['result']})" for ret in not_sent
+        )
+    if failed:
+        summary += "。失败：" + "；".join(f"{ret['author']}({ret['result']})" for ret in failed)
+
+    if failed and not success:
+        log.print_log(f"任务失败！{summary}", ui_mode, "error")
+    else:
+        log.print_log(f"任务完成！{summary}", ui_mode)
+
+
+def report_http_metrics(ui_mode=False):
+    """输出上次统计以来各外部接口的请求次数、失败次数和耗时（耗时最多的在前），便于定位慢接口"""
+    metrics = http_client.get_metrics(reset=True)
+    if not metrics:
+        return
+    lines = [
+        f"{endpoint}：{metric['count']}次，失败{metric['errors']}次，"
+        f"平均{metric['avg_time']:.2f}s，最大{metric['max_time']:.2f}s"
+        for endpoint, metric in sorted(metrics.items(), key=lambda item: -item[1]["total_time"])
+    ]
+    log.print_log("外部接口请求统计：\n" + "\n".join(lines), ui_mode)
+
+
+def wait_publish_results(ui_mode=False, timeout=None, interval=10):
+    """
+    等待后台轮询的发布结果（文章链接、添加菜单），命令行执行时在进程退出前调用
+    最多等待 timeout 秒（默认为轮询的超时时间，0 表示不等待），每隔 interval 秒输出一次进度
+    全部结束返回True，超时返回False
+    """
+    poller = wx_publish_poller.get_poller()
+    if not poller.pending():
+        return True
+
+    timeout = poller.timeout if timeout is None else timeout
+    log.print_log(f"等待 {poller.pending()} 篇文章的发布结果（最多 {timeout} 秒）...", ui_mode)
+    start = time.monotonic()
+    while True:
+        remaining = timeout - (time.monotonic() - start)
+        if remaining <= 0:
+            log.print_log(
+                f"等待发布结果超时，{poller.pending()} 篇文章可稍后在公众号后台查看", ui_mode
+            )
+            return False
+        if poller.wait_idle(min(interval, remaining)):
+            return True
+        log.print_log(
+            f"已等待 {time.monotonic() - start:.0f} 秒，还有 {poller.pending()} 篇文章等待发布结果",
+            ui_mode,
+        )
+
+
+def setup_llm_env(config):
+    """CrewAI 通过环境变量使用全局模型"""
+    os.environ[config.api_key_name] = config.api_key
+    os.environ["MODEL"] = config.api_model
+    os.environ["OPENAI_API_BASE"] = config.api_apibase
+
+
+def valid_credentials(config):
+    # 如果没用配置appid，则忽略该条
+    return [
+        credential
+        for credential in config.wechat_credentials
+        if len(credential["appid"]) != 0 and len(credential["appsecret"]) != 0
+    ]
+
+
+def enqueue_jobs(count=1, ui_mode=False):
+    """每个公众号加入 count 个任务到任务队列，由 worker 执行，返回加入的任务数"""
+    config = Config.get_instance()
+    queue = job_queue.get_queue()
+    credentials = valid_credentials(config)
+    for credential in credentials:
+        for _ in range(count):
+            queue.enqueue(
+                credential["appid"], credential["author"], max_attempts=config.jobs_max_attempts
+            )
+
+    total = len(credentials) * count
+    log.print_log(
+        f"已加入 {total} 个任务到任务队列，请运行 python -m src.ai_auto_wxgzh.jobs.worker 执行",
+        ui_mode,
+    )
+    return total
+
+
+def resume_credential(run_id, credentials):
+    """找到运行对应的公众号配置（按appid），运行不存在或公众号已删除时返回None"""
+    if not run_workspace.run_exists(run_id):
+        return None
+    appid = RunWorkspace(run_id).read_meta().get("appid")
+    return next((credential for credential in credentials if credential["appid"] == appid), None)
+
+
+def autowx_gzh(stop_event=None, ui_mode=False, resume_run_id=None):
+    """执行所有公众号，指定 resume_run_id 时只继续该运行（从失败的阶段开始）"""
     config = Config.get_instance()
     if not ui_mode:
         if not config.load_config():
@@ -97,68 +398,77 @@ def autowx_gzh(stop_event=None, ui_mode=False):
             log.print_log(f"配置填写有错误：{config.error_message}")
             return
 
-    os.environ[config.api_key_name] = config.api_key
-    os.environ["MODEL"] = config.api_model
-    os.environ["OPENAI_API_BASE"] = config.api_apibase
+    setup_llm_env(config)
 
-    img_api_type = config.img_api_type
-    img_api_key = config.img_api_key
-    img_api_model = config.img_api_model
-
-    for credential in config.wechat_credentials:
-        appid = credential["appid"]
-        appsecret = credential["appsecret"]
-        author = credential["author"]
-        platform = utils.get_random_platform(config.platforms)
-        topics = hotnews.get_platform_news(platform, 1)  # 使用不重复的平台
-        if len(topics) == 0:
-            topics = ["DeepSeek AI 提效秘籍"]
-            log.print_log("---------无法获取到热榜，请检查网络！------------", ui_mode)
-
-        # 如果没用配置appid，则忽略该条
-        if len(appid) == 0 or len(appsecret) == 0:
-            continue
-
-        inputs = {
-            "platform": platform,
-            "topic": topics[0],
-            "appid": appid,
-            "appsecret": appsecret,
-            "author": author,
-            "img_api_type": img_api_type,
-            "img_api_key": img_api_key,
-            "img_api_model": img_api_model,
-        }
-
-        log.print_log("CrewAI开始工作...", ui_mode)
-        if ui_mode:
-            try:
-                # 运行异步 kickoff
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    result = loop.run_until_complete(
-                        run_crew_async(
-                            stop_event,
-                            inputs,
-                            config.use_template,
-                            config.need_auditor,
-                        )
-                    )
-                    log.print_log(f"任务完成！结果: {result}", True)
-                finally:
-                    loop.close()
-            except StopCrewException as e:
-                log.print_log(str(e), True)
-            except Exception as e:
-                log.print_log(str(e), True, "error")
-        else:
-            try:
-                run(inputs, config.use_template, config.need_auditor)
-                # log.print_log("任务完成！")
-            except Exception as e:
-                log.print_log(f"执行出错：{str(e)}")
+    credentials = valid_credentials(config)
+    if len(credentials) == 0:
+        return []
+
+    if resume_run_id:
+        credential = resume_credential(resume_run_id, credentials)
+        if credential is None:
+            log.print_log(
+                f"任务失败！运行 {resume_run_id} 不存在或对应的公众号未配置", ui_mode, "error"
+            )
+            return []
+        results = [run_credential(credential, stop_event, ui_mode, resume_run_id)]
+        report_results(results, ui_mode)
+        report_http_metrics(ui_mode)
+        return results
+
+    max_workers = min(config.max_workers, len(credentials))
+    if max_workers <= 1:
+        results = [run_credential(credential, stop_event, ui_mode) for credential in credentials]
+    else:
+        log.print_log(f"并发执行 {len(credentials)} 个公众号，并发数：{max_workers}", ui_mode)
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="autowx") as pool:
+            futures = [
+                pool.submit(run_credential, credential, stop_event, ui_mode)
+                for credential in credentials
+            ]
+            # 保持与配置一致的顺序输出结果
+            results = [future.result() for future in futures]
+
+    report_results(results, ui_mode)
+    report_http_metrics(ui_mode)
+    return results
 
 
 if __name__ == "__main__":
-    autowx_gzh()
+    parser = argparse.ArgumentParser(description="微信公众号AI自动写作、发布")
+    parser.add_argument(
+        "--resume",
+        metavar="RUN_ID",
+        help="继续执行失败的运行，从失败的阶段开始（runs目录下的运行ID）",
+    )
+    parser.add_argument("--list-failed", action="store_true", help="列出执行失败、可以继续的运行")
+    parser.add_argument(
+        "--publish-wait",
+        type=int,
+        metavar="SECONDS",
+        help="退出前最多等待发布结果（文章链接、菜单）的秒数，0 表示不等待，默认600",
+    )
+    parser.add_argument(
+        "--enqueue",
+        type=int,
+        metavar="N",
+        help="不直接执行，每个公众号加入N个任务到任务队列（由 jobs.worker 执行）",
+    )
+    args = parser.parse_args()
+
+    if args.enqueue:
+        config = Config.get_instance()
+        if not config.load_config():
+            log.print_log("加载配置失败，请检查是否有配置！")
+        elif not config.validate_config():
+            log.print_log(f"配置填写有错误：{config.error_message}")
+        else:
+            enqueue_jobs(args.enqueue)
+    elif args.list_failed:
+        for meta in run_workspace.list_runs("failed"):
+            print(
+                f"{meta['run_id']}  {meta.get('author')}  {meta.get('topic')}  {meta.get('stage')}"
+            )
+    else:
+        autowx_gzh(resume_run_id=args.resume)
+        wait_publish_results(timeout=args.publish_wait)
@@ -13,7 +13,9 @@ class ConfigEditor:
         sg.theme("systemdefault")
         self.config = Config.get_instance()
         self.platform_count = len(self.config.platforms)
-        self.wechat_count = len(self.config.wechat_credentials)
+        # 界面中编辑的微信凭证，添加、删除后在保存前不影响已加载的配置
+        self.credentials = self.config.get_config()["wechat"]["credentials"]
+        self.wechat_count = len(self.credentials)
         self.window = None
         self.window = sg.Window(
             "配置编辑器",
@@ -66,7 +68,7 @@ class ConfigEditor:
 
     def create_wechat_tab(self):
         """创建微信 TAB 布局 (垂直排列，标签固定宽度对齐，支持滚动)"""
-        credentials = self.config.wechat_credentials
+        credentials = self.credentials
         self.wechat_count = len(credentials)
         label_width = 12
         wechat_rows = []
@@ -263,6 +265,15 @@ class ConfigEditor:
         layout = [
             [sg.Checkbox("使用模板", default=self.config.use_template, key="-USE_TEMPLATE-")],
             [sg.Checkbox("需要审核者", default=self.config.need_auditor, key="-NEED_AUDITOR-")],
+            [
+                sg.Text("并发数:", size=(6, 1)),
+                sg.Spin(
+                    [i for i in range(1, 11)],
+                    initial_value=self.config.max_workers,
+                    key="-MAX_WORKERS-",
+                    size=(5, 1),
+                ),
+            ],
             [
                 sg.Text(
                     "Tips：\n"
@@ -271,8 +282,9 @@ class ConfigEditor:
                     "    - 不使用：AI根据要求生成模板，并填充文章\n"
                     "2、需要审核者：\n"
                     "    - 需要：则在生成文章后执行审核，文章可能更好，但Token消耗更高\n"
-                    "    - 不需要：生成文章后直接填充模板，消耗低，文章可能略差\n",
-                    size=(70, 7),
+                    "    - 不需要：生成文章后直接填充模板，消耗低，文章可能略差\n"
+                    "3、并发数：同时执行的公众号数量，1为逐个执行\n",
+                    size=(70, 8),
                     text_color="gray",
                 ),
             ],
@@ -359,7 +371,7 @@ class ConfigEditor:
 
             # 添加微信凭证
             elif event == "-ADD_WECHAT-":
-                credentials = self.config.wechat_credentials  # 直接使用内存中的 credentials
+                credentials = self.credentials
                 credentials.append({"appid": "", "appsecret": "", "author": ""})
                 self.wechat_count = len(credentials)
                 try:
@@ -378,7 +390,7 @@ class ConfigEditor:
                 match = re.search(r"-DELETE_WECHAT_(\d+)", event)
                 if match:
                     index = int(match.group(1))
-                    credentials = self.config.wechat_credentials  # 直接使用内存中的 credentials
+                    credentials = self.credentials
                     if 0 <= index < len(credentials):
                         try:
                             credentials.pop(index)
@@ -487,6 +499,7 @@ class ConfigEditor:
                     i += 1
                 config["wechat"]["credentials"] = credentials
                 if self.config.save_config(config):
+                    self.credentials = credentials
                     self.wechat_count = len(credentials)  # 同步更新计数器
                     # 刷新界面以确保一致
                     self.update_tab("-TAB_WECHAT-", self.create_wechat_tab())
@@ -576,6 +589,14 @@ class ConfigEditor:
                 config = self.config.get_config().copy()
                 config["use_template"] = values["-USE_TEMPLATE-"]
                 config["need_auditor"] = values["-NEED_AUDITOR-"]
+                try:
+                    max_workers = int(values["-MAX_WORKERS-"])
+                    if max_workers < 1:
+                        raise ValueError
+                except ValueError:
+                    sg.popup_error("并发数必须是大于0的整数", icon=self.__get_icon())
+                    continue
+                config["max_workers"] = max_workers
                 if self.config.save_config(config):
                     sg.popup(
                         "其他配置已保存",
@@ -612,7 +633,8 @@ class ConfigEditor:
                     self.config.default_config["wechat"]["credentials"]
                 )
                 if self.config.save_config(config):
-                    self.wechat_count = len(config["wechat"]["credentials"])
+                    self.credentials = config["wechat"]["credentials"]
+                    self.wechat_count = len(self.credentials)
                     # 清空并重建微信 tab
                     self.update_tab("-TAB_WECHAT-", self.create_wechat_tab())
                     sg.popup(
@@ -665,6 +687,7 @@ class ConfigEditor:
                 config = self.config.get_config().copy()
                 config["use_template"] = self.config.default_config["use_template"]
                 config["need_auditor"] = self.config.default_config["need_auditor"]
+                config["max_workers"] = self.config.default_config["max_workers"]
                 if self.config.save_config(config):
                     # 清空并重建其他 tab
                     self.update_tab("-TAB_OTHER-", self.create_other_tab())
@@ -16,11 +16,12 @@ from collections import deque
 
 import PySimpleGUI as sg
 from . import ConfigEditor
-from src.ai_auto_wxgzh.crew_main import autowx_gzh
+from src.ai_auto_wxgzh.crew_main import autowx_gzh, enqueue_jobs
 
 from src.ai_auto_wxgzh.utils import comm
 from src.ai_auto_wxgzh.utils import utils
 from src.ai_auto_wxgzh.utils import log
+from src.ai_auto_wxgzh.utils import workspace
 from src.ai_auto_wxgzh.config.config import Config
 
 
@@ -74,6 +75,8 @@ class MainGUI(object):
             [
                 sg.Push(),  # 左侧占位
                 sg.Button(button_text="开始执行", size=(12, 2), key="-START_BTN-"),
+                sg.Button(button_text="继续失败任务", size=(12, 2), key="-RESUME_BTN-"),
+                sg.Button(button_text="加入队列", size=(12, 2), key="-ENQUEUE_BTN-"),
                 sg.Button(
                     button_text="结束执行",
                     size=(12, 2),
@@ -113,6 +116,48 @@ class MainGUI(object):
     def __gui_config_start(self):
         ConfigEditor.gui_start()
 
+    def __select_failed_run(self):
+        """选择一个失败的运行，返回运行ID，取消或没有失败的运行时返回None"""
+        runs = workspace.list_runs("failed")
+        if not runs:
+            sg.popup("没有可以继续的失败任务", title="系统提示", icon=self.__get_icon())
+            return None
+
+        items = [
+            f"{meta['run_id']} | {meta.get('author')} | {meta.get('topic')} | "
+            f"已完成：{meta.get('stage') or '无'}"
+            for meta in runs
+        ]
+        window = sg.Window(
+            "继续失败任务",
+            [
+                [sg.Text("选择要继续的任务（从失败的阶段开始执行）：")],
+                [sg.Listbox(items, size=(80, 10), key="-RUNS-", select_mode="single")],
+                [sg.Push(), sg.Button("继续执行", key="-OK-"), sg.Button("取消"), sg.Push()],
+            ],
+            modal=True,
+            icon=self.__get_icon(),
+        )
+        run_id = None
+        event, values = window.read()
+        if event == "-OK-" and values["-RUNS-"]:
+            run_id = runs[items.index(values["-RUNS-"][0])]["run_id"]
+        window.close()
+        return run_id
+
+    def __start_crew(self, resume_run_id=None):
+        self._window["-START_BTN-"].update(disabled=True)
+        self._window["-RESUME_BTN-"].update(disabled=True)
+        self._window["-STOP_BTN-"].update(disabled=False)
+        self._is_running = True
+        self._stop_event.clear()
+        self._crew_thread = threading.Thread(
+            target=autowx_gzh,
+            args=(self._stop_event, True, resume_run_id),
+            daemon=True,
+        )
+        self._crew_thread.start()
+
     def __save_ui_log(self, log_entry):
         with open(self._ui_log_path, "a", encoding="utf-8") as f:
             f.write(log_entry + "\n")
@@ -145,6 +190,7 @@ class MainGUI(object):
                     msg["value"].startswith("任务完成！") or msg["value"] == "CrewAI 任务被终止"
                 ):
                     self._window["-START_BTN-"].update(disabled=False)
+                    self._window["-RESUME_BTN-"].update(disabled=False)
                     self._window["-STOP_BTN-"].update(disabled=True)
                     self._is_running = False
                     self._crew_thread = None
@@ -156,6 +202,7 @@ class MainGUI(object):
                         non_blocking=True,
                     )
                     self._window["-START_BTN-"].update(disabled=False)
+                    self._window["-RESUME_BTN-"].update(disabled=False)
                     self._window["-STOP_BTN-"].update(disabled=True)
                     self._is_running = False
                     self._crew_thread = None
@@ -192,16 +239,41 @@ class MainGUI(object):
                         title="系统提示",
                         icon=self.__get_icon(),
                     )
-                    self._window["-START_BTN-"].update(disabled=True)
-                    self._window["-STOP_BTN-"].update(disabled=False)
-                    self._is_running = True
-                    self._stop_event.clear()
-                    self._crew_thread = threading.Thread(
-                        target=autowx_gzh,
-                        args=(self._stop_event, True),
-                        daemon=True,
+                    self.__start_crew()
+            elif event == "-RESUME_BTN-":
+                config = Config.get_instance()
+                if not config.validate_config():
+                    sg.popup_error(
+                        f"无法执行，配置错误：{config.error_message}",
+                        title="系统提示",
+                        icon=self.__get_icon(),
+                        non_blocking=True,
+                    )
+                    log.print_log(config.error_message, True, "error")
+                elif not self._is_running:
+                    run_id = self.__select_failed_run()
+                    if run_id is not None:
+                        self.__start_crew(run_id)
+            elif event == "-ENQUEUE_BTN-":
+                config = Config.get_instance()
+                if not config.validate_config():
+                    sg.popup_error(
+                        f"无法加入队列，配置错误：{config.error_message}",
+                        title="系统提示",
+                        icon=self.__get_icon(),
+                        non_blocking=True,
+                    )
+                    log.print_log(config.error_message, True, "error")
+                else:
+                    # 只加入任务，由后台 worker 进程执行，界面关闭不影响
+                    total = enqueue_jobs(1, True)
+                    sg.popup(
+                        f"已为每个公众号加入1个任务（共{total}个）\n"
+                        "请运行 python -m src.ai_auto_wxgzh.jobs.worker 执行任务队列",
+                        title="系统提示",
+                        icon=self.__get_icon(),
+                        non_blocking=True,
                     )
-                    self._crew_thread.start()
             elif event == "-STOP_BTN-":
                 if self._is_running and self._crew_thread and self._crew_thread.is_alive():
                     self._stop_event.set()
@@ -212,6 +284,7 @@ class MainGUI(object):
                         log.print_log("CrewAI 任务被终止", True)
                     self._crew_thread = None
                     self._window["-START_BTN-"].update(disabled=False)
+                    self._window["-RESUME_BTN-"].update(disabled=False)
                     self._window["-STOP_BTN-"].update(disabled=True)
                     self._is_running = False
                     sg.popup(
@@ -0,0 +1,280 @@
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Optional
+
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.utils.workspace import new_run_id
+
+
+# 任务队列数据库保存在数据目录（见 utils.get_data_dir）jobs下
+JOBS_DIR = "jobs"
+DB_FILE = "jobs.db"
+
+# 任务状态：排队中 -> 执行中 -> 发布中 -> 完成/失败
+QUEUED = "queued"
+RUNNING = "running"
+PUBLISHING = "publishing"
+DONE = "done"
+FAILED = "failed"
+STATES = (QUEUED, RUNNING, PUBLISHING, DONE, FAILED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    publish_key TEXT NOT NULL UNIQUE,
+    appid TEXT NOT NULL,
+    author TEXT,
+    run_id TEXT NOT NULL,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    not_before REAL NOT NULL,
+    lease_owner TEXT,
+    lease_expires REAL,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, not_before);
+"""
+
+
+@dataclass
+class Job:
+    id: int
+    publish_key: str
+    appid: str
+    author: Optional[str]
+    run_id: str
+    state: str
+    attempts: int
+    max_attempts: int
+    not_before: float
+    lease_owner: Optional[str]
+    lease_expires: Optional[float]
+    result: Optional[str]
+    created_at: float
+    updated_at: float
+
+
+class JobQueue:
+    """
+    SQLite 持久化的文章生成任务队列，可被多个进程（界面、命令行、worker）同时使用：
+    - 每个任务在入队时分配运行ID，重复执行都在同一个运行工作目录中，已完成的阶段和
+      发布步骤（见检查点）不会重复执行，所以同一任务最多发布一次
+    - publish_key 唯一，相同 publish_key 重复入队只保留一个任务（幂等入队）
+    - worker 领取任务时获得租约，执行期间需续租；worker 异常退出、租约过期后任务可被
+      重新领取（至少执行一次），失败的任务在 max_attempts 次内延迟重试
+    """
+
+    def __init__(self, db_path=None):
+        if db_path is None:
+            jobs_dir = utils.get_data_dir(JOBS_DIR)
+            utils.mkdir(jobs_dir)
+            db_path = os.path.join(jobs_dir, DB_FILE)
+        self.db_path = os.path.normpath(db_path)
+        # WAL 模式下读写互不阻塞，多个worker同时访问时减少等待（只能在事务外设置）
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        # 每次操作使用独立连接，多线程、多进程间由SQLite的锁保证一致
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        return _Transaction(conn)
+
+    def enqueue(self, appid, author=None, publish_key=None, max_attempts=3, not_before=None):
+        """加入一个任务，返回任务ID；publish_key 已存在时不重复加入，返回已有任务的ID"""
+        now = time.time()
+        run_id = new_run_id()
+        publish_key = publish_key or f"{appid}:{run_id}"
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR IGNORE INTO jobs (publish_key, appid, author, run_id, state,"
+                " max_attempts, not_before, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    publish_key,
+                    appid,
+                    author,
+                    run_id,
+                    QUEUED,
+                    max_attempts,
+                    not_before or now,
+                    now,
+                    now,
+                ),
+            )
+            row = conn.execute(
+                "SELECT id FROM jobs WHERE publish_key = ?", (publish_key,)
+            ).fetchone()
+        return row["id"]
+
+    def lease(self, owner, lease_seconds) -> Optional[Job]:
+        """
+        领取一个可执行的任务：到达执行时间的排队任务，或租约已过期的执行中/发布中任务
+        领取后状态为 running，返回None表示没有可执行的任务
+        """
+        now = time.time()
+        with self._connect() as conn:
+            while True:
+                row = conn.execute(
+                    "SELECT * FROM jobs WHERE (state = ? AND not_before <= ?)"
+                    " OR (state IN (?, ?) AND lease_expires < ?) ORDER BY not_before, id LIMIT 1",
+                    (QUEUED, now, RUNNING, PUBLISHING, now),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["state"] == QUEUED or row["attempts"] < row["max_attempts"]:
+                    break
+                # worker 多次在执行中退出（如进程崩溃），不再重试
+                conn.execute(
+                    "UPDATE jobs SET state = ?, lease_owner = NULL, result = ?, updated_at = ?"
+                    " WHERE id = ?",
+                    (FAILED, "执行中断且超过最大执行次数", now, row["id"]),
+                )
+
+            conn.execute(
+                "UPDATE jobs SET state = ?, attempts = attempts + 1, lease_owner = ?,"
+                " lease_expires = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, owner, now + lease_seconds, now, row["id"]),
+            )
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        return Job(**dict(row))
+
+    def heartbeat(self, job_id, owner, lease_seconds):
+        """续租，租约已被其他worker领取时返回False"""
+        return self._update_owned(
+            job_id, owner, "lease_expires = ?", (time.time() + lease_seconds,)
+        )
+
+    def mark_publishing(self, job_id, owner):
+        return self._update_owned(job_id, owner, "state = ?", (PUBLISHING,))
+
+    def complete(self, job_id, owner, result=None):
+        return self._update_owned(
+            job_id, owner, "state = ?, lease_owner = NULL, result = ?", (DONE, result)
+        )
+
+    def fail(self, job_id, owner, result=None, retry_delay=0, retry=True):
+        """执行失败：未超过最大次数时重新排队（retry_delay 秒后执行），否则标记为失败"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?",
+                (job_id, owner),
+            ).fetchone()
+            if row is None:
+                return False
+            now = time.time()
+            if retry and row["attempts"] < row["max_attempts"]:
+                state, not_before = QUEUED, now + retry_delay
+            else:
+                state, not_before = FAILED, now
+            conn.execute(
+                "UPDATE jobs SET state = ?, not_before = ?, lease_owner = NULL, result = ?,"
+                " updated_at = ? WHERE id = ?",
+                (state, not_before, result, now, job_id),
+            )
+        return True
+
+    def retry(self, job_id):
+        """失败的任务重新排队，重新计算执行次数（已完成的阶段仍不会重复执行）"""
+        now = time.time()
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, attempts = 0, not_before = ?, updated_at = ?"
+                " WHERE id = ? AND state = ?",
+                (QUEUED, now, now, job_id, FAILED),
+            )
+        return cursor.rowcount > 0
+
+    def get(self, job_id) -> Optional[Job]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job(**dict(row)) if row else None
+
+    def list_jobs(self, state=None, limit=100) -> List[Job]:
+        """按创建时间倒序返回任务，可按状态过滤"""
+        sql, args = "SELECT * FROM jobs", ()
+        if state is not None:
+            sql, args = sql + " WHERE state = ?", (state,)
+        with self._connect() as conn:
+            rows = conn.execute(sql + " ORDER BY id DESC LIMIT ?", args + (limit,)).fetchall()
+        return [Job(**dict(row)) for row in rows]
+
+    def count_by_key_prefix(self, prefix):
+        """publish_key 以 prefix 开头的任务数（不论状态），用于按公众号、日期统计已安排的任务"""
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n FROM jobs WHERE substr(publish_key, 1, ?) = ?",
+                (len(prefix), prefix),
+            ).fetchone()
+        return row["n"]
+
+    def count_by_appid(self, appid, since):
+        """
+        公众号在 since（时间戳）之后加入或完成的任务数，不论入队方式（定时、界面、命令行），
+        失败的任务没有群发，不计入；用于按公众号统计每天的发布篇数
+        """
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT COUNT(*) AS n FROM jobs WHERE appid = ? AND state != ?"
+                " AND (created_at >= ? OR (state = ? AND updated_at >= ?))",
+                (appid, FAILED, since, DONE, since),
+            ).fetchone()
+        return row["n"]
+
+    def counts(self):
+        """各状态的任务数量"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT state, COUNT(*) AS n FROM jobs GROUP BY state").fetchall()
+        counts = dict.fromkeys(STATES, 0)
+        counts.update({row["state"]: row["n"] for row in rows})
+        return counts
+
+    def _update_owned(self, job_id, owner, assignments, args):
+        # 只有持有租约的worker可以更新，租约过期被重新领取后旧worker的更新无效
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? WHERE id = ? AND lease_owner = ?",
+                args + (time.time(), job_id, owner),
+            )
+        return cursor.rowcount > 0
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE 事务：领取任务时先查询再更新，防止两个worker领取到同一任务"""
+
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        finally:
+            self.conn.close()
+        return False
+
+
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> JobQueue:
+    """进程内共享的任务队列"""
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
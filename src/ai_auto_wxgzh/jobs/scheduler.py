@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+import argparse
+import random
+import signal
+import threading
+from datetime import datetime, timedelta
+
+from src.ai_auto_wxgzh import crew_main
+from src.ai_auto_wxgzh.jobs import job_queue
+from src.ai_auto_wxgzh.jobs.worker import Worker
+from src.ai_auto_wxgzh.tools import hotnews
+from src.ai_auto_wxgzh.tools import template_registry
+from src.ai_auto_wxgzh.tools import wx_token
+from src.ai_auto_wxgzh.utils import log
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.config.config import Config
+
+
+class Scheduler:
+    """
+    按发布时间段定时把任务加入任务队列：
+    - 每个公众号每天在每个发布时间段内随机选一个时间（抖动），到达后加入任务，错过的时间段不补，
+      不同公众号的发布时间错开，不会同时请求
+    - 每天最多 daily_limit 篇（订阅号每天只能群发1次），按公众号统计当天加入或完成的所有任务
+      （包括界面、命令行加入的），群发次数按公众号限制；每个时间段的 publish_key 唯一，重启后不会重复加入
+    """
+
+    KEY_PREFIX = "schedule"
+
+    def __init__(self, queue, stop_event=None):
+        self.queue = queue
+        self.stop_event = stop_event or threading.Event()
+        self._plans = {}  # (appid, 日期) -> [(发布时间, 时间段结束时间, 时间段序号)]
+
+    def plan(self, appid, day, windows):
+        """当天的发布时间（每个时间段一个），按公众号和日期生成，重启后不变"""
+        key = (appid, day)
+        if key not in self._plans:
+            # 只保留当天的计划
+            self._plans = {k: v for k, v in self._plans.items() if k[1] == day}
+            midnight = datetime.combine(day, datetime.min.time())
+            rng = random.Random(f"{appid}:{day.isoformat()}")
+            plan = []
+            for index, window in enumerate(windows):
+                start, end = utils.parse_time_window(window)
+                run_at = midnight + timedelta(minutes=rng.uniform(start, end))
+                plan.append((run_at, midnight + timedelta(minutes=end), index))
+            self._plans[key] = sorted(plan)
+        return self._plans[key]
+
+    def tick(self, now=None):
+        """加入到达发布时间的任务，返回本次加入的任务数"""
+        now = now or datetime.now()
+        config = Config.get_instance()
+        added = 0
+        day_start = datetime.combine(now.date(), datetime.min.time()).timestamp()
+        for credential in crew_main.valid_credentials(config):
+            appid = credential["appid"]
+            windows, daily_limit = config.schedule_account(appid)
+            prefix = f"{self.KEY_PREFIX}:{appid}:{now.date().isoformat()}:"
+            for run_at, window_end, index in self.plan(appid, now.date(), windows):
+                if not run_at <= now < window_end:
+                    continue
+                if self.queue.count_by_appid(appid, day_start) >= daily_limit:
+                    break
+                scheduled = self.queue.count_by_key_prefix(prefix)
+                self.queue.enqueue(
+                    appid,
+                    credential["author"],
+                    publish_key=f"{prefix}{index}",
+                    max_attempts=config.jobs_max_attempts,
+                )
+                if self.queue.count_by_key_prefix(prefix) > scheduled:
+                    added += 1
+                    log.print_log(
+                        f"[{credential['author']}] 到达发布时间 {windows[index]}，已加入任务"
+                    )
+        return added
+
+    def run(self):
+        interval = Config.get_instance().schedule_check_interval
+        while not self.stop_event.is_set():
+            try:
+                self.tick()
+            except Exception as e:
+                log.print_log(f"定时任务出错：{e}")
+            self.stop_event.wait(interval)
+
+
+def warm_up(config):
+    """启动时预先加载，之后各次运行直接复用（进程常驻，不再每次冷启动）"""
+    template_registry.get_registry()
+    hotnews.get_cache()
+    for credential in crew_main.valid_credentials(config):
+        if wx_token.get_store().get(credential["appid"], credential["appsecret"]) is None:
+            log.print_log(f"[{credential['author']}] 获取access_token失败，请检查appid和appsecret")
+
+
+def print_plan(scheduler, config):
+    today = datetime.now().date()
+    for credential in crew_main.valid_credentials(config):
+        windows, daily_limit = config.schedule_account(credential["appid"])
+        plan = scheduler.plan(credential["appid"], today, windows)
+        times = "，".join(run_at.strftime("%H:%M") for run_at, _, _ in plan)
+        print(f"{credential['author']}  每天最多{daily_limit}篇  今天计划：{times or '无'}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="常驻运行，按发布时间段定时生成、发布文章")
+    parser.add_argument("--plan", action="store_true", help="查看今天的发布计划（不执行）")
+    args = parser.parse_args()
+
+    config = Config.get_instance()
+    if not config.load_config():
+        log.print_log("加载配置失败，请检查是否有配置！")
+        return
+    elif not config.validate_config():
+        log.print_log(f"配置填写有错误：{config.error_message}")
+        return
+    crew_main.setup_llm_env(config)
+
+    queue = job_queue.get_queue()
+    stop_event = threading.Event()
+    scheduler = Scheduler(queue, stop_event)
+    if args.plan:
+        print_plan(scheduler, config)
+        return
+
+    warm_up(config)
+    # worker 在同一进程中执行任务，复用已加载的配置、模板、access_token和HTTP连接池
+    worker = Worker(
+        queue,
+        config.jobs_concurrency,
+        config.jobs_lease_seconds,
+        config.jobs_retry_delay,
+        config.jobs_poll_interval,
+        stop_event,
+    )
+    worker_thread = threading.Thread(target=worker.run, name="job_worker_main")
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: stop_event.set())
+
+    log.print_log("定时发布已启动，按 Ctrl+C 退出")
+    worker_thread.start()
+    scheduler.run()
+    worker_thread.join()
+
+
+if __name__ == "__main__":
+    main()
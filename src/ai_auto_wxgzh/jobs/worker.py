@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+import argparse
+import os
+import signal
+import socket
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from src.ai_auto_wxgzh import crew_main
+from src.ai_auto_wxgzh.jobs import job_queue
+from src.ai_auto_wxgzh.utils import log
+from src.ai_auto_wxgzh.config.config import Config
+
+
+class Worker:
+    """
+    无界面运行，持续从任务队列领取任务并执行，最多同时执行 concurrency 个任务
+    执行期间定时续租，进程退出后未完成的任务在租约过期后由其他worker继续执行，
+    同一任务总是在入队时分配的运行ID中执行，已完成的阶段和发布步骤不会重复
+    """
+
+    def __init__(
+        self,
+        queue,
+        concurrency=1,
+        lease_seconds=900,
+        retry_delay=300,
+        poll_interval=5,
+        stop_event=None,
+    ):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.lease_seconds = lease_seconds
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.stop_event = stop_event or threading.Event()
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self._active = {}  # 正在执行的任务 job_id -> Job
+        self._lock = threading.Lock()
+
+    def run(self, drain=False):
+        """执行任务直到收到停止信号；drain 为True时没有可执行的任务就退出"""
+        log.print_log(f"worker {self.owner} 开始执行任务队列，并发数：{self.concurrency}")
+        heartbeat = threading.Thread(target=self._heartbeat_loop, name="job_heartbeat", daemon=True)
+        heartbeat.start()
+
+        with ThreadPoolExecutor(
+            max_workers=self.concurrency, thread_name_prefix="job_worker"
+        ) as pool:
+            while not self.stop_event.is_set():
+                with self._lock:
+                    busy = len(self._active)
+                if busy >= self.concurrency:
+                    self.stop_event.wait(1)
+                    continue
+
+                job = self.queue.lease(self.owner, self.lease_seconds)
+                if job is None:
+                    if drain and busy == 0:
+                        break
+                    self.stop_event.wait(self.poll_interval)
+                    continue
+
+                with self._lock:
+                    self._active[job.id] = job
+                pool.submit(self._process, job)
+
+        crew_main.wait_publish_results()
+        crew_main.report_http_metrics()
+        log.print_log(f"worker {self.owner} 已退出")
+
+    def _process(self, job):
+        try:
+            config = Config.get_instance()
+            credential = next(
+                (c for c in crew_main.valid_credentials(config) if c["appid"] == job.appid),
+                None,
+            )
+            if credential is None:
+                self.queue.fail(job.id, self.owner, "公众号未配置或已删除", retry=False)
+                log.print_log(f"任务 {job.id} 失败：公众号 {job.appid} 未配置或已删除")
+                return
+
+            log.print_log(
+                f"[{credential['author']}] 开始执行任务 {job.id}（第{job.attempts}次），"
+                f"运行ID：{job.run_id}"
+            )
+            ret = crew_main.run_credential(
+                credential,
+                self.stop_event,
+                False,
+                job.run_id,
+                on_publish=lambda: self.queue.mark_publishing(job.id, self.owner),
+            )
+            if ret["success"]:
+                self.queue.complete(job.id, self.owner, ret["result"])
+            else:
+                self.queue.fail(job.id, self.owner, ret["result"], self.retry_delay)
+        except Exception as e:
+            log.print_log(f"任务 {job.id} 执行出错：{e}")
+            self.queue.fail(job.id, self.owner, str(e), self.retry_delay)
+        finally:
+            with self._lock:
+                self._active.pop(job.id, None)
+
+    def _heartbeat_loop(self):
+        # 租约剩余三分之二时续租
+        while not self.stop_event.wait(self.lease_seconds / 3):
+            with self._lock:
+                job_ids = list(self._active)
+            for job_id in job_ids:
+                try:
+                    if not self.queue.heartbeat(job_id, self.owner, self.lease_seconds):
+                        log.print_log(f"任务 {job_id} 的租约已失效，可能被其他worker重复执行")
+                except Exception as e:
+                    log.print_log(f"任务 {job_id} 续租失败：{e}")
+
+
+def print_jobs(queue, limit=20):
+    counts = queue.counts()
+    print("，".join(f"{state}: {counts[state]}" for state in job_queue.STATES))
+    for job in queue.list_jobs(limit=limit):
+        updated_at = datetime.fromtimestamp(job.updated_at).strftime("%Y-%m-%d %H:%M:%S")
+        print(
+            f"{job.id:>6}  {job.state:<10}  {job.author}  {job.run_id}  "
+            f"第{job.attempts}/{job.max_attempts}次  {updated_at}  {job.result or ''}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="执行任务队列中的文章生成、发布任务")
+    parser.add_argument("--concurrency", type=int, help="同时执行的任务数，默认使用配置")
+    parser.add_argument("--once", action="store_true", help="执行完当前可执行的任务后退出")
+    parser.add_argument("--status", action="store_true", help="查看任务队列状态")
+    parser.add_argument("--retry", type=int, metavar="JOB_ID", help="失败的任务重新排队")
+    args = parser.parse_args()
+
+    queue = job_queue.get_queue()
+    if args.status:
+        print_jobs(queue)
+        return
+    if args.retry is not None:
+        if queue.retry(args.retry):
+            print(f"任务 {args.retry} 已重新排队")
+        else:
+            print(f"任务 {args.retry} 不存在或不是失败状态")
+        return
+
+    config = Config.get_instance()
+    if not config.load_config():
+        log.print_log("加载配置失败，请检查是否有配置！")
+        return
+    elif not config.validate_config():
+        log.print_log(f"配置填写有错误：{config.error_message}")
+        return
+    crew_main.setup_llm_env(config)
+
+    worker = Worker(
+        queue,
+        args.concurrency or config.jobs_concurrency,
+        config.jobs_lease_seconds,
+        config.jobs_retry_delay,
+        config.jobs_poll_interval,
+    )
+    # 收到终止信号（Ctrl+C）后不再领取新任务，执行中的任务尽快结束，未完成的下次继续
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda signum, frame: worker.stop_event.set())
+    worker.run(drain=args.once)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,16 @@
 from crewai.tools import BaseTool
-from typing import Type
+from typing import Callable, Optional, Type
 from pydantic import BaseModel, Field
-import os
-import glob
-import random
 import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from src.ai_auto_wxgzh.tools.wx_publisher import WeixinPublisher
+from src.ai_auto_wxgzh.tools import wx_publish_poller
+from src.ai_auto_wxgzh.tools import template_registry
 from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.utils.article import Article
+from src.ai_auto_wxgzh.utils.workspace import RunWorkspace
+from src.ai_auto_wxgzh.config.config import Config
 
 
 class ReadTemplateToolInput(BaseModel):
@@ -21,88 +24,115 @@ class ReadTemplateTool(BaseTool):
     args_schema: Type[BaseModel] = ReadTemplateToolInput
 
     def _run(self, article_file: str) -> str:
-        # 获取模板文件的绝对路径
-        template_dir_abs = os.path.join(
-            utils.get_current_dir(),
-            "knowledge/templates",
+        # 模板已预先压缩并缓存在注册表中，这里直接从内存返回
+        registry = template_registry.get_registry()
+        config = Config.get_instance()
+        # 预算包含文章本身，模板只能使用剩余部分
+        token_budget = config.template_token_budget - template_registry.estimate_tokens(
+            article_file or ""
+        )
+        _, template = registry.select(
+            config.template_select_mode, token_budget, config.template_strip_content
         )
-        template_files_abs = glob.glob(os.path.join(template_dir_abs, "*.html"))
 
-        if not template_files_abs:
+        if template is None:
             print(
-                f"在目录 '{template_dir_abs}' 中未找到任何模板文件。如果没有模板请将config.yaml中的use_template设置为false"
+                f"在目录 '{registry.template_dir}' 中未找到任何模板文件。"
+                "如果没有模板请将config.yaml中的use_template设置为false"
             )
             # 出现这种错误无法继续，立即终止程序，防止继续消耗Tokens（不终止CrewAI可能会重试）
             sys.exit(1)
 
-        selected_template_file = random.choice(template_files_abs)
+        return template
 
-        with open(selected_template_file, "r", encoding="utf-8") as file:
-            selected_template_content = file.read()
 
-        return utils.compress_html(selected_template_content)  # 压缩html，降低token消耗
+class PublisherToolInput(BaseModel):
+    """无需参数：公众号、文生图配置绑定在工具实例上，不会出现在提示词中"""
 
 
-class PublisherToolInput(BaseModel):
-    appid: str = Field(description="微信公众号 AppID")
-    appsecret: str = Field(description="微信公众号 Key")
-    author: str = Field(description="微信公众号作者")
-    img_api_type: str = Field(description="文生图平台方")
-    img_api_key: str = Field(description="文生图平台方 Key")
-    img_api_model: str = Field(description="文生图模型")
+# 文章配图并发下载、上传的线程数
+IMAGE_UPLOAD_WORKERS = 4
 
 
 # 2. Publisher Tool
 class PublisherTool(BaseTool):
     name: str = "publisher_tool"
-    description: str = "从排版设计后的文章中提取内容，保存为最终文章，并发布到微信公众号。"
+    description: str = "从排版设计后的文章中提取内容，保存为最终文章，并发布到微信公众号"
     args_schema: Type[BaseModel] = PublisherToolInput
+    run_id: str = Field(default="", description="本次运行的ID，用于定位工作目录")
+    appid: str = Field(default="", description="微信公众号 AppID")
+    appsecret: str = Field(default="", description="微信公众号 Key")
+    author: str = Field(default="", description="微信公众号作者")
+    img_api_type: str = Field(default="", description="文生图平台方")
+    img_api_key: str = Field(default="", description="文生图平台方 Key")
+    img_api_model: str = Field(default="", description="文生图模型")
+    on_publish: Optional[Callable[[], None]] = Field(
+        default=None, exclude=True, description="开始发布前调用"
+    )
 
-    def _run(
-        self,
-        appid: str,
-        appsecret: str,
-        author: str,
-        img_api_type: str,
-        img_api_key: str,
-        img_api_model: str,
-    ) -> str:
-        # 自定义工具接收上一个task数据有很大随机性，这里只能从保存的文件读取数据
-        tmp_article = os.path.join(utils.get_current_dir(), "tmp_article.html")
-
-        try:
-            with open(tmp_article, "r", encoding="utf-8") as file:
-                content = file.read()
-        except Exception as e:
-            print(str(e))
-            return "读取tmp_article.html失败，无法发布文章！"
-
-        try:
-            content = utils.decompress_html(content)
-        except Exception as e:
-            print(f"解压html出错：{str(e)}")
-
-        # 提取审核报告中修改后的文章
-        article = utils.extract_modified_article(content)
-
-        # 发布到微信公众号
-        result, article = self.pub2wx(
-            article,
-            appid,
-            appsecret,
-            author,
-            img_api_type,
-            img_api_key,
-            img_api_model,
+    def _run(self) -> str:
+        return publish_run(
+            RunWorkspace(self.run_id),
+            self.appid,
+            self.appsecret,
+            self.author,
+            self.img_api_type,
+            self.img_api_key,
+            self.img_api_model,
+            self.on_publish,
         )
-        # 保存为 final_article.html
-        with open("final_article.html", "w", encoding="utf-8") as file:
-            file.write(article)
 
-        return result
 
-    def pub2wx(
-        self,
+# pub2wx 的发布步骤：有发布草稿（freepublish）检查点表示文章已发布，可通过链接访问，
+# 有群发检查点才会显示到公众号文章列表，与 pub2wx 返回成功一致
+PUBLISHED_STEP = "publish_id"
+PUBLISH_DONE_STEP = "sendall"
+
+
+def is_published(workspace):
+    """本次运行是否已发布文章（可能还未群发），发布专家（agent 模式）发布时同样适用"""
+    return workspace.read_checkpoint(PUBLISHED_STEP) is not None
+
+
+def is_mass_sent(workspace):
+    """本次运行是否已群发，群发后才算完整发布"""
+    return workspace.read_checkpoint(PUBLISH_DONE_STEP) is not None
+
+
+def publish_run(
+    workspace,
+    appid,
+    appsecret,
+    author,
+    img_api_type,
+    img_api_key,
+    img_api_model,
+    on_publish=None,
+) -> str:
+    """
+    发布本次运行排版后的文章，保存最终文章，返回发布结果
+    直接发布模式（publish_mode: direct）在 CrewAI 执行完成后直接调用，agent 模式由 PublisherTool 调用
+    on_publish 在开始发布前调用（任务队列据此更新任务状态）
+    """
+    # 自定义工具接收上一个task数据有很大随机性，这里只能从本次运行工作目录保存的文件读取数据
+    try:
+        with open(workspace.tmp_article, "r", encoding="utf-8") as file:
+            content = file.read()
+    except Exception as e:
+        print(str(e))
+        return f"读取{workspace.tmp_article}失败，无法发布文章！"
+
+    # 提取审核报告中修改后的文章，只解析一次，后续步骤共用
+    try:
+        article = Article.from_output(content)
+    except Exception as e:
+        print(str(e))
+        return f"解析{workspace.tmp_article}失败，无法发布文章！"
+
+    # 发布到微信公众号
+    if on_publish is not None:
+        on_publish()
+    result, article = pub2wx(
         article,
         appid,
         appsecret,
@@ -110,68 +140,171 @@ class PublisherTool(BaseTool):
         img_api_type,
         img_api_key,
         img_api_model,
-    ):
-        try:
-            title, digest = utils.extract_html(article)
-        except Exception as e:
-            return f"从文章中提取标题、摘要信息出错: {e}", article
-
-        publisher = WeixinPublisher(
-            appid, appsecret, author, img_api_type, img_api_key, img_api_model
-        )
+        workspace.image_dir,
+        workspace,
+    )
+    # 保存为工作目录下的 final_article.html
+    with open(workspace.final_article, "w", encoding="utf-8") as file:
+        file.write(article)
+    workspace.write_meta(publish_result=result)
+
+    return result
+
+
+def upload_article_images(publisher, image_urls, image_dir):
+    """
+    并发下载文章配图并上传到微信，返回 {原图片url: 微信图片url}
+    单张图片失败不影响其他图片，失败的图片保持原url
+    """
+
+    def _upload(image_url):
+        local_filename = utils.download_and_save_image(image_url, image_dir)
+        if not local_filename:
+            return None
+        ret = publisher.upload_image(local_filename)
+        return ret[1] if ret else None
+
+    url_map = {}
+    if not image_urls:
+        return url_map
 
+    with ThreadPoolExecutor(
+        max_workers=min(IMAGE_UPLOAD_WORKERS, len(image_urls)), thread_name_prefix="wx_img"
+    ) as pool:
+        futures = {pool.submit(_upload, image_url): image_url for image_url in image_urls}
+        for future in as_completed(futures):
+            image_url = futures[future]
+            try:
+                url = future.result()
+            except Exception as e:
+                print(f"上传配图出错：{image_url}，错误：{e}")
+                continue
+            if url:
+                url_map[image_url] = url
+            else:
+                print(f"上传配图失败，保留原图片链接：{image_url}")
+
+    return url_map
+
+
+def pub2wx(
+    article,
+    appid,
+    appsecret,
+    author,
+    img_api_type,
+    img_api_key,
+    img_api_model,
+    image_dir=None,
+    workspace=None,
+):
+    """发布文章到微信公众号，传入 workspace 时各步骤记录检查点，继续运行时跳过已完成的步骤"""
+    image_dir = image_dir or utils.get_current_dir("image")
+    if isinstance(article, str):
+        article = Article(article)
+    title, digest = article.title, article.digest
+    if title is None or digest is None:
+        return "从文章中提取标题、摘要信息出错", article.body
+
+    publisher = WeixinPublisher(
+        appid, appsecret, author, img_api_type, img_api_key, img_api_model, image_dir
+    )
+
+    def step(name, func):
+        """发布子步骤：本次运行已完成的（有检查点）直接使用结果，--resume 时不会重复执行"""
+        if workspace is not None:
+            value = workspace.read_checkpoint(name)
+            if value is not None:
+                print(f"发布步骤 {name} 已完成（检查点），跳过执行")
+                return value
+        value = func()
+        if value is not None and workspace is not None:
+            workspace.write_checkpoint(name, value)
+        return value
+
+    def upload_cover():
         image_url = publisher.generate_img(
             "主题：" + title.split("|")[-1] + "，内容：" + digest,
             "900*384",
         )
         if image_url is None:
             print("生成图片出错，使用默认图片")
+        ret = publisher.upload_image(image_url)
+        return ret[0] if ret else None
+
+    def update_cover(media_id):
+        """封面素材失效并重新上传后更新检查点，继续运行时使用新的素材"""
+        new_media_id = publisher.current_media_id(media_id)
+        if new_media_id != media_id and workspace is not None:
+            workspace.write_checkpoint("cover_media_id", new_media_id)
+        return new_media_id
+
+    # 封面图片
+    media_id = step("cover_media_id", upload_cover)
+    if media_id is None:
+        return "上传封面图片出错，无法发布文章", article.body
+
+    # 这里需要将文章中的图片url替换为上传到微信返回的图片url
+    body = article.body
+    try:
+        # 继续运行时只上传上次未成功的配图
+        url_map = (workspace.read_checkpoint("image_urls") if workspace else None) or {}
+        missing = [url for url in article.image_urls if url not in url_map]
+        if missing:
+            url_map.update(upload_article_images(publisher, missing, image_dir))
+            if workspace is not None:
+                workspace.write_checkpoint("image_urls", url_map)
+        body = utils.replace_urls(body, url_map, article.image_refs)
+    except Exception as e:
+        print(f"上传配图出错，影响阅读，可继续发布文章:{e}")
+
+    draft_media_id = step(
+        "draft_media_id",
+        lambda: getattr(publisher.add_draft(body, title, digest, media_id), "publishId", None),
+    )
+    media_id = update_cover(media_id)
+    if draft_media_id is None:
+        # 添加草稿失败，不再继续执行
+        return "上传草稿失败，无法发布文章", body
+
+    # 可以利用返回值，做重试等处理
+    publish_id = step(
+        PUBLISHED_STEP, lambda: getattr(publisher.publish(draft_media_id), "publishId", None)
+    )
+    if publish_id is None:
+        return "发布草稿失败，无法继续发布文章", body
+
+    def add_menu(article_url):
+        # 该接口需要认证，将文章添加到菜单中去，用户可以通过菜单“最新文章”获取到
+        _ = step("menu", lambda: publisher.create_menu(article_url))
+
+    def on_published(article_url, status):
+        if article_url is None:
+            print("无法获取到文章URL")  # 这里无所谓，不影响群发
+            return
+        if workspace is not None:
+            workspace.write_checkpoint("article_url", article_url)
+            workspace.write_meta(article_url=article_url)
+        add_menu(article_url)
+
+    # 文章链接在后台轮询获取，不等待发布完成，直接继续后面的步骤
+    article_url = workspace.read_checkpoint("article_url") if workspace else None
+    if article_url is not None:
+        add_menu(article_url)
+    else:
+        wx_publish_poller.get_poller().submit(publisher, publish_id, on_published)
+
+    # 只有下面执行成功，文章才会显示到公众号列表，否则只能通过后台复制链接分享访问
+    # 通过群发使得文章显示到公众号列表 ——> 该接口需要认证
+    news_media_id = step(
+        "news_media_id", lambda: publisher.media_uploadnews(body, title, digest, media_id)
+    )
+    update_cover(media_id)
+    if news_media_id is None:
+        return "上传图文素材失败，无法显示到公众号文章列表", body
+
+    sndall_ret = step(PUBLISH_DONE_STEP, lambda: publisher.message_mass_sendall(news_media_id))
+    if sndall_ret is None:
+        return "无法将文章群发给用户，无法显示到公众号文章列表", body
 
-        # 封面图片
-        media_id, _ = publisher.upload_image(image_url)
-        if media_id is None:
-            return "上传封面图片出错，无法发布文章", article
-
-        # 这里需要将文章中的图片url替换为上传到微信返回的图片url
-        try:
-            image_urls = utils.extract_image_urls(article)
-            for image_url in image_urls:
-                local_filename = utils.download_and_save_image(
-                    image_url,
-                    utils.get_current_dir("image"),
-                )
-                if local_filename:
-                    _, url = publisher.upload_image(local_filename)
-                    article = article.replace(image_url, url)
-        except Exception as e:
-            print(f"上传配图出错，影响阅读，可继续发布文章:{e}")
-
-        add_draft_result = publisher.add_draft(article, title, digest, media_id)
-        if add_draft_result is None:
-            # 添加草稿失败，不再继续执行
-            return "上传草稿失败，无法发布文章", article
-
-        publish_result = publisher.publish(
-            add_draft_result.publishId
-        )  # 可以利用返回值，做重试等处理
-        if publish_result is None:
-            return "发布草稿失败，无法继续发布文章", article
-
-        article_url = publisher.poll_article_url(publish_result.publishId)
-        if article_url is not None:
-            # 该接口需要认证，将文章添加到菜单中去，用户可以通过菜单“最新文章”获取到
-            _ = publisher.create_menu(article_url)
-        else:
-            print("无法获取到文章URL")  # 这里无所谓，不影响后面
-
-        # 只有下面执行成功，文章才会显示到公众号列表，否则只能通过后台复制链接分享访问
-        # 通过群发使得文章显示到公众号列表 ——> 该接口需要认证
-        media_id = publisher.media_uploadnews(article, title, digest, media_id)
-        if media_id is None:
-            return "上传图文素材失败，无法显示到公众号文章列表", article
-
-        sndall_ret = publisher.message_mass_sendall(media_id)
-        if sndall_ret is None:
-            return "无法将文章群发给用户，无法显示到公众号文章列表", article
-
-        return "成功发布文章到微信公众号", article
+    return "成功发布文章到微信公众号", body
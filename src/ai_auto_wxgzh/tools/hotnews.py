@@ -1,52 +1,184 @@
-import requests
-from typing import Optional, List, Dict
+import threading
+import time
+from typing import List, Dict
 
+from src.ai_auto_wxgzh.tools import hotnews_sources
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.utils import topic_index
+from src.ai_auto_wxgzh.config.config import Config
 
-def get_hotnews() -> Optional[List[Dict]]:
+
+class HotNewsCache:
     """
-    获取各大平台热点数据
-    返回格式: {"success": true, "data": 数组数据}
+    热点数据缓存，多个公众号/多次执行共享同一份热榜快照：
+    - ttl 内直接返回内存中的平台索引，不请求网络
+    - 过期但在 stale_ttl 内时先返回旧数据，同时后台刷新（stale-while-revalidate）
+    - 没有数据或过旧时同步获取，多个线程同时请求只会发起一次网络请求
+    - 指定 cache_file 时落盘，重启后仍可使用
+    - 数据从多个数据源并发获取（见 hotnews_sources），wanted 中的平台都拿到即返回
+    - 快照中缺少的平台只向能提供该平台的数据源单独获取，获取不到时 stale_ttl 内不再重复获取
     """
-    api_url = "https://api.vvhan.com/api/hotlist/all"
 
-    try:
-        response = requests.get(api_url, timeout=10)
-        response.raise_for_status()
+    def __init__(self, sources, ttl=600, stale_ttl=3600, cache_file=None, budget=8, wanted=None):
+        self.sources = sources
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.cache_file = cache_file
+        self.budget = budget
+        self.wanted = wanted
+        self._lock = threading.Lock()
+        self._fetch_lock = threading.Lock()
+        self._index = None
+        self._fetched_at = 0.0
+        self._missing = {}  # 单独获取失败的平台 -> 失败时间
 
-        data = response.json()
-        if data.get("success") and isinstance(data.get("data"), list):
-            return data["data"]
+        if self.cache_file:
+            data = utils.load_json(self.cache_file)
+            if data and isinstance(data.get("index"), dict):
+                self._index = data["index"]
+                self._fetched_at = data.get("fetched_at", 0.0)
 
-        return None
+    def _age(self):
+        return time.time() - self._fetched_at
 
-    except requests.exceptions.RequestException as e:
-        print(f"请求异常: {str(e)}")
-        return None
-    except ValueError as e:
-        print(f"JSON解析异常: {str(e)}")
-        return None
+    def _refresh(self):
+        """请求网络并更新索引，调用方需持有 _fetch_lock"""
+        index = hotnews_sources.fetch_hotnews(self.sources, self.budget, self.wanted)
+        if not index:
+            return False
 
+        fetched_at = time.time()
+        with self._lock:
+            self._index = index
+            self._fetched_at = fetched_at
+        self._save()
 
-def get_platform_news(platform, cnt=1):
-    platform_news = []
-    hotnews = get_hotnews()
-    if hotnews:
-        result = {}
+        return True
 
-        for pf in hotnews:
-            result[pf['name']] = [item['title'] for item in pf['data']]
-        platform_news.extend(result[platform][:cnt])
+    def _save(self):
+        if self.cache_file:
+            with self._lock:
+                index, fetched_at = self._index, self._fetched_at
 
-    return platform_news
+            try:
+                utils.save_json(self.cache_file, {"fetched_at": fetched_at, "index": index})
+            except OSError as e:
+                print(f"保存热点缓存失败: {e}")
 
+    def _background_refresh(self):
+        try:
+            self._refresh()
+        finally:
+            self._fetch_lock.release()
 
-if __name__ == "__main__":
-    hotnews = get_hotnews()
-    if hotnews:
-        result = {}
+    def get_index(self) -> Dict[str, List[str]]:
+        with self._lock:
+            index, age = self._index, self._age()
+
+        if index is not None and age < self.ttl:
+            return index
+
+        if index is not None and age < self.ttl + self.stale_ttl:
+            # 已经有刷新在进行中则直接返回旧数据
+            if self._fetch_lock.acquire(blocking=False):
+                threading.Thread(target=self._background_refresh, daemon=True).start()
+            return index
+
+        with self._fetch_lock:
+            # 等待锁期间可能已被其他线程刷新
+            with self._lock:
+                if self._index is not None and self._age() < self.ttl:
+                    return self._index
+
+            self._refresh()
+
+        with self._lock:
+            # 刷新失败时退回使用旧数据（如果有）
+            return self._index or {}
+
+    def get_titles(self, platform) -> List[str]:
+        """获取某个平台的热榜，快照中缺少该平台时单独补充获取"""
+        titles = self.get_index().get(platform)
+        if titles:
+            return titles
+
+        with self._lock:
+            missed_at = self._missing.get(platform)
+        if missed_at is not None and time.time() - missed_at < self.stale_ttl:
+            return []
+
+        sources = [source for source in self.sources if hotnews_sources.can_serve(source, platform)]
+        index = hotnews_sources.fetch_hotnews(sources, self.budget, {platform}) if sources else {}
+        titles = index.get(platform, [])
+        with self._lock:
+            if titles:
+                # 复制一份再修改，已返回给调用方的快照保持不变（聚合接口同时返回的其他平台一并更新）
+                self._index = {**(self._index or {}), **{k: v for k, v in index.items() if v}}
+                self._missing.pop(platform, None)
+            else:
+                self._missing[platform] = time.time()
+        if titles:
+            self._save()
+        return titles
 
-        for platform in hotnews:
-            result[platform['name']] = [item['title'] for item in platform['data']]
+    def invalidate(self):
+        with self._lock:
+            self._fetched_at = 0.0
+            self._missing = {}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> HotNewsCache:
+    """进程内共享的热点缓存，参数取自配置"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = Config.get_instance()
+            try:
+                ttl = config.hotnews_cache_ttl
+                stale_ttl = config.hotnews_stale_ttl
+                disk_cache = config.hotnews_disk_cache
+                source_names = config.hotnews_sources
+                source_timeout = config.hotnews_source_timeout
+                budget = config.hotnews_fetch_budget
+                platforms = {platform["name"] for platform in config.platforms}
+            except ValueError:  # 配置未加载时使用默认值
+                ttl, stale_ttl, disk_cache = 600, 3600, True
+                source_names = hotnews_sources.default_source_names()
+                source_timeout, budget, platforms = 5, 8, set()
+
+            sources = hotnews_sources.build_sources(source_names, source_timeout)
+            # 只等待有单独数据源的平台，只有聚合接口提供的平台（如虎扑）不阻塞刷新，
+            # 聚合接口较慢时这些平台在使用时再单独获取；都没有时任意数据源有结果即可
+            wanted = (platforms & hotnews_sources.dedicated_platforms(sources)) or None
+            _cache = HotNewsCache(
+                sources,
+                ttl=ttl,
+                stale_ttl=stale_ttl,
+                cache_file=utils.get_cache_path("hotnews.json") if disk_cache else None,
+                budget=budget,
+                wanted=wanted,
+            )
+        return _cache
+
+
+def get_platform_news(platform, cnt=1):
+    """获取平台热榜前cnt个话题，开启话题去重时跳过近期已使用的话题"""
+    titles = get_cache().get_titles(platform)
+    index = topic_index.get_index()
+    if index is not None:
+        titles = [title for title in titles if not index.is_used(title)]
+    return titles[:cnt]
+
+
+if __name__ == "__main__":
+    result = hotnews_sources.fetch_hotnews(
+        hotnews_sources.build_sources(hotnews_sources.default_source_names())
+    )
+    if result:
         print(result.keys())
     else:
         print("未能获取热点数据")
@@ -0,0 +1,229 @@
+import asyncio
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from src.ai_auto_wxgzh.utils import http_client
+
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+}
+
+
+def normalize_titles(titles) -> List[str]:
+    """去除首尾及多余空白、空标题和重复标题，保持原有顺序"""
+    result = []
+    seen = set()
+    for title in titles:
+        if not isinstance(title, str):
+            continue
+        title = re.sub(r"\s+", " ", title).strip()
+        if title and title not in seen:
+            seen.add(title)
+            result.append(title)
+    return result
+
+
+def build_platform_index(hotnews) -> Dict[str, List[str]]:
+    """将聚合接口的热点数据转换为 {平台名: [标题, ...]} 的索引"""
+    return {pf["name"]: normalize_titles(item["title"] for item in pf["data"]) for pf in hotnews}
+
+
+class HotNewsSource:
+    """
+    热点数据源基类，子类实现 fetch，返回 {平台名: [标题, ...]}
+    fetch 失败时直接抛出异常，由 fetch_hotnews 统一处理
+    """
+
+    name = "base"
+    platforms = None  # 能提供的平台集合，None 表示不固定（聚合接口）
+
+    def __init__(self, timeout=5):
+        self.timeout = timeout
+
+    def fetch(self) -> Dict[str, List[str]]:
+        raise NotImplementedError
+
+    async def fetch_async(self) -> Dict[str, List[str]]:
+        return await asyncio.wait_for(asyncio.to_thread(self.fetch), self.timeout)
+
+    def _get_json(self, url):
+        response = http_client.get(url, headers=HEADERS, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+
+class AggregatorSource(HotNewsSource):
+    """聚合接口，一次返回所有平台的热榜"""
+
+    name = "vvhan"
+
+    def __init__(self, timeout=5, api_url="https://api.vvhan.com/api/hotlist/all"):
+        super().__init__(timeout)
+        self.api_url = api_url
+
+    def fetch(self):
+        data = self._get_json(self.api_url)
+        if not data.get("success") or not isinstance(data.get("data"), list):
+            raise ValueError(f"聚合接口返回数据异常: {str(data)[:100]}")
+        return build_platform_index(data["data"])
+
+
+class PlatformSource(HotNewsSource):
+    """单个平台的热榜接口，extract 从返回的json中提取标题列表"""
+
+    def __init__(self, name, platform, url, extract, timeout=5):
+        super().__init__(timeout)
+        self.name = name
+        self.platform = platform
+        self.platforms = frozenset({platform})
+        self.url = url
+        self.extract = extract
+
+    def fetch(self):
+        return {self.platform: normalize_titles(self.extract(self._get_json(self.url)))}
+
+
+# 平台名与 config.yaml 中 platforms 的 name 保持一致
+PLATFORM_SOURCES = {
+    "weibo": (
+        "微博",
+        "https://weibo.com/ajax/side/hotSearch",
+        lambda data: [item["word"] for item in data["data"]["realtime"] if not item.get("is_ad")],
+    ),
+    "douyin": (
+        "抖音",
+        "https://www.iesdouyin.com/web/api/v2/hotsearch/billboard/word/",
+        lambda data: [item["word"] for item in data["word_list"]],
+    ),
+    "bilibili": (
+        "哔哩哔哩",
+        "https://api.bilibili.com/x/web-interface/popular?ps=20&pn=1",
+        lambda data: [item["title"] for item in data["data"]["list"]],
+    ),
+    "zhihu": (
+        "知乎热榜",
+        "https://api.zhihu.com/topstory/hot-list?limit=50",
+        lambda data: [item["target"]["title"] for item in data["data"]],
+    ),
+    "baidu": (
+        "百度热点",
+        "https://top.baidu.com/api/board?tab=realtime",
+        lambda data: [item["word"] for item in data["data"]["cards"][0]["content"]],
+    ),
+    "toutiao": (
+        "今日头条",
+        "https://www.toutiao.com/hot-event/hot-board/?origin=toutiao_pc",
+        lambda data: [item["Title"] for item in data["data"]],
+    ),
+    "thepaper": (
+        "澎湃新闻",
+        "https://cache.thepaper.cn/contentapi/wwwIndex/rightSidebar",
+        lambda data: [item["name"] for item in data["data"]["hotNews"]],
+    ),
+}
+
+
+def build_sources(names, timeout=5) -> List[HotNewsSource]:
+    """根据名称创建数据源，顺序即合并时的优先级"""
+    sources = []
+    for name in names:
+        if name == AggregatorSource.name:
+            sources.append(AggregatorSource(timeout))
+        elif name in PLATFORM_SOURCES:
+            platform, url, extract = PLATFORM_SOURCES[name]
+            sources.append(PlatformSource(name, platform, url, extract, timeout))
+        else:
+            print(f"未知的热点数据源: {name}，已忽略")
+    return sources
+
+
+def can_serve(source, platform):
+    return source.platforms is None or platform in source.platforms
+
+
+def dedicated_platforms(sources):
+    """有单独数据源的平台，只有聚合接口提供的平台不在其中"""
+    return {platform for source in sources if source.platforms for platform in source.platforms}
+
+
+def _is_usable(merged, wanted):
+    if wanted:
+        return all(merged.get(platform) for platform in wanted)
+    return any(merged.values())
+
+
+async def fetch_hotnews_async(sources, budget=8, wanted=None) -> Dict[str, List[str]]:
+    """
+    并发请求所有数据源，有可用结果即返回，不等待慢的数据源
+    - 每个数据源有自己的超时，整体不超过 budget 秒
+    - wanted 为需要的平台集合，全部拿到才算可用；为空时任意数据源有结果即可用
+    - 同一平台多个数据源都有结果时，按 sources 中的顺序优先
+    """
+    merged = {}
+    if not sources:
+        return merged
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    tasks = {asyncio.ensure_future(source.fetch_async()): i for i, source in enumerate(sources)}
+    results = {}
+    pending = set(tasks)
+    try:
+        while pending:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                source = sources[tasks[task]]
+                try:
+                    results[tasks[task]] = task.result()
+                except Exception as e:
+                    print(f"热点数据源 {source.name} 获取失败: {type(e).__name__} {e}")
+
+            merged = {}
+            for i in sorted(results):
+                for platform, titles in results[i].items():
+                    if titles and platform not in merged:
+                        merged[platform] = titles
+
+            if _is_usable(merged, wanted):
+                break
+    finally:
+        # 取消未完成的数据源，后台线程会在自身超时后结束，不再等待
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    return merged
+
+
+def fetch_hotnews(sources, budget=8, wanted=None) -> Dict[str, List[str]]:
+    """fetch_hotnews_async 的同步版本，可在任意线程中调用"""
+
+    def _run():
+        # 不使用 asyncio.run，避免退出时等待已超时数据源的线程结束
+        loop = asyncio.new_event_loop()
+        try:
+            return loop.run_until_complete(fetch_hotnews_async(sources, budget, wanted))
+        finally:
+            loop.close()
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return _run()
+
+    # 当前线程已有运行中的事件循环，放到新线程中执行
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        return pool.submit(_run).result()
+
+
+def default_source_names() -> List[str]:
+    return [AggregatorSource.name] + list(PLATFORM_SOURCES.keys())
@@ -0,0 +1,247 @@
+import hashlib
+import os
+import re
+import random
+import threading
+from typing import Dict, List, Optional
+
+from src.ai_auto_wxgzh.utils import html_tokenizer
+from src.ai_auto_wxgzh.utils import utils
+
+
+# 压缩算法变化时递增，索引中旧版本的压缩结果全部重新生成
+INDEX_VERSION = 5
+
+# 精简模板时每段示例文字保留的字符数，连续结构相同的兄弟元素最多保留的个数
+STRIP_TEXT_KEEP = 12
+STRIP_MAX_REPEAT = 2
+
+_TEXT_RE = re.compile(r"\S.*\S|\S", re.DOTALL)
+_CJK_RE = re.compile(r"[\u3000-\u303f\u3400-\u4dbf\u4e00-\u9fff\uff00-\uffef]")
+
+
+def estimate_tokens(text):
+    """粗略估算token数：中文字符按每字1个token，其余字符按每4个字符1个token"""
+    cjk = len(_CJK_RE.findall(text))
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _collapse_repeats(items):
+    """
+    连续结构（去掉文字后的标签序列）相同的兄弟元素只保留前 STRIP_MAX_REPEAT 个
+    items 为 [(token, 输出文本)]，返回保留的输出文本拼接结果
+    """
+    drop = [False] * len(items)
+    # 每层：[标签名, 起始下标, 结构列表, 子元素列表[(结构, 起始, 结束)]]
+    stack = [[None, 0, [], []]]
+
+    def close_element(end, end_tag=None):
+        tag, start, skeleton, children = stack.pop()
+        _mark_repeats(children, drop)
+        if end_tag is not None:
+            skeleton.append(end_tag)
+        key = "".join(skeleton)
+        stack[-1][2].extend(skeleton)
+        stack[-1][3].append((key, start, end))
+
+    for i, (token, text) in enumerate(items):
+        if token.kind == html_tokenizer.RAW:
+            stack[-1][2].append(text)  # style/script 内容属于结构
+        elif token.kind == html_tokenizer.END:
+            # 容错：闭合标签与当前层不匹配时向上查找，找不到则忽略
+            if not any(level[0] == token.tag for level in stack[1:]):
+                continue
+            while stack[-1][0] != token.tag:
+                close_element(i - 1)
+            close_element(i, text)
+        elif token.kind == html_tokenizer.START:
+            if token.self_closing or token.tag in html_tokenizer.VOID_TAGS:
+                stack[-1][2].append(text)
+                stack[-1][3].append((text, i, i))
+            else:
+                stack.append([token.tag, i, [text], []])
+        # 文字、注释、声明不属于结构
+
+    while len(stack) > 1:
+        close_element(len(items) - 1)
+    _mark_repeats(stack[0][3], drop)
+
+    return "".join(text for (_, text), dropped in zip(items, drop) if not dropped)
+
+
+def _mark_repeats(children, drop):
+    previous, count = None, 0
+    for key, start, end in children:
+        count = count + 1 if key == previous else 1
+        previous = key
+        if count > STRIP_MAX_REPEAT:
+            for i in range(start, end + 1):
+                drop[i] = True
+
+
+def strip_template(html):
+    """
+    去掉模板中与版式无关的内容，进一步降低token消耗：
+    - 示例文字只保留开头几个字符，模型只需要参考样式，正文会被替换
+    - 连续重复、结构相同的块（卡片、列表项等）只保留前几个作为样式参考
+    """
+
+    def shorten(match):
+        text = match.group(0)
+        if len(text) <= STRIP_TEXT_KEEP + 1:
+            return text
+        return text[:STRIP_TEXT_KEEP] + "…"
+
+    items = []
+    for token in html_tokenizer.tokenize(html):
+        text = html[token.start : token.end]
+        if token.kind == html_tokenizer.TEXT:
+            text = _TEXT_RE.sub(shorten, text)
+        items.append((token, text))
+
+    return _collapse_repeats(items)
+
+
+class TemplateRegistry:
+    """
+    模板注册表，模板只在新增或修改时压缩一次：
+    - 压缩后的HTML、内容sha256、压缩后大小、估算token数保存在磁盘索引中，重启后直接加载
+    - 每次访问只对模板文件做stat，mtime和大小未变的直接使用内存中的结果，
+      有变化时再按内容hash判断是否需要重新压缩
+    - 删除的模板自动从索引中移除
+    """
+
+    def __init__(self, template_dir, index_file=None):
+        self.template_dir = template_dir
+        self.index_file = index_file
+        self._lock = threading.Lock()
+        self._entries = {}  # 文件名 -> 模板信息
+
+        if self.index_file:
+            data = utils.load_json(self.index_file)
+            if data and data.get("version") == INDEX_VERSION:
+                self._entries = data.get("templates", {})
+
+    def _scan(self):
+        try:
+            with os.scandir(self.template_dir) as it:
+                return {
+                    entry.name: entry.stat()
+                    for entry in it
+                    if entry.is_file() and entry.name.endswith(".html")
+                }
+        except OSError:
+            return {}
+
+    @staticmethod
+    def _build_entry(path, stat):
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+
+        compressed = utils.compress_html(content)  # 压缩html，降低token消耗
+        stripped = strip_template(compressed)
+        return {
+            "mtime": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "sha256": hashlib.sha256(content.encode("utf-8")).hexdigest(),
+            "compressed": compressed,
+            "compressed_size": len(compressed.encode("utf-8")),
+            "tokens": estimate_tokens(compressed),
+            "stripped": stripped,
+            "stripped_tokens": estimate_tokens(stripped),
+        }
+
+    def refresh(self):
+        """同步模板目录的变化，有变化时更新磁盘索引"""
+        files = self._scan()
+        changed = False
+
+        with self._lock:
+            for name in list(self._entries):
+                if name not in files:
+                    del self._entries[name]
+                    changed = True
+
+            for name, stat in files.items():
+                entry = self._entries.get(name)
+                if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                    continue
+
+                try:
+                    new_entry = self._build_entry(os.path.join(self.template_dir, name), stat)
+                except (OSError, UnicodeDecodeError) as e:
+                    print(f"读取模板文件 {name} 失败: {e}")
+                    continue
+
+                if entry and entry["sha256"] == new_entry["sha256"]:
+                    # 只是mtime变化，内容未变
+                    entry["mtime"] = new_entry["mtime"]
+                else:
+                    self._entries[name] = new_entry
+                changed = True
+
+            entries = dict(self._entries)
+
+        if changed and self.index_file:
+            try:
+                utils.save_json(self.index_file, {"version": INDEX_VERSION, "templates": entries})
+            except OSError as e:
+                print(f"保存模板索引失败: {e}")
+
+    def templates(self) -> Dict[str, Dict]:
+        """返回 文件名 -> 模板信息（compressed、compressed_size、tokens 等）"""
+        self.refresh()
+        with self._lock:
+            return dict(self._entries)
+
+    def names(self) -> List[str]:
+        return sorted(self.templates())
+
+    def get(self, name) -> Optional[Dict]:
+        return self.templates().get(name)
+
+    def select(self, mode="random", token_budget=None, strip=False):
+        """
+        选择一个模板，返回 (文件名, 模板HTML)，没有模板时返回 (None, None)
+        - random：随机选择，与模板大小无关
+        - budget：在估算token数不超过 token_budget 的模板中随机选择，都超出时选择最小的
+        strip 为 True 时返回精简后的模板，token数也按精简后的估算
+        """
+        templates = self.templates()
+        if not templates:
+            return None, None
+
+        html_key, tokens_key = (
+            ("stripped", "stripped_tokens") if strip else ("compressed", "tokens")
+        )
+        names = sorted(templates)
+        if mode == "budget" and token_budget is not None:
+            candidates = [name for name in names if templates[name][tokens_key] <= token_budget]
+            if candidates:
+                name = random.choice(candidates)
+            else:
+                name = min(names, key=lambda n: templates[n][tokens_key])
+                print(
+                    f"没有估算token数在预算 {token_budget} 内的模板，"
+                    f"使用最小的模板 {name}（约 {templates[name][tokens_key]} tokens）"
+                )
+        else:
+            name = random.choice(names)
+
+        return name, templates[name][html_key]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> TemplateRegistry:
+    """进程内共享的模板注册表"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = TemplateRegistry(
+                os.path.join(utils.get_current_dir(), "knowledge/templates"),
+                utils.get_cache_path("templates_index.json"),
+            )
+        return _registry
@@ -0,0 +1,155 @@
+import hashlib
+import threading
+import time
+
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.config.config import Config
+
+
+# 微信返回 media_id 无效（素材已被删除）的错误码
+INVALID_MEDIA_ERRCODE = 40007
+
+
+def file_digest(path, chunk_size=65536):
+    """按块计算文件内容的sha256，不整体读入内存"""
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+# 命中缓存时最多每隔该时间（秒）更新一次最近使用时间并保存，避免每次命中都重写缓存文件
+TOUCH_INTERVAL = 86400
+
+
+class MediaCache:
+    """
+    已上传到微信的图片素材缓存，按 (appid, 图片内容sha256) 保存 (media_id, url)：
+    - 相同的图片（模板图片、重复的封面等）命中缓存时不再上传，节省永久素材配额和带宽
+    - 超过 ttl_days 未使用的记录过期，超过 max_entries 时淘汰最久未使用的记录
+    - 微信返回素材无效时调用 invalidate 删除对应记录
+    - 多个进程（界面、worker、定时任务）共用缓存文件，保存时在文件锁内重新读取，
+      只合并本进程的修改，不覆盖其他进程保存的记录
+    """
+
+    def __init__(self, cache_file=None, ttl_days=30, max_entries=5000):
+        self.cache_file = cache_file
+        self.ttl = ttl_days * 86400
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}  # "appid:sha256" -> {"media_id", "url", "path", "last_used"}
+        self._changed = {}  # 未保存的新增、更新记录
+        self._removed = {}  # 未保存的删除记录 key -> media_id
+
+        if self.cache_file:
+            self._entries = utils.load_json(self.cache_file, {})
+
+    @staticmethod
+    def _key(appid, digest):
+        return f"{appid}:{digest}"
+
+    def _file_lock(self):
+        return utils.file_lock(f"{self.cache_file}.lock")
+
+    def _evict(self, entries, now):
+        """移除过期记录，超过 max_entries 时淘汰最久未使用的记录"""
+        for key in [key for key, entry in entries.items() if now - entry["last_used"] > self.ttl]:
+            del entries[key]
+        if len(entries) > self.max_entries:
+            overflow = sorted(entries.items(), key=lambda item: item[1]["last_used"])
+            for key, _ in overflow[: len(entries) - self.max_entries]:
+                del entries[key]
+
+    def _save(self):
+        """在文件锁内读取缓存文件，合并本进程未保存的修改后写回"""
+        if not self.cache_file:
+            with self._lock:
+                self._changed.clear()
+                self._removed.clear()
+                self._evict(self._entries, time.time())
+            return
+
+        try:
+            with self._file_lock():
+                entries = utils.load_json(self.cache_file, {})
+                with self._lock:
+                    for key, media_id in self._removed.items():
+                        # 其他进程已重新上传（media_id 不同）的记录保留
+                        if entries.get(key, {}).get("media_id") == media_id:
+                            del entries[key]
+                    for key, entry in self._changed.items():
+                        saved = entries.get(key)
+                        if saved is None or saved["last_used"] <= entry["last_used"]:
+                            entries[key] = entry
+                    self._changed.clear()
+                    self._removed.clear()
+                    self._evict(entries, time.time())
+                    self._entries = entries
+                    entries = dict(entries)
+                utils.save_json(self.cache_file, entries)
+        except OSError as e:
+            print(f"保存图片素材缓存失败: {e}")
+
+    def get(self, appid, digest):
+        """命中时返回 (media_id, url)，否则返回None"""
+        key = self._key(appid, digest)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if now - entry["last_used"] > self.ttl:
+                del self._entries[key]
+                return None
+            touched = now - entry["last_used"] > TOUCH_INTERVAL
+            if touched:
+                entry = dict(entry, last_used=now)
+                self._entries[key] = self._changed[key] = entry
+        if touched:
+            self._save()
+        return entry["media_id"], entry["url"]
+
+    def put(self, appid, digest, media_id, url, path=None):
+        """path 为上传的本地图片，素材失效时用于重新上传"""
+        key = self._key(appid, digest)
+        with self._lock:
+            entry = {"media_id": media_id, "url": url, "path": path, "last_used": time.time()}
+            self._entries[key] = self._changed[key] = entry
+            self._removed.pop(key, None)
+        self._save()
+
+    def invalidate(self, appid, media_id):
+        """删除该公众号下指定 media_id 的记录（素材已在微信后台被删除），返回被删除的记录"""
+        prefix = f"{appid}:"
+        with self._lock:
+            keys = [
+                key
+                for key, entry in self._entries.items()
+                if key.startswith(prefix) and entry["media_id"] == media_id
+            ]
+            removed = [self._entries.pop(key) for key in keys]
+            for key in keys:
+                self._changed.pop(key, None)
+                self._removed[key] = media_id
+        if keys:
+            self._save()
+        return removed
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    """进程内共享的图片素材缓存，配置关闭时返回None"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                if not Config.get_instance().wechat_media_cache:
+                    return None
+            except ValueError:  # 配置未加载时默认开启
+                pass
+            _cache = MediaCache(utils.get_cache_path("wx_media.json"))
+        return _cache
@@ -0,0 +1,164 @@
+import heapq
+import itertools
+import random
+import threading
+import time
+
+
+# freepublish/get 返回的 publish_status
+PUBLISH_SUCCESS = 0
+PUBLISHING = 1
+PUBLISH_ORIGINAL_FAILED = 2
+PUBLISH_FAILED = 3
+PUBLISH_AUDIT_REJECTED = 4
+PUBLISH_DELETED = 5
+PUBLISH_BANNED = 6
+
+STATUS_TEXT = {
+    PUBLISH_SUCCESS: "发布成功",
+    PUBLISHING: "发布中",
+    PUBLISH_ORIGINAL_FAILED: "原创失败",
+    PUBLISH_FAILED: "常规失败",
+    PUBLISH_AUDIT_REJECTED: "平台审核不通过",
+    PUBLISH_DELETED: "成功后用户删除所有文章",
+    PUBLISH_BANNED: "成功后系统封禁所有文章",
+}
+
+
+class _PollJob:
+    def __init__(self, publisher, publish_id, callback, deadline):
+        self.publisher = publisher
+        self.publish_id = publish_id
+        self.callback = callback
+        self.deadline = deadline
+        self.attempt = 0
+
+
+class PublishPoller:
+    """
+    后台轮询发布结果，提交 publish_id 后立即返回，不阻塞发布流程：
+    - 所有公众号的待查询发布共用一个后台线程，按下次查询时间排序依次查询
+    - 仍在发布中或查询出错时按指数退避（带随机抖动）重新查询，超过 timeout 秒放弃
+    - 结束时调用 callback(article_url, publish_status)，未获取到链接时 article_url 为None，
+      回调在轮询线程中执行，应尽快返回
+    clock（返回秒数的单调时钟）和 rng（随机抖动）可替换；background 为False时不启动后台线程，
+    由调用方调用 poll_due 查询到期的发布，配合替换的 clock 不需要真正等待
+    """
+
+    def __init__(
+        self,
+        initial_delay=2,
+        max_delay=60,
+        timeout=600,
+        clock=time.monotonic,
+        rng=random,
+        background=True,
+    ):
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self.timeout = timeout
+        self._clock = clock
+        self._rng = rng
+        self._background = background
+        self._jobs = []  # (下次查询时间, 序号, job) 小顶堆
+        self._seq = itertools.count()
+        self._pending = 0  # 已提交未结束（含正在查询）的数量
+        self._cond = threading.Condition()
+        self._thread = None
+
+    def submit(self, publisher, publish_id, callback=None):
+        job = _PollJob(publisher, publish_id, callback, self._clock() + self.timeout)
+        with self._cond:
+            self._pending += 1
+            self._schedule(job, self.initial_delay)
+            if self._background and self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="wx_publish_poller", daemon=True
+                )
+                self._thread.start()
+
+    def pending(self):
+        with self._cond:
+            return self._pending
+
+    def wait_idle(self, timeout=None):
+        """等待所有已提交的发布查询结束，超时返回False"""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._pending == 0, timeout)
+
+    def _schedule(self, job, delay):
+        """调用方需持有 _cond"""
+        heapq.heappush(self._jobs, (self._clock() + delay, next(self._seq), job))
+        self._cond.notify_all()
+
+    def _backoff(self, attempt):
+        delay = min(self.max_delay, self.initial_delay * 2**attempt)
+        return self._rng.uniform(delay / 2, delay)
+
+    def poll_due(self):
+        """依次查询所有已到期的发布，返回查询的数量"""
+        count = 0
+        while True:
+            with self._cond:
+                if not self._jobs or self._jobs[0][0] > self._clock():
+                    return count
+                _, _, job = heapq.heappop(self._jobs)
+
+            # 网络请求不持有锁，不影响提交
+            self._poll(job)
+            count += 1
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._jobs:
+                    self._cond.wait()
+                    continue
+                wait = self._jobs[0][0] - self._clock()
+                if wait > 0:
+                    self._cond.wait(wait)  # 期间有新提交时重新计算
+                    continue
+            self.poll_due()
+
+    def _poll(self, job):
+        try:
+            status, article_url = job.publisher.get_publish_status(job.publish_id)
+        except Exception as e:  # 轮询线程不能退出，按查询出错处理
+            print(f"查询发布状态出错：{e}")
+            status, article_url = None, None
+        if status == PUBLISH_SUCCESS:
+            self._finish(job, article_url, status)
+        elif status is not None and status != PUBLISHING:
+            print(f"发布 {job.publish_id} 失败：{STATUS_TEXT.get(status, status)}")
+            self._finish(job, None, status)
+        elif self._clock() >= job.deadline:
+            print(f"发布 {job.publish_id} 超过 {self.timeout} 秒仍未获取到结果，不再查询")
+            self._finish(job, None, status)
+        else:
+            job.attempt += 1
+            with self._cond:
+                self._schedule(job, self._backoff(job.attempt))
+
+    def _finish(self, job, article_url, status):
+        try:
+            if job.callback is not None:
+                job.callback(article_url, status)
+        except Exception as e:
+            print(f"处理发布结果出错：{e}")
+        finally:
+            with self._cond:
+                self._pending -= 1
+                self._cond.notify_all()
+
+
+_poller = None
+_poller_lock = threading.Lock()
+
+
+def get_poller() -> PublishPoller:
+    """进程内共享的发布结果轮询器"""
+    global _poller
+    with _poller_lock:
+        if _poller is None:
+            _poller = PublishPoller()
+        return _poller
@@ -1,19 +1,19 @@
 from dataclasses import dataclass
 from enum import Enum
 from typing import Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 import requests
-from io import BytesIO
 from http import HTTPStatus
 from urllib.parse import urlparse, unquote
 from pathlib import PurePosixPath
-from dashscope import ImageSynthesis
 import os
 import mimetypes
 import json
-import time
 
 from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.utils import http_client
+from src.ai_auto_wxgzh.tools import wx_token
+from src.ai_auto_wxgzh.tools import wx_media_cache
 
 
 class PublishStatus(Enum):
@@ -44,53 +44,88 @@ class WeixinPublisher:
         img_api_type: str,
         img_api_key: str,
         img_api_model: str,
+        image_dir: Optional[str] = None,
     ):
-        self.access_token_data = None
         self.app_id = app_id
         self.app_secret = app_secret
         self.author = author
         self.img_api_type = img_api_type
         self.img_api_key = img_api_key
         self.img_api_model = img_api_model
+        # 生成/下载的图片保存目录，默认项目image目录，按运行隔离时传入工作目录
+        self.image_dir = image_dir or utils.get_current_dir("image")
+        self._cached_media = {}  # 命中素材缓存的 media_id -> 图片来源，素材失效时用于重新上传
+        self._replaced_media = {}  # 失效的 media_id -> 重新上传后的 media_id
 
     def _ensure_access_token(self):
-        # 检查现有token是否有效
-        if self.access_token_data and self.access_token_data[
-            "expires_at"
-        ] > datetime.now() + timedelta(
-            minutes=1
-        ):  # 预留1分钟余量
-            return self.access_token_data["access_token"]
+        # token 在所有实例间共享，过期或失效时才重新获取
+        return wx_token.get_store().get(self.app_id, self.app_secret)
 
-        # 获取新token
-        url = f"{self.BASE_URL}/token?grant_type=client_credential&appid={self.app_id}&secret={self.app_secret}"  # noqa 501
-
-        try:
-            response = requests.get(url)
+    def _request(self, method, path, params=None, **kwargs):
+        """
+        调用需要 access_token 的接口，返回响应json
+        token 失效（40001/42001等）时刷新 token 并重试一次
+        """
+        data = None
+        for attempt in range(2):
+            token = self._ensure_access_token()
+            if token is None:
+                return {"errcode": -1, "errmsg": "获取access_token失败"}
+
+            # 重试时请求体需要从头读取
+            if hasattr(kwargs.get("data"), "seek"):
+                kwargs["data"].seek(0)
+
+            response = http_client.request(
+                method,
+                f"{self.BASE_URL}/{path}",
+                params=dict(params or {}, access_token=token),
+                **kwargs,
+            )
             response.raise_for_status()
             data = response.json()
-            access_token = data.get("access_token")
-            expires_in = data.get("expires_in")
-
-            if not access_token:
-                print(f"获取access_token失败: {data}")
-                return None
-
-            self.access_token_data = {
-                "access_token": access_token,
-                "expires_in": expires_in,
-                "expires_at": datetime.now() + timedelta(seconds=expires_in),
-            }
-            return access_token
-        except requests.exceptions.RequestException as e:
-            print(f"获取微信access_token失败: {e}")
+            if data.get("errcode") not in wx_token.TOKEN_ERRCODES or attempt > 0:
+                break
 
-        return None  # 获取不到就返回None，失败交给后面的流程处理
+            print(f"access_token已失效({data.get('errcode')})，重新获取后重试")
+            wx_token.get_store().invalidate(self.app_id, token)
 
-    def _upload_draft(self, article, title, digest, media_id):
-        token = self._ensure_access_token()
-        url = f"{self.BASE_URL}/draft/add?access_token={token}"
+        return data
+
+    def _reupload_invalid_media(self, data, media_id):
+        """
+        素材已在微信后台被删除时，清除素材缓存中的记录并重新上传
+        素材可能是其他进程上传或命中缓存的（如 --resume 时检查点中的封面），图片来源先查本实例，
+        再查素材缓存中记录的图片路径
+        返回新的 media_id，不是这种情况或无法重新上传返回None
+        """
+        if data.get("errcode") != wx_media_cache.INVALID_MEDIA_ERRCODE:
+            return None
+        if media_id in self._replaced_media.values():  # 刚重新上传的素材仍然无效，不再重试
+            return None
+
+        print(f"素材 {media_id} 已失效，重新上传")
+        source = self._cached_media.pop(media_id, None)
+        cache = wx_media_cache.get_cache()
+        if cache is not None:
+            paths = [entry.get("path") for entry in cache.invalidate(self.app_id, media_id)]
+            source = source or next((path for path in paths if path and os.path.exists(path)), None)
+        if source is None:
+            print(f"找不到素材 {media_id} 的图片，无法重新上传")
+            return None
+
+        ret = self.upload_image(source, use_cache=False)
+        if ret is None:
+            return None
+        self._replaced_media[media_id] = ret[0]
+        return ret[0]
+
+    def current_media_id(self, media_id):
+        """素材失效重新上传后返回新的 media_id，否则原样返回"""
+        return self._replaced_media.get(media_id, media_id)
 
+    def _upload_draft(self, article, title, digest, media_id):
+        media_id = self.current_media_id(media_id)
         articles = [
             {
                 "title": title[:64],  # 标题长度不能超过64
@@ -108,9 +143,11 @@ class WeixinPublisher:
 
             headers = {"Content-Type": "application/json"}
             json_data = json.dumps(data, ensure_ascii=False).encode("utf-8")
-            response = requests.post(url, data=json_data, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+            data = self._request("POST", "draft/add", data=json_data, headers=headers)
+
+            new_media_id = self._reupload_invalid_media(data, media_id)
+            if new_media_id is not None:
+                return self._upload_draft(article, title, digest, new_media_id)
 
             if "errcode" in data and data.get("errcode") != 0:
                 print(f"上传草稿失败: {data.get('errmsg')}")
@@ -126,8 +163,11 @@ class WeixinPublisher:
         return ret
 
     def _generate_img_by_ali(self, prompt, size="1024*1024"):
-        image_dir = utils.get_current_dir("image")
-        img_url = None
+        """生成图片并流式保存到图片目录，返回本地图片路径，上传时不再重新下载"""
+        from dashscope import ImageSynthesis  # 只有使用阿里生成图片时才导入
+
+        image_dir = self.image_dir
+        img_path = None
         try:
             rsp = ImageSynthesis.call(
                 api_key=self.img_api_key,
@@ -143,9 +183,12 @@ class WeixinPublisher:
                     file_name = PurePosixPath(unquote(urlparse(result.url).path)).parts[-1]
                     # 拼接绝对路径和文件名
                     file_path = os.path.join(image_dir, file_name)
+                    response = http_client.get(result.url, stream=True)
+                    response.raise_for_status()
                     with open(file_path, "wb+") as f:
-                        f.write(requests.get(result.url).content)
-                img_url = rsp.output.results[0].url
+                        for chunk in response.iter_content(chunk_size=65536):
+                            f.write(chunk)
+                    img_path = file_path
             else:
                 print(
                     "sync_call Failed, status_code: %s, code: %s, message: %s"
@@ -154,63 +197,68 @@ class WeixinPublisher:
         except Exception as e:
             print(f"_generate_img_by_ali调用失败: {e}")
 
-        return img_url
+        return img_path
 
     def generate_img(self, prompt, size="1024*1024"):
         img_url = None
         if self.img_api_type == "ali":
             img_url = self._generate_img_by_ali(prompt, size)
         elif self.img_api_type == "picsum":
-            image_dir = utils.get_current_dir("image")
             width_height = size.split("*")
             img_url = utils.download_and_save_image(
                 f"https://picsum.photos/{width_height[0]}/{width_height[1]}?random=1",
-                image_dir,
+                self.image_dir,
             )
 
         return img_url
 
-    def upload_image(self, image_url):
+    def upload_image(self, image_url, use_cache=True):
         if not image_url:
             # 如果图片URL为空，则返回一个默认的图片ID
-            return "SwCSRjrdGJNaWioRQUHzgF68BHFkSlb_f5xlTquvsOSA6Yy0ZRjFo0aW9eS3JJu_"
+            return "SwCSRjrdGJNaWioRQUHzgF68BHFkSlb_f5xlTquvsOSA6Yy0ZRjFo0aW9eS3JJu_", None
 
         media_id = None
+        stream = None
         try:
             if image_url.startswith(("http://", "https://")):
-                # 处理网络图片
-                image_response = requests.get(image_url, stream=True)
-                image_response.raise_for_status()
-                image_buffer = BytesIO(image_response.content)
-
-                # 动态确定 MIME 类型和文件名后缀
-                mime_type = image_response.headers.get("Content-Type")
-                if not mime_type:
-                    mime_type = "image/jpeg"  # 默认值
-                file_ext = mimetypes.guess_extension(mime_type)
-                file_name = "image" + file_ext if file_ext else "image.jpg"
+                # 网络图片先流式下载到图片目录，再按本地图片上传，不整体读入内存
+                image_path = utils.download_and_save_image(image_url, self.image_dir)
+                if image_path is None:
+                    return None
             else:
                 # 处理本地图片
-                if not os.path.exists(image_url):
-                    print(f"本地图像文件未找到: {image_url}")
+                image_path = image_url
+                if not os.path.exists(image_path):
+                    print(f"本地图像文件未找到: {image_path}")
                     return None
 
-                with open(image_url, "rb") as f:
-                    image_buffer = BytesIO(f.read())
-
-                # 动态确定 MIME 类型和文件名后缀
-                mime_type, _ = mimetypes.guess_type(image_url)
+            # 相同内容的图片已经上传过，直接使用之前的素材
+            digest = wx_media_cache.file_digest(image_path)
+            cache = wx_media_cache.get_cache()
+            if use_cache and cache is not None:
+                cached = cache.get(self.app_id, digest)
+                if cached is not None:
+                    self._cached_media[cached[0]] = image_path
+                    return cached
+
+            # 根据文件头确定 MIME 类型，文件名后缀与实际类型保持一致（微信按后缀校验图片格式）
+            mime_type, file_ext = utils.sniff_image_type(image_path)
+            if mime_type is None:
+                mime_type, _ = mimetypes.guess_type(image_path)
                 if not mime_type:
                     mime_type = "image/jpeg"  # 默认值
-                file_name = os.path.basename(image_url)
-
-            token = self._ensure_access_token()
-            url = f"{self.BASE_URL}/material/add_material?access_token={token}&type=image"
-
-            files = {"media": (file_name, image_buffer, mime_type)}
-            response = requests.post(url, files=files)
-            response.raise_for_status()
-            data = response.json()
+                file_ext = mimetypes.guess_extension(mime_type) or ".jpg"
+            file_name = os.path.splitext(os.path.basename(image_path))[0] + file_ext
+
+            # 请求体从磁盘流式读取，内存占用不随图片大小增长
+            stream = http_client.MultipartFileStream("media", image_path, file_name, mime_type)
+            data = self._request(
+                "POST",
+                "material/add_material",
+                params={"type": "image"},
+                data=stream,
+                headers={"Content-Type": stream.content_type},
+            )
 
             if "errcode" in data and data.get("errcode") != 0:
                 print(f"上传图片失败: {data.get('errmsg')}")
@@ -218,9 +266,14 @@ class WeixinPublisher:
                 print("上传图片失败: 响应中缺少 media_id")
             else:
                 media_id = data.get("media_id"), data.get("url")
+                if cache is not None:
+                    cache.put(self.app_id, digest, *media_id, path=image_path)
 
-        except requests.exceptions.RequestException as e:
+        except (requests.exceptions.RequestException, OSError) as e:
             print(f"上传微信图片失败: {e}")
+        finally:
+            if stream is not None:
+                stream.close()
 
         return media_id
 
@@ -250,14 +303,10 @@ class WeixinPublisher:
         :return: 包含发布任务ID的字典
         """
         ret = None
-        url = f"{self.BASE_URL}/freepublish/submit"
-        params = {"access_token": self._ensure_access_token()}
         data = {"media_id": media_id}
 
         try:
-            response = requests.post(url, params=params, json=data)
-            response.raise_for_status()
-            result = response.json()
+            result = self._request("POST", "freepublish/submit", json=data)
 
             if "errcode" in result and result.get("errcode") != 0:
                 print(f"草稿发布失败: {result.get('errmsg')}")
@@ -276,19 +325,25 @@ class WeixinPublisher:
 
         return ret
 
-    # 轮询获取文章链接
-    def poll_article_url(self, publish_id, max_retries=10, interval=2):
-        url = f"{self.BASE_URL}/freepublish/get?access_token={self._ensure_access_token()}"
-        params = {"publish_id": publish_id}
-
-        for _ in range(max_retries):
-            response = requests.post(url, json=params).json()
-            if response.get("article_id"):
-                return response.get("article_detail")["item"][0]["article_url"]
+    def get_publish_status(self, publish_id):
+        """
+        查询一次发布状态，返回 (publish_status, article_url)，发布成功才有 article_url
+        查询出错时 publish_status 为None，轮询见 wx_publish_poller
+        """
+        try:
+            result = self._request("POST", "freepublish/get", json={"publish_id": publish_id})
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"查询发布状态失败：{e}")
+            return None, None
 
-            time.sleep(interval)
+        if "errcode" in result and result.get("errcode") != 0:
+            print(f"查询发布状态失败: {result.get('errmsg')}")
+            return None, None
 
-        return None
+        status = result.get("publish_status")
+        items = (result.get("article_detail") or {}).get("item") or []
+        article_url = items[0].get("article_url") if items else None
+        return status, article_url
 
     # ---------------------以下接口需要微信认证[个人用户不可用]-------------------------
     # 单独发布只能通过绑定到菜单的形式访问到，无法显示到公众号文章列表
@@ -303,9 +358,8 @@ class WeixinPublisher:
                 }
             ]
         }
-        menu_url = f"{self.BASE_URL}/menu/create?access_token={self._ensure_access_token()}"
         try:
-            result = requests.post(menu_url, json=menu_data).json()
+            result = self._request("POST", "menu/create", json=menu_data)
             if "errcode" in result and result.get("errcode") != 0:
                 print(f"创建菜单失败: {result.get('errmsg')}")
             else:
@@ -317,6 +371,7 @@ class WeixinPublisher:
 
     # 上传图文消息素材【订阅号与服务号认证后均可用】
     def media_uploadnews(self, article, title, digest, media_id):
+        media_id = self.current_media_id(media_id)
         ret = None
         data = {
             "articles": [
@@ -332,10 +387,13 @@ class WeixinPublisher:
                 },
             ]
         }
-        url = f"{self.BASE_URL}/media/uploadnews?access_token={self._ensure_access_token()}"
-
         try:
-            result = requests.post(url, json=data).json()
+            result = self._request("POST", "media/uploadnews", json=data)
+
+            new_media_id = self._reupload_invalid_media(result, media_id)
+            if new_media_id is not None:
+                return self.media_uploadnews(article, title, digest, new_media_id)
+
             if "errcode" in result and result.get("errcode") != 0:
                 print(f"上次图文消息素材失败: {result.get('errmsg')}")
             elif "media_id" not in result:
@@ -358,10 +416,8 @@ class WeixinPublisher:
             "msgtype": "mpnews",
             "send_ignore_reprint": 1,
         }
-        url = f"{self.BASE_URL}/message/mass/sendall?access_token={self._ensure_access_token()}"
-
         try:
-            result = requests.post(url, json=data).json()
+            result = self._request("POST", "message/mass/sendall", json=data)
             if "errcode" in result and result.get("errcode") != 0:
                 print(f"根据标签进行群发: {result.get('errmsg')}")
             else:
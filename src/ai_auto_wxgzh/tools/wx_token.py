@@ -0,0 +1,155 @@
+import threading
+import time
+
+import requests
+
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.utils import http_client
+from src.ai_auto_wxgzh.config.config import Config
+
+
+# access_token 失效相关的错误码：40001 token无效，40014 不合法的token，42001 token超时
+TOKEN_ERRCODES = (40001, 40014, 42001)
+
+
+class AccessTokenStore:
+    """
+    微信 access_token 缓存，按 appid 保存，进程内所有 WeixinPublisher 共享：
+    - 线程安全，同一 appid 同时只有一个线程去获取 token（single-flight），其他线程等待结果
+    - 可选落盘，重启后在有效期内继续使用，节省每日获取 token 的次数；
+      落盘时多个进程（界面、worker、定时任务）共用缓存文件，获取新 token 前在文件锁内重新读取，
+      其他进程已获取的直接使用，同时只有一个进程请求（新 token 会使之前的 token 失效）
+    - 接口返回 token 失效错误码时调用 invalidate，下次获取时重新请求
+    """
+
+    TOKEN_URL = "https://api.weixin.qq.com/cgi-bin/token"
+
+    def __init__(self, cache_file=None, margin=60):
+        self.cache_file = cache_file
+        self.margin = margin  # 提前过期的余量（秒）
+        self._lock = threading.Lock()
+        self._appid_locks = {}
+        self._tokens = {}  # appid -> {"access_token": xx, "expires_at": 时间戳}
+
+        if self.cache_file:
+            self._tokens = utils.load_json(self.cache_file, {})
+
+    def _appid_lock(self, appid):
+        with self._lock:
+            return self._appid_locks.setdefault(appid, threading.Lock())
+
+    def _file_lock(self):
+        return utils.file_lock(f"{self.cache_file}.lock")
+
+    def _valid_token(self, appid):
+        with self._lock:
+            data = self._tokens.get(appid)
+            if data and data["expires_at"] > time.time() + self.margin:
+                return data["access_token"]
+        return None
+
+    def _reload(self, appid):
+        """读取缓存文件中该 appid 的 token（其他进程可能已刷新），调用方需持有文件锁"""
+        data = utils.load_json(self.cache_file, {}).get(appid)
+        with self._lock:
+            current = self._tokens.get(appid)
+            if data and (current is None or data["expires_at"] > current["expires_at"]):
+                self._tokens[appid] = data
+
+    def _write(self, appid, data):
+        """只更新缓存文件中该 appid 的 token，不覆盖其他进程保存的，调用方需持有文件锁"""
+        tokens = utils.load_json(self.cache_file, {})
+        if data is None:
+            tokens.pop(appid, None)
+        else:
+            tokens[appid] = data
+        try:
+            utils.save_json(self.cache_file, tokens)
+        except OSError as e:
+            print(f"保存access_token缓存失败: {e}")
+
+    def _fetch(self, appid, appsecret):
+        params = {"grant_type": "client_credential", "appid": appid, "secret": appsecret}
+        try:
+            response = http_client.get(self.TOKEN_URL, params=params)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"获取微信access_token失败: {e}")
+            return None
+
+        access_token = data.get("access_token")
+        if not access_token:
+            print(f"获取access_token失败: {data}")
+            return None
+
+        token = {
+            "access_token": access_token,
+            "expires_at": time.time() + data.get("expires_in", 7200),
+        }
+        with self._lock:
+            self._tokens[appid] = token
+        if self.cache_file:
+            self._write(appid, token)
+        return access_token
+
+    def get(self, appid, appsecret):
+        """获取有效的 access_token，获取失败返回None"""
+        token = self._valid_token(appid)
+        if token:
+            return token
+
+        with self._appid_lock(appid):
+            # 等待期间其他线程可能已经获取到
+            token = self._valid_token(appid)
+            if token:
+                return token
+            if not self.cache_file:
+                return self._fetch(appid, appsecret)
+
+            with self._file_lock():
+                # 其他进程可能已经获取到
+                self._reload(appid)
+                token = self._valid_token(appid)
+                if token:
+                    return token
+                return self._fetch(appid, appsecret)
+
+    def invalidate(self, appid, access_token=None):
+        """
+        使缓存的 token 失效
+        指定 access_token 时仅在缓存的仍是该 token 时失效，避免误删其他线程、进程刚刷新的 token
+        """
+        with self._lock:
+            data = self._tokens.get(appid)
+            if data is None:
+                return
+            if access_token is not None and data["access_token"] != access_token:
+                return
+            del self._tokens[appid]
+            access_token = data["access_token"]
+
+        if self.cache_file:
+            with self._file_lock():
+                saved = utils.load_json(self.cache_file, {}).get(appid)
+                if saved and saved["access_token"] == access_token:
+                    self._write(appid, None)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> AccessTokenStore:
+    """进程内共享的 access_token 缓存"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            try:
+                disk_cache = Config.get_instance().wechat_token_disk_cache
+            except ValueError:  # 配置未加载时使用默认值
+                disk_cache = True
+            _store = AccessTokenStore(
+                utils.get_cache_path("wx_tokens.json") if disk_cache else None
+            )
+        return _store
@@ -0,0 +1,94 @@
+import re
+from typing import List
+
+from bs4 import BeautifulSoup, Comment, NavigableString, Tag
+
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.utils import html_tokenizer
+from src.ai_auto_wxgzh.utils.html_tokenizer import ImageRef
+
+
+try:
+    import lxml  # noqa: F401
+
+    PARSER = "lxml"
+except ImportError:  # 没有安装lxml时使用内置解析器
+    PARSER = "html.parser"
+
+# 只合并HTML空白字符，&nbsp;、全角空格等保持不变（见 html_tokenizer._WS_RE）
+_WS_RE = re.compile(r"[ \t\n\r\f]+")
+# 不属于正文文字的标签
+_NON_TEXT_TAGS = {"style", "script", "noscript", "template"}
+
+
+class Article:
+    """
+    待发布文章的模型，HTML只解析一次，遍历一次得到发布需要的所有信息：
+    - title：<title>，没有时使用第一个 <h1>
+    - digest：正文文字的前 max_length 个字符
+    - body：去掉注释和脚本后的HTML，发布时直接使用，不再重新解析
+    - image_refs：body 中图片链接及位置（见 html_tokenizer.extract_image_refs）
+    """
+
+    def __init__(self, html, max_length=64):
+        self.max_length = max_length
+        self.title = None
+        self.digest = None
+
+        soup = BeautifulSoup(html, PARSER)
+        self._walk(soup)
+        self.body = str(soup)
+        # 图片链接及其在 body 中的位置，替换链接时按位置进行
+        self.image_refs: List[ImageRef] = html_tokenizer.extract_image_refs(self.body)
+
+    @property
+    def image_urls(self) -> List[str]:
+        """文章中的图片链接，按文档顺序去重"""
+        return list(dict.fromkeys(ref.url for ref in self.image_refs))
+
+    @classmethod
+    def from_output(cls, content, max_length=64):
+        """从任务输出中创建，输出中有 ```html 代码块（如审核报告）时只取其中的文章"""
+        return cls(utils.extract_modified_article(content), max_length)
+
+    def _walk(self, soup):
+        h1_text = None
+        texts = []
+        text_length = 0
+        removed = []
+
+        for node in soup.descendants:
+            if isinstance(node, Comment):
+                removed.append(node)
+            elif isinstance(node, NavigableString):
+                # 摘要只需要前 max_length 个字符，够了就不再收集
+                if text_length > self.max_length or type(node) is not NavigableString:
+                    continue
+                if node.parent is not None and node.parent.name in _NON_TEXT_TAGS:
+                    continue
+                text = node.strip()
+                if text:
+                    texts.append(text)
+                    text_length += len(text) + 1
+            elif isinstance(node, Tag):
+                if node.name == "script":
+                    removed.append(node)
+                elif node.name == "title" and self.title is None:
+                    self.title = " ".join(node.get_text(strip=True).split())
+                elif node.name == "h1" and h1_text is None:
+                    h1_text = " ".join(node.get_text(strip=True).split())
+
+        # 遍历结束后再删除，避免遍历过程中修改树
+        for node in removed:
+            node.extract()
+
+        # 标题优先级：<title> > <h1>
+        if self.title is None:
+            self.title = h1_text
+
+        text = _WS_RE.sub(" ", " ".join(texts)).strip()
+        if text:
+            if len(text) > self.max_length:
+                self.digest = text[: self.max_length] + "..."
+            else:
+                self.digest = text
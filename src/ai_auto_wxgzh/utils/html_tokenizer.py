@@ -0,0 +1,418 @@
+import html as html_lib
+import re
+from functools import lru_cache
+from typing import Iterator, List, NamedTuple, Optional, Sequence
+
+
+# token 类型
+TEXT = "text"
+START = "start"  # 开始标签（含自闭合）
+END = "end"
+COMMENT = "comment"
+DECL = "decl"  # <!DOCTYPE ...>、<?xml ...?> 等
+RAW = "raw"  # <style>/<script>/<textarea> 的内容，不按HTML解析
+
+RAW_TEXT_TAGS = {"style", "script", "textarea"}
+VOID_TAGS = {
+    "area",
+    "base",
+    "br",
+    "col",
+    "embed",
+    "hr",
+    "img",
+    "input",
+    "link",
+    "meta",
+    "source",
+    "track",
+    "wbr",
+}
+# 前后的空白不影响显示的标签，压缩时去掉与它们相邻的空白
+BLOCK_TAGS = {
+    "html",
+    "head",
+    "body",
+    "title",
+    "meta",
+    "link",
+    "style",
+    "script",
+    "section",
+    "article",
+    "header",
+    "footer",
+    "nav",
+    "aside",
+    "main",
+    "div",
+    "p",
+    "h1",
+    "h2",
+    "h3",
+    "h4",
+    "h5",
+    "h6",
+    "ul",
+    "ol",
+    "li",
+    "dl",
+    "dt",
+    "dd",
+    "table",
+    "thead",
+    "tbody",
+    "tfoot",
+    "tr",
+    "th",
+    "td",
+    "blockquote",
+    "figure",
+    "figcaption",
+    "hr",
+    "br",
+    "pre",
+    "svg",
+    "path",
+    "g",
+    "defs",
+    "circle",
+    "rect",
+    "line",
+    "polygon",
+    "polyline",
+    "ellipse",
+}
+
+_TAG_NAME_RE = re.compile(r"[a-zA-Z][^\s/>]*")
+_ATTR_RE = re.compile(r"""[\s/]*([^\s"'>/=]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+)))?""")
+_TAG_END_RE = re.compile(r"\s*(/?)\s*>")
+_RAW_END_RES = {tag: re.compile(rf"</{tag}[\s/>]", re.IGNORECASE) for tag in RAW_TEXT_TAGS}
+
+
+class Attr(NamedTuple):
+    name: str  # 小写
+    value: Optional[str]  # 没有值的属性（如 disabled）为None
+    value_start: int  # 属性值在原文中的位置（不含引号），没有值时为 -1
+    value_end: int
+
+
+class Token(NamedTuple):
+    kind: str
+    start: int  # token 在原文中的位置 [start, end)
+    end: int
+    tag: Optional[str] = None  # START/END/RAW 的标签名（小写）
+    attrs: Sequence[Attr] = ()
+    self_closing: bool = False
+
+
+class ImageRef(NamedTuple):
+    url: str  # 已反转义（&amp; -> &）的图片链接
+    start: int  # 链接在原文中的位置 [start, end)，替换时按位置进行
+    end: int
+    in_attr: bool = True  # 是否位于属性值中（替换时需要转义）
+
+
+def _parse_start_tag(html, pos):
+    """解析从 pos（'<' 之后）开始的开始标签，返回 (标签名, 属性列表, 是否自闭合, 结束位置)"""
+    match = _TAG_NAME_RE.match(html, pos)
+    tag = match.group(0).lower()
+    pos = match.end()
+    attrs = []
+
+    while True:
+        end_match = _TAG_END_RE.match(html, pos)
+        if end_match:
+            return tag, attrs, bool(end_match.group(1)), end_match.end()
+
+        match = _ATTR_RE.match(html, pos)
+        if match is None or match.end() == pos:
+            # 不完整的标签，吞掉到下一个 '>'（或文档末尾）
+            end = html.find(">", pos)
+            return tag, attrs, False, len(html) if end == -1 else end + 1
+
+        for group in (2, 3, 4):
+            if match.group(group) is not None:
+                attrs.append(
+                    Attr(
+                        match.group(1).lower(),
+                        match.group(group),
+                        match.start(group),
+                        match.end(group),
+                    )
+                )
+                break
+        else:
+            attrs.append(Attr(match.group(1).lower(), None, -1, -1))
+        pos = match.end()
+
+
+def tokenize(html) -> Iterator[Token]:
+    """
+    单遍扫描HTML，按文档顺序生成 token，每个 token 带有在原文中的位置
+    只做词法切分，不构建DOM树，时间复杂度与文档长度成线性关系
+    """
+    pos = 0
+    length = len(html)
+
+    while pos < length:
+        lt = html.find("<", pos)
+        if lt == -1:
+            yield Token(TEXT, pos, length)
+            return
+        if lt > pos:
+            yield Token(TEXT, pos, lt)
+        pos = lt
+
+        next_char = html[pos + 1 : pos + 2]
+        if html.startswith("<!--", pos):
+            end = html.find("-->", pos + 4)
+            end = length if end == -1 else end + 3
+            yield Token(COMMENT, pos, end)
+            pos = end
+        elif next_char in ("!", "?"):
+            end = html.find(">", pos)
+            end = length if end == -1 else end + 1
+            yield Token(DECL, pos, end)
+            pos = end
+        elif next_char == "/" and _TAG_NAME_RE.match(html, pos + 2):
+            tag = _TAG_NAME_RE.match(html, pos + 2).group(0).lower()
+            end = html.find(">", pos)
+            end = length if end == -1 else end + 1
+            yield Token(END, pos, end, tag)
+            pos = end
+        elif _TAG_NAME_RE.match(html, pos + 1):
+            tag, attrs, self_closing, end = _parse_start_tag(html, pos + 1)
+            yield Token(START, pos, end, tag, attrs, self_closing)
+            pos = end
+
+            if tag in RAW_TEXT_TAGS and not self_closing:
+                match = _RAW_END_RES[tag].search(html, pos)
+                raw_end = length if match is None else match.start()
+                if raw_end > pos:
+                    yield Token(RAW, pos, raw_end, tag)
+                pos = raw_end
+        else:
+            # 单独的 '<'，作为文本
+            end = html.find("<", pos + 1)
+            end = length if end == -1 else end
+            yield Token(TEXT, pos, end)
+            pos = end
+
+
+_CSS_STRING_RE = re.compile(r"""("(?:\\.|[^"\\])*"|'(?:\\.|[^'\\])*')""")
+_CSS_PLACEHOLDER_RE = re.compile(r"\0(\d+)\0")
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+# 只合并HTML空白字符；\s 还会匹配 &nbsp;(U+00A0)、全角空格(U+3000) 等，它们是正文内容（如段首缩进）
+_WS_RE = re.compile(r"[ \t\n\r\f]+")
+_CSS_PUNCT_RE = re.compile(r"\s*([{};,>])\s*")
+_CSS_COLON_AFTER_RE = re.compile(r":\s+")
+# 冒号前的空白只在声明中去掉（后面先遇到 '}' 而不是 '{'），选择器中的 "a :hover" 保持不变
+_CSS_COLON_BEFORE_RE = re.compile(r"\s+:(?=[^{}]*})")
+
+
+@lru_cache(maxsize=4096)  # 模板中大量重复的 style 属性只压缩一次
+def minify_css(css, declarations=False):
+    """
+    压缩CSS：去掉注释，合并空白，去掉标点前后的空白；字符串内容保持不变
+    declarations 为 True 表示内容是 style 属性中的声明列表
+    """
+    strings = []
+
+    def hold(match):
+        # 字符串先替换为占位符，压缩后再还原
+        strings.append(match.group(0))
+        return f"\0{len(strings) - 1}\0"
+
+    css = _CSS_STRING_RE.sub(hold, _CSS_COMMENT_RE.sub("", css))
+    css = _WS_RE.sub(" ", css)
+    css = _CSS_PUNCT_RE.sub(r"\1", css)
+    css = _CSS_COLON_AFTER_RE.sub(":", css)
+    if declarations:
+        css = css.replace(" :", ":").strip().rstrip(";")
+    else:
+        css = _CSS_COLON_BEFORE_RE.sub(":", css).strip()
+    if strings:
+        css = _CSS_PLACEHOLDER_RE.sub(lambda match: strings[int(match.group(1))], css)
+    return css
+
+
+def _format_attr(attr):
+    if attr.value is None:
+        return f" {attr.name}"
+    value = attr.value
+    if attr.name == "style":
+        value = minify_css(value, declarations=True)
+    if '"' not in value:
+        return f' {attr.name}="{value}"'
+    if "'" not in value:
+        return f" {attr.name}='{value}'"
+    return f' {attr.name}="{value.replace(chr(34), "&quot;")}"'
+
+
+def minify_html(html):
+    """
+    单遍压缩HTML：
+    - 去掉注释，标签和属性规范化输出，style 属性和 <style> 中的CSS单独压缩
+    - 文本中的连续空白合并为一个空格，与块级标签相邻的空白去掉
+    - <pre>/<textarea>/<script> 中的内容原样保留
+    """
+    out = []
+    pending_text = None  # 尚未输出的文本，等下一个标签确定尾部空白是否需要保留
+    after_block = True  # 上一个输出的是块级标签边界（或文档开头）
+    pre_depth = 0
+
+    def flush(next_is_block):
+        nonlocal pending_text
+        if pending_text is not None:
+            text = pending_text.rstrip(" ") if next_is_block else pending_text
+            if text:
+                out.append(text)
+            pending_text = None
+
+    for token in tokenize(html):
+        kind = token.kind
+
+        if kind == TEXT:
+            text = html[token.start : token.end]
+            if pre_depth:
+                flush(False)
+                out.append(text)
+                continue
+            text = _WS_RE.sub(" ", text)
+            if after_block or (pending_text is not None and pending_text.endswith(" ")):
+                text = text.lstrip(" ")
+            pending_text = (pending_text or "") + text
+            if text:
+                after_block = False
+        elif kind == COMMENT:
+            continue
+        elif kind == DECL:
+            flush(True)
+            out.append(_WS_RE.sub(" ", html[token.start : token.end]))
+            after_block = True
+        elif kind == RAW:
+            flush(False)
+            raw = html[token.start : token.end]
+            if token.tag == "style":
+                raw = minify_css(raw)
+            elif token.tag == "script":
+                raw = raw.strip()
+            out.append(raw)
+        else:
+            is_block = token.tag in BLOCK_TAGS
+            flush(is_block and not pre_depth)
+            if kind == START:
+                attrs = "".join(_format_attr(attr) for attr in token.attrs)
+                out.append(f"<{token.tag}{attrs}{'/' if token.self_closing else ''}>")
+                if token.tag == "pre" and not token.self_closing:
+                    pre_depth += 1
+            else:
+                out.append(f"</{token.tag}>")
+                if token.tag == "pre" and pre_depth:
+                    pre_depth -= 1
+            after_block = is_block
+
+    flush(True)
+    return "".join(out)
+
+
+# 图片链接所在的属性
+IMAGE_URL_ATTRS = ("src", "data-src", "data-image")
+IMAGE_TAGS = {"img", "source"}
+# 属性值中的引号可能已转义（如 style="background:url(&quot;a.png&quot;)"）
+_CSS_URL_RE = re.compile(
+    r"""url\(\s*(?:"([^"]*)"|'([^']*)'|(&(?:quot|apos|#3[49]|#x2[27]);)(.*?)\3|([^\s"')]*))\s*\)""",
+    re.IGNORECASE,
+)
+_SRCSET_URL_RE = re.compile(r"[\s,]*(\S*)")
+
+
+def _css_image_refs(html, start, end, refs, in_attr):
+    for match in _CSS_URL_RE.finditer(html, start, end):
+        group = next(g for g in (1, 2, 4, 5) if match.group(g) is not None)
+        refs.append(ImageRef(match.group(group), match.start(group), match.end(group), in_attr))
+
+
+def _srcset_image_refs(html, start, end, refs):
+    """
+    按HTML规范解析 srcset：链接是连续的非空白字符（可以包含逗号，如 ?x=1,2），
+    链接末尾的逗号是候选项分隔符；否则跳过描述符（1x、480w）直到下一个逗号
+    """
+    pos = start
+    while pos < end:
+        match = _SRCSET_URL_RE.match(html, pos, end)
+        url_start, url_end = match.span(1)
+        if url_start == url_end:
+            break
+        while url_end > url_start and html[url_end - 1] == ",":
+            url_end -= 1
+        if url_end > url_start:
+            refs.append(ImageRef(html[url_start:url_end], url_start, url_end))
+        if url_end < match.end(1):
+            pos = match.end(1)
+        else:
+            comma = html.find(",", url_end, end)
+            pos = end if comma < 0 else comma + 1
+
+
+def extract_image_refs(html) -> List[ImageRef]:
+    """
+    单遍提取文档中所有图片链接及其位置，按文档顺序返回（同一链接出现多次时每处都返回）：
+    - <img>/<source> 的 src、data-src、data-image、srcset（每个候选链接，不含 1x/100w 描述符）
+    - style 属性和 <style> 中 CSS 的 url()
+    内嵌的 data: 图片和空链接不返回
+    """
+    refs = []
+    for token in tokenize(html):
+        if token.kind == START:
+            for attr in token.attrs:
+                if attr.value is None:
+                    continue
+                if token.tag in IMAGE_TAGS and attr.name in IMAGE_URL_ATTRS:
+                    # 去掉链接两侧的空白
+                    value = attr.value
+                    start = attr.value_start + len(value) - len(value.lstrip())
+                    end = attr.value_end - (len(value) - len(value.rstrip()))
+                    refs.append(ImageRef(html[start:end], start, end))
+                elif token.tag in IMAGE_TAGS and attr.name == "srcset":
+                    _srcset_image_refs(html, attr.value_start, attr.value_end, refs)
+                elif attr.name == "style" and "url(" in attr.value.lower():
+                    _css_image_refs(html, attr.value_start, attr.value_end, refs, True)
+        elif token.kind == RAW and token.tag == "style":
+            _css_image_refs(html, token.start, token.end, refs, False)
+
+    return [
+        ImageRef(
+            html_lib.unescape(ref.url) if ref.in_attr else ref.url, ref.start, ref.end, ref.in_attr
+        )
+        for ref in refs
+        if ref.url and not ref.url.startswith("data:")
+    ]
+
+
+def rewrite_image_urls(html, url_map, refs=None) -> str:
+    """
+    按位置一次性替换图片链接，返回新文档：
+    - url_map 为 {原链接: 新链接}，不在其中的链接保持不变
+    - refs 为 extract_image_refs(html) 的结果，已有时传入避免重复扫描
+    只替换图片引用所在的位置，不会误改正文中的相同文字，也不会把一个链接当作另一个链接的一部分替换
+    """
+    if not url_map:
+        return html
+    if refs is None:
+        refs = extract_image_refs(html)
+
+    parts = []
+    pos = 0
+    for ref in refs:
+        new_url = url_map.get(ref.url)
+        if new_url is None or ref.start < pos:
+            continue
+        parts.append(html[pos : ref.start])
+        parts.append(html_lib.escape(new_url) if ref.in_attr else new_url)
+        pos = ref.end
+    if not parts:
+        return html
+    parts.append(html[pos:])
+    return "".join(parts)
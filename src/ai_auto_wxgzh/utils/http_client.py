@@ -0,0 +1,164 @@
+import os
+import threading
+import time
+import uuid
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+# 统一的超时：(连接超时, 读取超时)
+DEFAULT_TIMEOUT = (5, 30)
+# 每个host保持的连接数，多个公众号并发发布时共用
+POOL_SIZE = 20
+
+_session = None
+_session_lock = threading.Lock()
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+
+
+def _create_session():
+    session = requests.Session()
+    # 只对幂等请求（GET/HEAD/OPTIONS）按状态码和读取错误重试，连接失败时请求未发出，所有方法都可重试
+    retry = Retry(
+        total=3,
+        connect=3,
+        read=2,
+        status=3,
+        backoff_factor=0.5,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=frozenset(["GET", "HEAD", "OPTIONS"]),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_session() -> requests.Session:
+    """进程内共享的Session，按host复用keep-alive连接"""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = _create_session()
+        return _session
+
+
+def _record(url, elapsed, ok):
+    parsed = urlparse(url)
+    endpoint = f"{parsed.netloc}{parsed.path}"  # 不包含query，避免记录token等参数
+    with _metrics_lock:
+        metric = _metrics.setdefault(
+            endpoint, {"count": 0, "errors": 0, "total_time": 0.0, "max_time": 0.0}
+        )
+        metric["count"] += 1
+        metric["total_time"] += elapsed
+        metric["max_time"] = max(metric["max_time"], elapsed)
+        if not ok:
+            metric["errors"] += 1
+
+
+def request(method, url, timeout=DEFAULT_TIMEOUT, **kwargs) -> requests.Response:
+    """所有外部HTTP请求的统一入口：连接池、默认超时、幂等请求重试、按接口统计耗时"""
+    start = time.perf_counter()
+    ok = False
+    try:
+        response = get_session().request(method, url, timeout=timeout, **kwargs)
+        ok = response.status_code < 400
+        return response
+    finally:
+        _record(url, time.perf_counter() - start, ok)
+
+
+def get(url, **kwargs) -> requests.Response:
+    return request("GET", url, **kwargs)
+
+
+def post(url, **kwargs) -> requests.Response:
+    return request("POST", url, **kwargs)
+
+
+class MultipartFileStream:
+    """
+    以流的方式构造只包含一个文件的 multipart/form-data 请求体
+    发送时按块读取文件，内存占用固定，不随文件大小增长；长度已知，不使用chunked编码
+    用法：post(url, data=stream, headers={"Content-Type": stream.content_type})
+    """
+
+    def __init__(self, field_name, file_path, file_name, mime_type, chunk_size=65536):
+        boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={boundary}"
+        self.chunk_size = chunk_size
+        self._head = (
+            f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="{field_name}"; filename="{file_name}"\r\n'
+            f"Content-Type: {mime_type}\r\n\r\n"
+        ).encode("utf-8")
+        self._tail = f"\r\n--{boundary}--\r\n".encode("utf-8")
+        self._file_path = file_path
+        self._length = len(self._head) + os.path.getsize(file_path) + len(self._tail)
+        self._file = None
+        self.seek(0)
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(self.chunk_size)
+            if not chunk:
+                break
+            yield chunk
+
+    def seek(self, offset, whence=0):
+        """只支持回到开头，重试请求时使用"""
+        if offset != 0 or whence != 0:
+            raise ValueError("MultipartFileStream 只支持 seek(0)")
+        self.close()
+        self._parts = [self._head, None, self._tail]  # None 表示文件内容
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = self._length
+        buffer = b""
+        while self._parts and len(buffer) < size:
+            part = self._parts[0]
+            if part is None:
+                if self._file is None:
+                    self._file = open(self._file_path, "rb")
+                chunk = self._file.read(size - len(buffer))
+                if chunk:
+                    buffer += chunk
+                    continue
+                self.close()
+                self._parts.pop(0)
+            else:
+                take = size - len(buffer)
+                buffer += part[:take]
+                if len(part) > take:
+                    self._parts[0] = part[take:]
+                else:
+                    self._parts.pop(0)
+        return buffer
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def get_metrics(reset=False):
+    """返回各接口的请求次数、失败次数、平均及最大耗时（秒），reset 为True时同时清空统计"""
+    with _metrics_lock:
+        metrics = {
+            endpoint: dict(metric, avg_time=metric["total_time"] / metric["count"])
+            for endpoint, metric in _metrics.items()
+        }
+        if reset:
+            _metrics.clear()
+        return metrics
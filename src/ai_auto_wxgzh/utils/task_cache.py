@@ -0,0 +1,200 @@
+import datetime
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Any, Optional
+
+from crewai import Task
+from pydantic import Field
+from crewai.tasks.task_output import TaskOutput
+
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.config.config import Config
+
+
+class TaskOutputCache:
+    """
+    CrewAI 任务输出缓存，每条记录一个文件，保存在 cache_dir 下：
+    - key 由任务名、渲染后的任务描述、期望输出、agent（角色、目标、背景）、模型及参数、
+      上游任务输出（context）共同决定，任一项变化（如修改 agents.yaml、温度）都不会命中，
+      上游重新生成后下游自然重新执行
+    - 超过 ttl_hours 的记录失效，超过 max_entries 时淘汰最久未使用的记录
+    """
+
+    def __init__(self, cache_dir, ttl_hours=24, max_entries=200):
+        self.cache_dir = cache_dir
+        self.ttl = ttl_hours * 3600
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        utils.mkdir(self.cache_dir)
+
+    @staticmethod
+    def make_key(task_name, description, expected_output, agent_profile, llm_params, context):
+        source = json.dumps(
+            [task_name, description, expected_output, agent_profile, llm_params, context or ""],
+            ensure_ascii=False,
+            default=str,
+        )
+        return hashlib.sha256(source.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def get(self, key) -> Optional[str]:
+        """命中时返回任务的原始输出，否则返回None"""
+        path = self._path(key)
+        data = utils.load_json(path)
+        if data is None:
+            return None
+        if time.time() - data.get("created_at", 0) > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+
+        try:
+            os.utime(path)  # 记录最近使用时间，淘汰时按mtime
+        except OSError:
+            pass
+        return data.get("raw")
+
+    def put(self, key, task_name, raw):
+        try:
+            utils.save_json(
+                self._path(key), {"task": task_name, "created_at": time.time(), "raw": raw}
+            )
+        except OSError as e:
+            print(f"保存任务输出缓存失败: {e}")
+            return
+        self._evict()
+
+    def _evict(self):
+        with self._lock:
+            try:
+                files = [
+                    os.path.join(self.cache_dir, name)
+                    for name in os.listdir(self.cache_dir)
+                    if name.endswith(".json")
+                ]
+                if len(files) <= self.max_entries:
+                    return
+                files.sort(key=os.path.getmtime)
+                for path in files[: len(files) - self.max_entries]:
+                    os.remove(path)
+            except OSError as e:
+                print(f"清理任务输出缓存失败: {e}")
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache() -> Optional[TaskOutputCache]:
+    """进程内共享的任务输出缓存，配置关闭时返回None"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = Config.get_instance()
+            try:
+                if not config.task_cache_enabled:
+                    return None
+                ttl_hours = config.task_cache_ttl_hours
+                max_entries = config.task_cache_max_entries
+            except ValueError:  # 配置未加载时使用默认值
+                ttl_hours, max_entries = 24, 200
+
+            _cache = TaskOutputCache(utils.get_cache_path("task_outputs"), ttl_hours, max_entries)
+        return _cache
+
+
+# 影响输出的模型参数，参与缓存key
+LLM_PARAMS = ("model", "temperature", "top_p", "max_tokens", "seed")
+
+# 复用已有输出依赖 CrewAI Task 的内部方法（0.108 中存在），不存在时（其他版本）正常执行任务
+_REUSE_SUPPORTED = all(
+    hasattr(Task, name) for name in ("_execute_core", "_get_output_format", "_save_file")
+)
+
+
+def _llm_params(llm):
+    if isinstance(llm, str):
+        return {"model": llm}
+    params = {name: getattr(llm, name, None) for name in LLM_PARAMS}
+    params["model"] = params["model"] or str(llm)
+    return params
+
+
+class CachedTask(Task):
+    """
+    输出可复用的任务，按以下顺序查找已有输出，都没有时才调用大模型：
+    1. 本次运行的检查点（run_workspace），--resume 继续运行时已完成的任务直接跳过
+    2. 跨运行的输出缓存（TaskOutputCache），相同输入的任务直接返回上次的输出
+    失败后重新运行时，已完成的任务依次命中，从第一个需要重新执行的任务开始
+    有副作用的任务（如发布）不要使用；CrewAI 版本不支持复用输出时不查找，总是执行
+    """
+
+    run_workspace: Optional[Any] = Field(
+        default=None, exclude=True, description="本次运行的工作目录，用于保存任务检查点"
+    )
+
+    def _execute_core(self, agent, context, tools) -> TaskOutput:
+        if not _REUSE_SUPPORTED:
+            return super()._execute_core(agent, context, tools)
+
+        agent = agent or self.agent
+        workspace = self.run_workspace
+        if agent is not None and workspace is not None:
+            raw = workspace.read_checkpoint(self.name)
+            if raw is not None:
+                print(f"任务 {self.name} 已完成（检查点），跳过执行")
+                return self._reuse_output(agent, context, raw)
+
+        task_output = self._execute_cached(agent, context, tools)
+        if workspace is not None and task_output.raw:
+            workspace.write_checkpoint(self.name, task_output.raw)
+        return task_output
+
+    def _execute_cached(self, agent, context, tools) -> TaskOutput:
+        cache = get_cache()
+        if cache is None or agent is None:
+            return super()._execute_core(agent, context, tools)
+
+        key = cache.make_key(
+            self.name,
+            self.description,
+            self.expected_output,
+            [agent.role, agent.goal, agent.backstory],
+            _llm_params(agent.llm),
+            context,
+        )
+        raw = cache.get(key)
+        if raw is None:
+            task_output = super()._execute_core(agent, context, tools)
+            if task_output.raw:
+                cache.put(key, self.name, task_output.raw)
+            return task_output
+
+        print(f"任务 {self.name} 命中缓存，跳过执行")
+        return self._reuse_output(agent, context, raw)
+
+    def _reuse_output(self, agent, context, raw) -> TaskOutput:
+        """不调用大模型，使用已有的输出完成任务（同样写入 output_file）"""
+        self.agent = agent
+        self.prompt_context = context
+        self.start_time = self.end_time = datetime.datetime.now()
+        self.output = TaskOutput(
+            name=self.name,
+            description=self.description,
+            expected_output=self.expected_output,
+            raw=raw,
+            agent=agent.role,
+            output_format=self._get_output_format(),
+        )
+        if self.callback:
+            self.callback(self.output)
+        if self.output_file:
+            self._save_file(raw)
+        return self.output
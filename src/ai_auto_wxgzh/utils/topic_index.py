@@ -0,0 +1,309 @@
+import json
+import os
+import random
+import re
+import threading
+import time
+import unicodedata
+import zlib
+from typing import Optional
+
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.config.config import Config
+
+
+# MinHash 参数：32 个哈希函数，分成 8 个 band（每个 4 行）做 LSH，
+# 相似度约 0.6 以上的话题大概率落入同一个桶
+NUM_PERM = 32
+BANDS = 8
+ROWS = NUM_PERM // BANDS
+_PRIME = (1 << 61) - 1
+_rng = random.Random(20250417)  # 固定种子，保证签名在多次运行间一致
+_PERMS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+
+
+def normalize_title(title):
+    """全角转半角、转小写，去掉标点和空白，只保留文字和数字"""
+    title = unicodedata.normalize("NFKC", title).lower()
+    return re.sub(r"[\W_]+", "", title)
+
+
+# 常驻进程（worker、定时任务）中清理过期话题的间隔（秒），无效记录至少达到该数量才压缩文件
+PRUNE_INTERVAL = 3600
+COMPACT_MIN_DEAD = 1000
+
+
+def _shingles(norm, k=2):
+    if len(norm) <= k:
+        return {norm}
+    return {norm[i : i + k] for i in range(len(norm) - k + 1)}
+
+
+def minhash_signature(norm):
+    # 使用crc32而不是hash()，hash()每次启动随机化，签名无法持久化
+    hashes = [zlib.crc32(shingle.encode("utf-8")) for shingle in _shingles(norm)]
+    return [min((a * h + b) % _PRIME for h in hashes) for a, b in _PERMS]
+
+
+def _band_keys(signature):
+    return [tuple(signature[i * ROWS : (i + 1) * ROWS]) for i in range(BANDS)]
+
+
+class TopicIndex:
+    """
+    已使用话题的持久化索引，用于跨公众号、跨运行的话题去重：
+    - 完全相同（归一化后）的标题通过字典直接命中
+    - 近似重复的标题通过 MinHash + LSH 分桶查找候选，再按签名估算相似度
+    - 只有 window_hours 内使用过的话题才算重复，过期和释放的话题从索引和分桶中移除
+    - 记录以 jsonl 追加写入，启动时加载并压缩（只保留有效记录）；常驻进程中无效记录
+      超过有效记录数时再次压缩
+    - 多个进程共用记录文件，查找、写入和压缩时加文件锁，并先读入其他进程追加的记录
+    """
+
+    def __init__(self, path, window_hours=72, threshold=0.6):
+        self.path = path
+        self.window = window_hours * 3600
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._entries = {}  # norm -> {"t": 标题, "ts": 时间, "s": 签名}
+        self._buckets = [{} for _ in range(BANDS)]  # band key -> {norm, ...}
+        self._dead = 0  # 记录文件中的无效行数（过期记录、已释放记录及其删除标记）
+        self._synced = None  # 已读入内存的记录文件位置 (inode, 字节数)
+        self._pruned_at = time.time()
+        self._load()
+
+    def _file_lock(self):
+        return utils.file_lock(self.path + ".lock")
+
+    def _file_state(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size
+
+    def _read(self, cutoff):
+        """读取记录文件，返回 (有效记录, 无效行数)"""
+        entries = {}
+        dropped = 0
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("del"):
+                    if entries.pop(record["n"], None) is not None:
+                        dropped += 1
+                    dropped += 1
+                elif record["ts"] >= cutoff:
+                    if record["n"] in entries:
+                        dropped += 1
+                    entries[record["n"]] = record
+                else:
+                    dropped += 1
+        return entries, dropped
+
+    def _reload(self, cutoff):
+        """按记录文件重建索引和分桶，调用方需持有 _lock 和文件锁"""
+        self._entries, self._dead = self._read(cutoff)
+        self._buckets = [{} for _ in range(BANDS)]
+        for norm, record in self._entries.items():
+            self._add_buckets(norm, record["s"])
+        self._synced = self._file_state()
+
+    def _sync(self, now):
+        """
+        读入其他进程（界面、worker、定时任务）追加的记录，调用方需持有 _lock 和文件锁
+        记录文件被其他进程压缩（替换为新文件）后重新加载
+        """
+        state = self._file_state()
+        if state is None or state == self._synced:
+            return
+        if self._synced is None or state[0] != self._synced[0] or state[1] < self._synced[1]:
+            self._reload(now - self.window)
+            return
+
+        cutoff = now - self.window
+        with open(self.path, "rb") as f:
+            f.seek(self._synced[1])
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if self._remove(record["n"]) is not None:
+                    self._dead += 1
+                if record.get("del"):
+                    self._dead += 1
+                elif record["ts"] >= cutoff:
+                    self._entries[record["n"]] = record
+                    self._add_buckets(record["n"], record["s"])
+                else:
+                    self._dead += 1
+            self._synced = (state[0], f.tell())
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        try:
+            with self._file_lock():
+                self._reload(time.time() - self.window)
+                if self._dead:
+                    self._write(self._entries)
+                    self._dead = 0
+                    self._synced = self._file_state()
+        except OSError as e:
+            print(f"加载话题索引失败: {e}")
+
+    def _write(self, entries):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in entries.values():
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+
+    def _compact(self):
+        """
+        按记录文件重写，只保留有效记录，调用方需持有 _lock
+        先读入其他进程追加的记录，不丢失这些记录
+        """
+        now = time.time()
+        try:
+            with self._file_lock():
+                self._sync(now)
+                entries, dropped = self._read(now - self.window)
+                if dropped:
+                    self._write(entries)
+                    self._synced = self._file_state()
+        except OSError as e:
+            print(f"压缩话题索引失败: {e}")
+            return
+        self._dead = 0
+
+    def _append(self, record):
+        """追加记录，调用方需持有 _lock 和文件锁，且刚调用过 _sync"""
+        utils.mkdir(os.path.dirname(self.path))
+        with open(self.path, "ab") as f:
+            f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+        self._synced = self._file_state()
+
+    def _add_buckets(self, norm, signature):
+        for bucket, key in zip(self._buckets, _band_keys(signature)):
+            bucket.setdefault(key, set()).add(norm)
+
+    def _remove(self, norm):
+        """从索引和分桶中移除，返回移除的记录，调用方需持有 _lock"""
+        record = self._entries.pop(norm, None)
+        if record is None:
+            return None
+        for bucket, key in zip(self._buckets, _band_keys(record["s"])):
+            norms = bucket.get(key)
+            if norms is not None:
+                norms.discard(norm)
+                if not norms:
+                    del bucket[key]
+        return record
+
+    def _prune(self, now):
+        """每隔 PRUNE_INTERVAL 秒移除过期话题，无效记录过多时压缩记录文件，调用方需持有 _lock"""
+        if now - self._pruned_at < PRUNE_INTERVAL:
+            return
+        self._pruned_at = now
+        cutoff = now - self.window
+        for norm in [norm for norm, record in self._entries.items() if record["ts"] < cutoff]:
+            self._remove(norm)
+            self._dead += 1
+        if self._dead > max(len(self._entries), COMPACT_MIN_DEAD):
+            self._compact()
+
+    def _find(self, norm, signature, now):
+        cutoff = now - self.window
+        record = self._entries.get(norm)
+        if record and record["ts"] >= cutoff:
+            return record["t"]
+
+        candidates = set()
+        for bucket, key in zip(self._buckets, _band_keys(signature)):
+            candidates.update(bucket.get(key, ()))
+
+        for candidate in candidates:
+            record = self._entries.get(candidate)
+            if record is None or record["ts"] < cutoff:
+                continue
+            same = sum(1 for x, y in zip(signature, record["s"]) if x == y)
+            if same / NUM_PERM >= self.threshold:
+                return record["t"]
+
+        return None
+
+    def find_duplicate(self, title) -> Optional[str]:
+        """返回窗口期内与title重复或近似重复的已用话题，没有则返回None"""
+        norm = normalize_title(title)
+        if not norm:
+            return None
+        signature = minhash_signature(norm)
+        now = time.time()
+        with self._lock, self._file_lock():
+            self._sync(now)
+            return self._find(norm, signature, now)
+
+    def is_used(self, title):
+        return self.find_duplicate(title) is not None
+
+    def claim(self, title, **meta):
+        """
+        话题未被使用时记录为已使用并返回True
+        检查和记录都在文件锁内，检查前先读入其他进程追加的记录，
+        多个线程、多个进程并发运行也不会选中同一话题
+        """
+        norm = normalize_title(title)
+        if not norm:
+            return False
+        signature = minhash_signature(norm)
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            with self._file_lock():
+                self._sync(now)
+                if self._find(norm, signature, now) is not None:
+                    return False
+                if self._remove(norm) is not None:  # 同一话题的过期记录
+                    self._dead += 1
+                record = dict(meta, t=title, n=norm, ts=now, s=signature)
+                self._entries[norm] = record
+                self._add_buckets(norm, signature)
+                self._append(record)
+                return True
+
+    def release(self, title):
+        """运行失败时释放话题，允许再次使用"""
+        norm = normalize_title(title)
+        with self._lock, self._file_lock():
+            self._sync(time.time())
+            if self._remove(norm) is not None:
+                self._append({"n": norm, "del": True})
+                self._dead += 2  # 话题记录和删除标记
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index() -> Optional[TopicIndex]:
+    """进程内共享的话题索引，配置关闭去重时返回None"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            config = Config.get_instance()
+            try:
+                if not config.topic_dedup_enabled:
+                    return None
+                window_hours = config.topic_dedup_window_hours
+                threshold = config.topic_dedup_threshold
+            except ValueError:  # 配置未加载时使用默认值
+                window_hours, threshold = 72, 0.6
+
+            _index = TopicIndex(utils.get_cache_path("topic_index.jsonl"), window_hours, threshold)
+        return _index
@@ -1,12 +1,23 @@
 import re
 import os
+import json
+import uuid
 import random
 import warnings
-from bs4 import BeautifulSoup
 import requests
 import time
 import sys
 import shutil
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+from src.ai_auto_wxgzh.utils import http_client
+from src.ai_auto_wxgzh.utils import html_tokenizer
 
 
 def mkdir(path, clean=False):
@@ -63,6 +74,8 @@ def extract_modified_article(content):
 
 
 def extract_html(html, max_length=64):
+    from bs4 import BeautifulSoup  # 首次使用时才导入，不拖慢启动
+
     title = None
     digest = None
 
@@ -92,6 +105,8 @@ def extract_html(html, max_length=64):
 
 
 def replace_image_urls_with_array(html, new_urls):
+    from bs4 import BeautifulSoup
+
     soup = BeautifulSoup(html, "html.parser")
     img_tags = soup.find_all("img")
 
@@ -120,19 +135,41 @@ def get_latest_file_os(dir_path):
 
 
 def extract_image_urls(html_content):
-    patterns = [
-        r'<img[^>]*?src=["\'](.*?)["\']',  # 匹配 src
-        r'<img[^>]*?srcset=["\'](.*?)["\']',  # 匹配 srcset
-        r'<img[^>]*?data-(?:src|image)=["\'](.*?)["\']',  # 匹配 data-src/data-image
-        r'background(?:-image)?\s*:\s*url$["\']?(.*?)["\']?$',  # 匹配 background
-    ]
-    urls = []
-    for pattern in patterns:
-        matches = re.findall(pattern, html_content, re.IGNORECASE)
-        urls.extend(
-            [url for match in matches for url in (match.split(",") if "," in match else [match])]
-        )
-    return list(set(urls))
+    # 单遍提取 src/srcset/data-src/CSS url() 中的图片链接，按文档顺序去重
+    refs = html_tokenizer.extract_image_refs(html_content)
+    return list(dict.fromkeys(ref.url for ref in refs))
+
+
+# 常见图片格式的文件头：(文件头, MIME 类型, 扩展名)
+_IMAGE_SIGNATURES = [
+    (b"\xff\xd8\xff", "image/jpeg", ".jpg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+    (b"GIF87a", "image/gif", ".gif"),
+    (b"GIF89a", "image/gif", ".gif"),
+    (b"BM", "image/bmp", ".bmp"),
+]
+
+
+def sniff_image_type(file_path):
+    """根据文件头判断图片类型，返回 (MIME 类型, 扩展名)，无法识别时返回 (None, None)"""
+    with open(file_path, "rb") as f:
+        head = f.read(16)
+
+    for signature, mime_type, file_ext in _IMAGE_SIGNATURES:
+        if head.startswith(signature):
+            return mime_type, file_ext
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+
+    return None, None
+
+
+def replace_urls(html_content, url_map, refs=None):
+    """
+    将 HTML 中的图片链接按 url_map 替换，按解析得到的位置一次生成新文档
+    refs 为已提取的图片引用（html_tokenizer.extract_image_refs），没有时自动提取
+    """
+    return html_tokenizer.rewrite_image_urls(html_content, url_map, refs)
 
 
 def download_and_save_image(image_url, local_image_folder):
@@ -152,12 +189,12 @@ def download_and_save_image(image_url, local_image_folder):
             os.makedirs(local_image_folder)
 
         # 下载图片，允许重定向
-        response = requests.get(image_url, stream=True, allow_redirects=True)
+        response = http_client.get(image_url, stream=True, allow_redirects=True)
         response.raise_for_status()
 
-        # 生成本地文件名
+        # 生成本地文件名，并发下载时秒级时间戳会重名，追加随机后缀
         timestamp = str(int(time.time()))
-        local_filename = os.path.join(local_image_folder, f"{timestamp}.jpg")
+        local_filename = os.path.join(local_image_folder, f"{timestamp}_{uuid.uuid4().hex[:8]}.jpg")
         # 保存图片到本地
         with open(local_filename, "wb") as file:
             for chunk in response.iter_content(chunk_size=8192):
@@ -185,14 +222,15 @@ def replace_image_urls_in_html(html_content, local_image_folder):
     Returns:
         str: 修改后的 HTML 内容。
     """
-    image_urls = extract_image_urls(html_content)
+    refs = html_tokenizer.extract_image_refs(html_content)
 
-    for image_url in image_urls:
+    url_map = {}
+    for image_url in dict.fromkeys(ref.url for ref in refs):
         local_filename = download_and_save_image(image_url, local_image_folder)
         if local_filename:
-            html_content = html_content.replace(image_url, local_filename)
+            url_map[image_url] = local_filename
 
-    return html_content
+    return replace_urls(html_content, url_map, refs)
 
 
 def get_current_dir(dir_name=""):
@@ -201,21 +239,92 @@ def get_current_dir(dir_name=""):
     return os.path.join(current_dir, "../../../", dir_name)
 
 
+def get_data_dir(dir_name=""):
+    """
+    持久化数据（运行目录runs、缓存cache、任务队列jobs）的目录：
+    源码运行时为项目根目录；打包后 get_current_dir 位于退出时删除的临时解压目录（_MEIPASS），
+    改用可执行文件所在目录，重启后检查点、缓存、任务仍在
+    """
+    if get_is_release_ver():
+        base_dir = os.path.dirname(os.path.abspath(sys.executable))
+    else:
+        base_dir = get_current_dir()
+    return os.path.normpath(os.path.join(base_dir, dir_name))
+
+
+def get_cache_path(file_name):
+    """缓存文件路径（数据目录cache下），目录不存在时自动创建"""
+    cache_dir = get_data_dir("cache")
+    mkdir(cache_dir)
+    return os.path.join(cache_dir, file_name)
+
+
+def parse_time_window(window):
+    """解析 "HH:MM-HH:MM" 格式的时间段，返回当天的起止分钟数，格式错误或结束不晚于开始时抛出ValueError"""
+    match = re.fullmatch(r"\s*(\d{1,2}):(\d{2})\s*-\s*(\d{1,2}):(\d{2})\s*", str(window))
+    if match is None:
+        raise ValueError(f"时间段格式错误：{window}，应为 HH:MM-HH:MM")
+    h1, m1, h2, m2 = (int(value) for value in match.groups())
+    start, end = h1 * 60 + m1, h2 * 60 + m2
+    if max(h1, h2) > 24 or max(m1, m2) > 59 or end > 24 * 60 or start >= end:
+        raise ValueError(f"时间段无效：{window}，结束时间需晚于开始时间（不支持跨天）")
+    return start, end
+
+
+def load_json(path, default=None):
+    """读取json文件，文件不存在或损坏时返回default"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path, data):
+    """原子写入json文件：先写临时文件再替换，避免并发读到半个文件"""
+    mkdir(os.path.dirname(path))
+    tmp_path = f"{path}.{uuid.uuid4().hex[:8]}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+@contextmanager
+def file_lock(path):
+    """
+    跨进程互斥锁（界面、worker、定时任务是不同的进程），锁住 path 文件，退出时释放
+    同一进程的多个线程之间同样互斥，不可重入
+    """
+    mkdir(os.path.dirname(path))
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK 约10秒仍未获得锁时报错，继续等待
+                    continue
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
 def compress_html(content):
-    # 移除注释
-    content = re.sub(r"<!--.*?-->", "", content, flags=re.DOTALL)
-    # 移除换行和制表符
-    content = re.sub(r"[\n\t]+", "", content)
-    # 移除多余空格（保留属性分隔空格）
-    content = re.sub(r"\s+", " ", content)
-    # 移除=、>、<、;、: 前后的空格
-    content = re.sub(r"\s*([=><;,:])\s*", r"\1", content)
-    # 移除标签间空格
-    content = re.sub(r">\s+<", "><", content)
-    return content
+    # 单遍压缩：去掉注释和无意义空白，文本、CSS值中有意义的空格保留（见 html_tokenizer）
+    return html_tokenizer.minify_html(content)
 
 
 def decompress_html(compressed_content):
+    from bs4 import BeautifulSoup
+
     # 解析压缩的HTML
     soup = BeautifulSoup(compressed_content, "html.parser")
     # 格式化输出，添加换行和缩进
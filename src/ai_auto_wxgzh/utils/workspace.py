@@ -0,0 +1,119 @@
+import os
+import uuid
+import threading
+from datetime import datetime
+
+from src.ai_auto_wxgzh.utils import utils
+
+
+# 所有运行的工作目录都在数据目录（见 utils.get_data_dir）的runs下，每次运行一个子目录
+RUNS_DIR = "runs"
+
+
+def new_run_id():
+    # 时间前缀方便按时间排序查找，随机后缀保证并发运行时不重复
+    return f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:6]}"
+
+
+def _runs_path():
+    return utils.get_data_dir(RUNS_DIR)
+
+
+def run_exists(run_id):
+    """运行ID对应的工作目录是否存在（有元数据）"""
+    return bool(run_id) and os.path.isfile(
+        os.path.join(_runs_path(), run_id, RunWorkspace.META_FILE)
+    )
+
+
+def list_runs(status=None):
+    """按时间倒序返回所有运行的元数据，可按状态（running/done/failed）过滤"""
+    try:
+        run_ids = sorted(os.listdir(_runs_path()), reverse=True)
+    except OSError:
+        return []
+
+    runs = []
+    for run_id in run_ids:
+        meta = utils.load_json(os.path.join(_runs_path(), run_id, RunWorkspace.META_FILE))
+        if meta and (status is None or meta.get("status") == status):
+            runs.append(meta)
+    return runs
+
+
+class RunWorkspace:
+    """
+    单次CrewAI运行的独立工作目录，保存中间产物、图片、最终文章及元数据，
+    各任务之间通过该目录交接数据，多个运行可以同时进行互不覆盖
+    """
+
+    TMP_ARTICLE = "tmp_article.html"
+    FINAL_ARTICLE = "final_article.html"
+    META_FILE = "meta.json"
+    CHECKPOINT_DIR = "checkpoints"
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or new_run_id()
+        self.path = os.path.join(_runs_path(), self.run_id)
+        self.image_dir = os.path.join(self.path, "image")
+        self._lock = threading.Lock()
+        utils.mkdir(self.image_dir)
+
+    def file(self, file_name):
+        """工作目录下文件的绝对路径"""
+        return os.path.join(self.path, file_name)
+
+    def output_file(self, file_name):
+        """
+        供CrewAI Task.output_file使用的路径，CrewAI按当前目录解析相对路径
+        CrewAI会去掉绝对路径的前导/且不允许出现..，工作目录在当前目录下时使用相对路径，
+        否则（如打包后从其他目录启动）使用绝对路径（Windows 带盘符的路径不会被修改）
+        """
+        path = self.file(file_name)
+        try:
+            relative = os.path.relpath(path)
+        except ValueError:  # Windows 下与当前目录不在同一个盘
+            return path
+        if ".." in relative.split(os.sep):
+            return path
+        return relative.replace(os.sep, "/")
+
+    @property
+    def tmp_article(self):
+        return self.file(self.TMP_ARTICLE)
+
+    @property
+    def final_article(self):
+        return self.file(self.FINAL_ARTICLE)
+
+    def read_meta(self):
+        return utils.load_json(self.file(self.META_FILE), {})
+
+    def write_meta(self, **kwargs):
+        """合并更新元数据（不要写入appsecret等敏感信息）"""
+        with self._lock:
+            meta = self.read_meta()
+            if not meta:
+                meta = {"run_id": self.run_id, "created_at": datetime.now().isoformat()}
+            meta.update(kwargs)
+            meta["updated_at"] = datetime.now().isoformat()
+            utils.save_json(self.file(self.META_FILE), meta)
+            return meta
+
+    def _checkpoint_file(self, stage):
+        return os.path.join(self.path, self.CHECKPOINT_DIR, f"{stage}.json")
+
+    def read_checkpoint(self, stage, default=None):
+        """读取阶段检查点，阶段未完成时返回default"""
+        data = utils.load_json(self._checkpoint_file(stage))
+        return default if data is None else data["value"]
+
+    def write_checkpoint(self, stage, value):
+        """
+        记录已完成阶段的结果（任务输出、封面media_id、草稿media_id等），
+        --resume 继续运行时已完成的阶段直接使用该结果，不再重复执行
+        """
+        utils.save_json(
+            self._checkpoint_file(stage), {"value": value, "at": datetime.now().isoformat()}
+        )
+        self.write_meta(stage=stage)
@@ -0,0 +1,179 @@
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+from src.ai_auto_wxgzh.config.config import Config
+from src.ai_auto_wxgzh.tools import wx_media_cache
+from src.ai_auto_wxgzh.tools import wx_token
+from src.ai_auto_wxgzh.tools.wx_publisher import WeixinPublisher
+from src.ai_auto_wxgzh.utils import utils
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+
+@pytest.fixture
+def project_dir(tmp_path, monkeypatch):
+    """项目根目录（runs、cache、jobs 等）指向临时目录，不影响项目中已有的数据"""
+    monkeypatch.setattr(
+        utils, "get_current_dir", lambda dir_name="": os.path.join(str(tmp_path), dir_name)
+    )
+    return tmp_path
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """已加载默认配置的独立 Config 单例，保存配置时写入临时目录"""
+    instance = Config()
+    monkeypatch.setattr(instance, "_config_path", str(tmp_path / "config.yaml"))
+    monkeypatch.setattr(Config, "_instance", instance)
+    instance.load_config()
+    return instance
+
+
+def update_config(config, **sections):
+    """修改配置中的若干项（如 max_workers=2、wechat={...}）并保存，返回新的配置字典"""
+    data = config.get_config()
+    data.update(sections)
+    assert config.save_config(data)
+    return data
+
+
+class _RouteHandler(BaseHTTPRequestHandler):
+    def _dispatch(self):
+        route = self.server.routes.get(urlparse(self.path).path)
+        if route is None:
+            status, body, content_type = 404, b"not found", "text/plain"
+        else:
+            status, body, content_type = route(self)
+
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    do_GET = do_POST = do_HEAD = do_OPTIONS = _dispatch
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    """
+    本地 HTTP 服务，模拟外部接口，调用 http_server(routes) 启动并返回服务地址
+    routes 为 {路径: 处理函数}，处理函数接收请求 handler，返回 (状态码, 内容bytes, Content-Type)
+    """
+    servers = []
+
+    def start(routes):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _RouteHandler)
+        server.daemon_threads = True
+        server.routes = routes
+        threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_port}"
+
+    yield start
+
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class Concurrency:
+    """记录同时处理中的请求数的峰值"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.running -= 1
+
+
+@pytest.fixture
+def wechat(http_server, monkeypatch):
+    """
+    模拟微信接口和图片服务器：
+    - /img/<name>.png 返回图片，内容中带有图片名；未配置的图片返回404
+    - material/add_material 上传的图片是 bad 时返回错误码
+    - draft/add 的封面在 state["deleted"] 中时返回素材无效（40007）
+    """
+    state = {"images": ["a", "b", "c", "d", "bad"], "downloads": Concurrency()}
+    state["uploads"] = Concurrency()
+    state["uploaded"] = []
+    state["deleted"] = set()
+    state["drafts"] = []
+    state["materials"] = []  # 上传素材请求的 (请求头, 请求体)
+
+    def token(handler):
+        body = {"access_token": "token", "expires_in": 7200}
+        return 200, json.dumps(body).encode(), "application/json"
+
+    def image(name):
+        def serve(handler):
+            with state["downloads"]:
+                time.sleep(0.2)
+            return 200, PNG + name.encode(), "image/png"
+
+        return serve
+
+    def add_material(handler):
+        body = handler.rfile.read(int(handler.headers["Content-Length"]))
+        state["materials"].append((dict(handler.headers), body))
+        with state["uploads"]:
+            time.sleep(0.1)
+        name = re.search(rb"\x00{64}(\w+)", body).group(1).decode()
+        if name == "bad":
+            data = {"errcode": 40005, "errmsg": "invalid file type"}
+        else:
+            state["uploaded"].append(name)
+            media_id = f"media_{name}_{len(state['uploaded'])}"
+            data = {"media_id": media_id, "url": f"http://mmbiz.qpic.cn/{name}.png"}
+        return 200, json.dumps(data).encode(), "application/json"
+
+    def add_draft(handler):
+        body = json.loads(handler.rfile.read(int(handler.headers["Content-Length"])))
+        thumb_media_id = body["articles"][0]["thumb_media_id"]
+        state["drafts"].append(thumb_media_id)
+        if thumb_media_id in state["deleted"]:
+            data = {"errcode": 40007, "errmsg": "invalid media_id"}
+        else:
+            data = {"media_id": f"draft_{len(state['drafts'])}"}
+        return 200, json.dumps(data).encode(), "application/json"
+
+    routes = {
+        "/cgi-bin/token": token,
+        "/cgi-bin/material/add_material": add_material,
+        "/cgi-bin/draft/add": add_draft,
+    }
+    routes.update({f"/img/{name}.png": image(name) for name in state["images"]})
+    base_url = http_server(routes)
+
+    store = wx_token.AccessTokenStore()
+    store.TOKEN_URL = f"{base_url}/cgi-bin/token"
+    monkeypatch.setattr(wx_token, "_store", store)
+    monkeypatch.setattr(wx_media_cache, "_cache", wx_media_cache.MediaCache())
+    monkeypatch.setattr(WeixinPublisher, "BASE_URL", f"{base_url}/cgi-bin")
+    state["base_url"] = base_url
+    return state
+
+
+@pytest.fixture
+def publisher(tmp_path):
+    return WeixinPublisher("appid0", "secret", "作者", None, None, None, str(tmp_path))
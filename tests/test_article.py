@@ -0,0 +1,128 @@
+import html
+import importlib
+import sys
+
+import pytest
+from bs4 import BeautifulSoup
+
+from src.ai_auto_wxgzh.utils import article
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.utils.article import Article
+
+DOCUMENT = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>
+  多地气温
+  创今年新高
+</title>
+<style>.cover { background: url("https://img.example.com/bg.png"); }</style>
+</head>
+<body>
+<h1>不是标题</h1>
+<section style="background-image: url(&quot;https://img.example.com/s.png&quot;)">
+<p>今年入夏以来，<strong>多地</strong>最高气温突破40℃。</p>
+<img src="https://img.example.com/a.png?w=1&amp;h=2" alt="配图">
+<img data-src="https://img.example.com/b.png"
+     srcset="https://img.example.com/b.png 1x, https://img.example.com/b@2x.png 2x">
+<p>气象部门提醒注意防暑。</p>
+<img src="https://img.example.com/a.png?w=1&amp;h=2">
+</section>
+</body>
+</html>"""
+
+
+@pytest.fixture(params=["lxml", "html.parser"])
+def parser(request, monkeypatch):
+    """lxml 和内置解析器的结果应一致"""
+    monkeypatch.setattr(article, "PARSER", request.param)
+    return request.param
+
+
+@pytest.mark.parametrize(
+    "document",
+    [
+        DOCUMENT,
+        "<h1>只有h1  的\n标题</h1><p>正文</p>",
+        "<p>没有标题的文章</p>",
+        "<html><body><h1></h1></body></html>",
+        "<p>" + "很长的正文。" * 30 + "</p>",
+    ],
+)
+def test_title_and_digest_match_extract_html(parser, document):
+    art = Article(document)
+
+    assert (art.title, art.digest) == utils.extract_html(document)
+
+
+def test_digest_length_and_text_only(parser):
+    art = Article(
+        "<title>标题</title><script>var x = '脚本';</script><!-- 注释 -->"
+        "<p>第一段&nbsp;文字</p><p>" + "很长" * 50 + "</p>",
+        max_length=20,
+    )
+
+    assert art.title == "标题"
+    assert len(art.digest) == 20 + len("...")
+    assert art.digest.startswith("标题 第一段\xa0文字 很长")  # &nbsp; 保持不变
+    assert "脚本" not in art.digest and "注释" not in art.digest
+
+
+def test_body_is_parsed_document_without_comments_and_scripts(parser):
+    document = DOCUMENT.replace("<body>", "<body><!-- 草稿 --><script>alert(1)</script>")
+
+    art = Article(document)
+
+    # 只解析一次：除了去掉注释和脚本，body 就是解析后的文档，发布时直接使用
+    assert art.body == str(BeautifulSoup(DOCUMENT, parser))
+    assert Article(DOCUMENT).body == art.body
+    assert Article(art.body).body == art.body
+
+
+def test_image_refs_point_into_body(parser):
+    art = Article(DOCUMENT)
+
+    assert art.image_urls == [
+        "https://img.example.com/bg.png",
+        "https://img.example.com/s.png",
+        "https://img.example.com/a.png?w=1&h=2",
+        "https://img.example.com/b.png",
+        "https://img.example.com/b@2x.png",
+    ]
+    assert len(art.image_refs) == 7
+    for ref in art.image_refs:
+        text = art.body[ref.start : ref.end]
+        assert (html.unescape(text) if ref.in_attr else text) == ref.url
+
+    url_map = {url: f"https://mmbiz.qpic.cn/{i}.png" for i, url in enumerate(art.image_urls)}
+    replaced = utils.replace_urls(art.body, url_map, art.image_refs)
+    # 按已提取的位置替换与重新提取后替换结果一致
+    assert replaced == utils.replace_urls(art.body, url_map)
+    assert "img.example.com" not in replaced
+    assert replaced.count("https://mmbiz.qpic.cn/2.png") == 2
+
+
+def test_from_output_extracts_reviewed_article(parser):
+    output = "审核意见：无问题。\n```html\n<title>修改后</title><p>正文</p>\n```\n其他说明"
+
+    art = Article.from_output(output)
+
+    assert art.title == "修改后"
+    assert "审核意见" not in art.body and "其他说明" not in art.body
+    assert Article.from_output("<title>原文</title>").title == "原文"
+
+
+def test_falls_back_to_html_parser_without_lxml(monkeypatch):
+    parser = article.PARSER
+    monkeypatch.setitem(sys.modules, "lxml", None)  # import lxml 抛出 ImportError
+    try:
+        fallback = importlib.reload(article)
+        assert fallback.PARSER == "html.parser"
+        art = fallback.Article(DOCUMENT)
+        assert (art.title, art.digest) == utils.extract_html(DOCUMENT)
+        assert len(art.image_refs) == 7
+    finally:
+        monkeypatch.undo()
+        importlib.reload(article)
+    assert article.PARSER == parser
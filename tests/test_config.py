@@ -0,0 +1,255 @@
+import copy
+import dataclasses
+import threading
+
+import pytest
+import yaml
+
+from src.ai_auto_wxgzh.config.config import Config, ConfigSnapshot
+from src.ai_auto_wxgzh.crew import AutowxGzh
+from conftest import update_config
+
+
+def make_config(config, version):
+    """两份各项互相对应的配置：api_type、api_key、模型和 max_workers 都带版本号"""
+    data = copy.deepcopy(config.default_config)
+    api_type = "Qwen" if version % 2 else "Grok"
+    data["api"]["api_type"] = api_type
+    data["api"][api_type].update(
+        api_key=[f"key{version}"], key_index=0, model=[f"model{version}"], model_index=0
+    )
+    data["max_workers"] = version
+    return data
+
+
+def expected(data):
+    api_type = data["api"]["api_type"]
+    api = data["api"][api_type]
+    return api_type, api["api_key"][0], api["model"][0], data["max_workers"]
+
+
+def test_properties_require_loaded_config():
+    config = Config()
+    with pytest.raises(ValueError):
+        config.api_key
+    with pytest.raises(ValueError):
+        config.snapshot()
+
+
+def test_load_defaults_when_file_missing(config):
+    assert config.api_type == "OpenRouter"
+    assert config.max_workers == 1
+    assert config.publish_mode == "direct"
+    assert [platform["name"] for platform in config.platforms][:2] == ["微博", "抖音"]
+    assert config.get_config() == config.default_config
+
+
+def test_save_and_reload(config, tmp_path, monkeypatch):
+    data = make_config(config, 3)
+    assert config.save_config(data)
+    assert (config.api_type, config.api_key, config.api_model, config.max_workers) == expected(data)
+
+    reloaded = Config()
+    monkeypatch.setattr(reloaded, "_config_path", config._config_path)
+    assert reloaded.load_config()
+    assert reloaded.get_config() == data
+
+
+def test_broken_file_falls_back_to_defaults(config):
+    with open(config._config_path, "w", encoding="utf-8") as f:
+        f.write("api: [unclosed")
+
+    assert not config.load_config()
+    assert "config.yaml" in config.error_message
+    assert config.get_config() == config.default_config
+
+
+def test_snapshot_is_immutable_and_get_config_is_a_copy(config):
+    snapshot = config.snapshot()
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        snapshot.max_workers = 4
+    with pytest.raises(TypeError):
+        snapshot.raw["max_workers"] = 4
+    with pytest.raises(TypeError):
+        snapshot.platforms[0]["weight"] = 1
+
+    data = config.get_config()
+    data["max_workers"] = 4
+    data["platforms"].append({"name": "新平台", "weight": 0})
+    assert config.max_workers == 1
+    assert len(config.platforms) == len(config.default_config["platforms"])
+    # 保存后整体替换快照，之前取得的快照不变
+    assert config.save_config(data)
+    assert config.max_workers == 4
+    assert snapshot.max_workers == 1
+
+
+def test_snapshot_is_consistent_while_loading_and_saving(config):
+    versions = [make_config(config, version) for version in (1, 2)]
+    allowed = {expected(data) for data in versions}
+    config.save_config(versions[0])
+    stop = threading.Event()
+    errors = []
+
+    def write():
+        for i in range(30):
+            data = versions[i % 2]
+            if i % 3:
+                # 模拟界面或其他进程修改了配置文件后重新加载
+                with open(config._config_path, "w", encoding="utf-8") as f:
+                    yaml.safe_dump(data, f, allow_unicode=True)
+                config.load_config()
+            else:
+                config.save_config(data)
+        stop.set()
+
+    def read():
+        while not stop.is_set():
+            snapshot = config.snapshot()
+            values = (snapshot.api_type, snapshot.api_key, snapshot.api_model, snapshot.max_workers)
+            if values not in allowed:
+                errors.append(values)
+            if snapshot.raw["max_workers"] != snapshot.max_workers:
+                errors.append(("raw", snapshot.raw["max_workers"], snapshot.max_workers))
+
+    readers = [threading.Thread(target=read) for _ in range(2)]
+    for thread in readers:
+        thread.start()
+    write()
+    for thread in readers:
+        thread.join()
+
+    assert errors == []
+
+
+def test_agent_llm_config(config):
+    update_config(
+        config,
+        agent_models={
+            "auditor": {"model": "openai/qwen-plus", "api_type": "Qwen", "temperature": 0.2},
+            "writer": {"temperature": 0.9},
+        },
+    )
+    snapshot = config.snapshot()
+
+    assert snapshot.agent_llm_config("auditor") == {
+        "model": "openai/qwen-plus",
+        "api_key": "",
+        "base_url": "https://dashscope.aliyuncs.com/compatible-mode/v1",
+        "temperature": 0.2,
+    }
+    # 没有单独配置模型时使用全局模型
+    assert snapshot.agent_llm_config("writer") is None
+    assert snapshot.agent_llm_config("designer") is None
+
+
+def test_schedule_account(config):
+    schedule = dict(config.get_config()["schedule"], accounts={"appid1": {"daily_limit": 2}})
+    update_config(config, schedule=schedule)
+
+    assert config.snapshot().schedule_account("appid0") == (("08:00-09:00", "20:00-21:00"), 1)
+    assert config.snapshot().schedule_account("appid1") == (("08:00-09:00", "20:00-21:00"), 2)
+
+
+def test_from_dict_tolerates_incomplete_config(config):
+    snapshot = ConfigSnapshot.from_dict({"api": {"api_type": "Missing"}}, config.default_config)
+
+    assert snapshot.api_key is None
+    assert snapshot.platforms == ()
+    assert snapshot.max_workers == 1
+    assert snapshot.hotnews_sources == tuple(config.default_config["hotnews"]["sources"])
+
+
+def test_agent_llm_config_params(config):
+    data = config.get_config()
+    api_type = data["api"]["api_type"]
+    data["api"][api_type].update(api_key=["key0", "key1"], key_index=1)
+    route = {
+        "model": "openai/writer-model",
+        "temperature": 0.9,
+        "max_tokens": 2048,
+        "stop": ["END"],
+        "extra_headers": {"X-Trace": "1"},
+        "top_p": None,
+    }
+    update_config(config, api=data["api"], agent_models={"writer": route, "auditor": None})
+
+    llm_config = config.agent_llm_config("writer")
+
+    # 未指定 api_type 时使用当前平台的 api_key（按 key_index）、api_base，其余参数原样传给 LLM
+    assert llm_config == {
+        "model": "openai/writer-model",
+        "api_key": "key1",
+        "base_url": data["api"][api_type]["api_base"],
+        "temperature": 0.9,
+        "max_tokens": 2048,
+        "stop": ["END"],
+        "extra_headers": {"X-Trace": "1"},
+    }
+    # 返回可修改的副本，不影响配置快照
+    llm_config["stop"].append("STOP")
+    assert config.agent_llm_config("writer")["stop"] == ["END"]
+    assert config.agent_llm_config("auditor") is None
+
+
+def test_agent_llm_config_requires_loaded_config():
+    with pytest.raises(ValueError):
+        Config().agent_llm_config("writer")
+
+
+@pytest.mark.parametrize(
+    "route, message",
+    [
+        ({"api_type": "Missing", "model": "m"}, "writer 的模型平台 Missing 不存在"),
+        ({"api_type": "Qwen"}, "未配置 writer 的模型"),
+        ({"api_type": "Qwen", "model": "openai/qwen-plus"}, "未配置 writer 所用模型平台的API KEY"),
+    ],
+)
+def test_validate_agent_models(config, route, message):
+    data = config.get_config()
+    api_type = data["api"]["api_type"]
+    data["api"][api_type].update(api_key=["key0"], key_index=0)
+    data["api"]["Qwen"].update(api_key=[""], key_index=0)
+    wechat = dict(data["wechat"], credentials=[{"appid": "a", "appsecret": "s", "author": "作者"}])
+    update_config(config, api=data["api"], wechat=wechat)
+    assert config.validate_config(), config.error_message
+
+    update_config(config, agent_models={"writer": route})
+
+    assert not config.validate_config()
+    assert message in config.error_message
+
+
+@pytest.fixture
+def crew(config, project_dir, monkeypatch):
+    monkeypatch.setenv("MODEL", "openai/global-model")
+    data = config.get_config()
+    data["api"]["Qwen"].update(api_key=["qwen-key"], key_index=0)
+    update_config(
+        config,
+        api=data["api"],
+        agent_models={
+            "auditor": {"model": "openai/qwen-plus", "api_type": "Qwen", "temperature": 0.2}
+        },
+    )
+    return AutowxGzh()
+
+
+def test_crew_llm_per_agent(crew):
+    llm = crew._llm("auditor")
+
+    assert (llm.model, llm.api_key, llm.temperature) == ("openai/qwen-plus", "qwen-key", 0.2)
+    assert llm.base_url == "https://dashscope.aliyuncs.com/compatible-mode/v1"
+    assert crew.auditor().llm.model == "openai/qwen-plus"
+
+
+def test_crew_llm_falls_back_to_global_model(crew):
+    # 没有单独配置的 agent 不创建模型，由 CrewAI 按环境变量 MODEL 使用全局模型
+    assert crew._llm("writer") is None
+    assert crew.writer().llm.model == "openai/global-model"
+
+
+def test_crew_llm_without_loaded_config(crew, monkeypatch):
+    monkeypatch.setattr(Config, "_instance", Config())
+
+    assert crew._llm("auditor") is None
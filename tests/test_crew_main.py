@@ -0,0 +1,222 @@
+import threading
+import time
+
+import pytest
+
+from src.ai_auto_wxgzh import crew_main
+from src.ai_auto_wxgzh.tools import custom_tool
+from src.ai_auto_wxgzh.utils import topic_index
+from src.ai_auto_wxgzh.utils.workspace import RunWorkspace
+from conftest import update_config
+
+CREDENTIALS = [
+    {"appid": f"appid{i}", "appsecret": "secret", "author": f"作者{i}"} for i in range(3)
+]
+
+
+@pytest.fixture
+def accounts(config, monkeypatch):
+    update_config(config, wechat=dict(config.get_config()["wechat"], credentials=CREDENTIALS))
+    monkeypatch.setattr(crew_main, "setup_llm_env", lambda config: None)
+    return config
+
+
+def test_autowx_gzh_runs_credentials_concurrently(accounts, monkeypatch):
+    update_config(accounts, max_workers=3)
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def fake_run(credential, stop_event=None, ui_mode=False, resume_run_id=None):
+        with lock:
+            running.append(credential["appid"])
+            peak.append(len(running))
+        time.sleep(0.2)
+        with lock:
+            running.remove(credential["appid"])
+        success = credential["appid"] != "appid1"
+        return {"author": credential["author"], "success": success, "result": "发布失败"}
+
+    monkeypatch.setattr(crew_main, "run_credential", fake_run)
+    results = crew_main.autowx_gzh(ui_mode=True)
+
+    assert max(peak) == 3
+    # 结果顺序与配置一致，单个公众号失败不影响其他公众号
+    assert [ret["author"] for ret in results] == ["作者0", "作者1", "作者2"]
+    assert [ret["success"] for ret in results] == [True, False, True]
+
+
+def test_autowx_gzh_runs_serially_with_one_worker(accounts, monkeypatch):
+    update_config(accounts, max_workers=1)
+    threads = set()
+
+    def fake_run(credential, stop_event=None, ui_mode=False, resume_run_id=None):
+        threads.add(threading.get_ident())
+        return {"author": credential["author"], "success": True, "result": ""}
+
+    monkeypatch.setattr(crew_main, "run_credential", fake_run)
+    results = crew_main.autowx_gzh(ui_mode=True)
+
+    assert len(results) == 3
+    assert threads == {threading.get_ident()}
+
+
+def test_autowx_gzh_skips_credentials_without_appid(accounts, monkeypatch):
+    credentials = CREDENTIALS[:2] + [{"appid": "", "appsecret": "", "author": "未配置"}]
+    update_config(accounts, wechat=dict(accounts.get_config()["wechat"], credentials=credentials))
+    called = []
+    monkeypatch.setattr(
+        crew_main,
+        "run_credential",
+        lambda credential, *args: called.append(credential["author"])
+        or {"author": credential["author"], "success": True, "result": ""},
+    )
+
+    crew_main.autowx_gzh(ui_mode=True)
+
+    assert called == ["作者0", "作者1"]
+
+
+SENT, PUBLISHED, FAILED = "sent", "published", "failed"
+
+
+def publish_checkpoints(workspace, state):
+    """按发布结果写入检查点：PUBLISHED 只发布了草稿，SENT 还完成了群发"""
+    if state in (PUBLISHED, SENT):
+        workspace.write_checkpoint(custom_tool.PUBLISHED_STEP, "publish_id")
+    if state == SENT:
+        workspace.write_checkpoint(custom_tool.PUBLISH_DONE_STEP, {"msg_id": 1})
+
+
+@pytest.fixture
+def pipeline(config, project_dir, monkeypatch):
+    """
+    替换 CrewAI 执行和发布：crew 记录调用参数；publish 记录调用参数，
+    按 publish["state"] 写入发布检查点
+    """
+    monkeypatch.setattr(topic_index, "_index", None)
+    crew, publish = [], {"calls": [], "state": SENT}
+
+    def fake_select(platforms):
+        topic_index.get_index().claim("话题A", platform="微博")
+        return "微博", "话题A"
+
+    def fake_run(inputs, use_template, need_auditor, workspace, publish_mode, credential, cb):
+        crew.append({"inputs": inputs, "publish_mode": publish_mode, "on_publish": cb})
+        if publish_mode == "agent":
+            publish_checkpoints(workspace, publish["state"])
+        return "成功发布文章到微信公众号" if publish_mode == "agent" else "排版完成"
+
+    def fake_publish(credential, workspace, ui_mode=False, on_publish=None):
+        publish["calls"].append(on_publish)
+        publish_checkpoints(workspace, publish["state"])
+        return {
+            SENT: "成功发布文章到微信公众号",
+            PUBLISHED: "无法将文章群发给用户，无法显示到公众号文章列表",
+            FAILED: "发布草稿失败，无法继续发布文章",
+        }[publish["state"]]
+
+    monkeypatch.setattr(crew_main, "select_topic", fake_select)
+    monkeypatch.setattr(crew_main, "run", fake_run)
+    monkeypatch.setattr(crew_main, "publish_article", fake_publish)
+    return crew, publish
+
+
+def test_run_credential_direct_mode_publishes_after_crew(pipeline, config):
+    crew, publish = pipeline
+    on_publish = object()
+
+    ret = crew_main.run_credential(CREDENTIALS[0], on_publish=on_publish)
+
+    assert (ret["success"], ret["mass_sent"]) == (True, True)
+    assert ret["result"] == "成功发布文章到微信公众号"
+    assert crew[0]["inputs"] == {"platform": "微博", "topic": "话题A"}
+    assert crew[0]["on_publish"] is on_publish
+    assert publish["calls"] == [on_publish]
+    assert RunWorkspace(ret["run_id"]).read_meta()["status"] == "done"
+    assert topic_index.get_index().is_used("话题A")
+
+
+def test_run_credential_fails_without_publish_checkpoint(pipeline, config):
+    crew, publish = pipeline
+    publish["state"] = FAILED
+
+    ret = crew_main.run_credential(CREDENTIALS[0])
+
+    assert (ret["success"], ret["mass_sent"]) == (False, False)
+    assert "发布草稿失败" in ret["result"]
+    assert RunWorkspace(ret["run_id"]).read_meta()["status"] == "failed"
+    # 发布失败，话题释放后可以再次使用
+    assert not topic_index.get_index().is_used("话题A")
+
+
+def test_run_credential_reports_published_but_not_mass_sent(pipeline, config):
+    crew, publish = pipeline
+    publish["state"] = PUBLISHED
+
+    ret = crew_main.run_credential(CREDENTIALS[0])
+
+    # 文章已发布，不算失败（任务不再重试），单独报告未群发
+    assert (ret["success"], ret["mass_sent"]) == (True, False)
+    assert "无法将文章群发" in ret["result"]
+    assert RunWorkspace(ret["run_id"]).read_meta()["status"] == "published"
+    assert topic_index.get_index().is_used("话题A")
+
+
+@pytest.mark.parametrize(
+    "state, success, mass_sent",
+    [(SENT, True, True), (PUBLISHED, True, False), (FAILED, False, False)],
+)
+def test_run_credential_agent_mode_reads_checkpoint(pipeline, config, state, success, mass_sent):
+    crew, publish = pipeline
+    publish["state"] = state
+    update_config(config, publish_mode="agent")
+    on_publish = object()
+
+    ret = crew_main.run_credential(CREDENTIALS[0], on_publish=on_publish)
+
+    # 发布专家的回复文字不作为依据，以发布检查点为准
+    assert (ret["success"], ret["mass_sent"]) == (success, mass_sent)
+    assert crew[0]["on_publish"] is on_publish
+    assert publish["calls"] == []
+
+
+def test_report_results_counts_not_mass_sent(capsys):
+    crew_main.report_results(
+        [
+            {"author": "作者0", "success": True, "mass_sent": True, "result": "成功"},
+            {"author": "作者1", "success": True, "mass_sent": False, "result": "无法群发"},
+            {"author": "作者2", "success": False, "mass_sent": False, "result": "发布失败"},
+        ]
+    )
+
+    output = capsys.readouterr().out
+    assert "成功 2 个，失败 1 个，其中已发布未群发 1 个：作者1(无法群发)" in output
+    assert "失败：作者2(发布失败)" in output
+
+
+def test_run_credential_reports_crew_errors(pipeline, config, monkeypatch):
+    def fail(*args):
+        raise RuntimeError("模型调用失败")
+
+    monkeypatch.setattr(crew_main, "run", fail)
+
+    ret = crew_main.run_credential(CREDENTIALS[0])
+
+    assert ret == dict(ret, success=False, result="模型调用失败")
+    assert pipeline[1]["calls"] == []
+
+
+def test_run_credential_keeps_topic_on_error_after_publishing(pipeline, config, monkeypatch):
+    def publish_then_fail(credential, workspace, ui_mode=False, on_publish=None):
+        publish_checkpoints(workspace, PUBLISHED)
+        raise RuntimeError("群发接口超时")
+
+    monkeypatch.setattr(crew_main, "publish_article", publish_then_fail)
+
+    ret = crew_main.run_credential(CREDENTIALS[0])
+
+    # 执行出错，但文章已经发布：不算失败，话题不能释放给其他运行
+    assert ret == dict(ret, success=True, mass_sent=False, result="群发接口超时")
+    assert RunWorkspace(ret["run_id"]).read_meta()["status"] == "published"
+    assert topic_index.get_index().is_used("话题A")
@@ -0,0 +1,32 @@
+import time
+
+from src.ai_auto_wxgzh.tools import custom_tool
+
+
+def test_upload_article_images_in_parallel(wechat, publisher, tmp_path):
+    urls = [f"{wechat['base_url']}/img/{name}.png" for name in "abcd"]
+
+    start = time.time()
+    url_map = custom_tool.upload_article_images(publisher, urls, str(tmp_path))
+
+    assert url_map == {url: f"http://mmbiz.qpic.cn/{name}.png" for url, name in zip(urls, "abcd")}
+    assert sorted(wechat["uploaded"]) == list("abcd")
+    assert wechat["downloads"].peak > 1
+    # 串行需要 4 * (0.2 + 0.1) 秒
+    assert time.time() - start < 1
+
+
+def test_failed_images_keep_original_url(wechat, publisher, tmp_path):
+    base_url = wechat["base_url"]
+    urls = [f"{base_url}/img/a.png", f"{base_url}/img/missing.png", f"{base_url}/img/bad.png"]
+
+    url_map = custom_tool.upload_article_images(publisher, urls, str(tmp_path))
+
+    # 下载失败（404）和上传失败的图片不在映射中，不影响其他图片
+    assert url_map == {urls[0]: "http://mmbiz.qpic.cn/a.png"}
+    assert wechat["uploaded"] == ["a"]
+
+
+def test_no_images_makes_no_requests(wechat, publisher, tmp_path):
+    assert custom_tool.upload_article_images(publisher, [], str(tmp_path)) == {}
+    assert wechat["downloads"].peak == wechat["uploads"].peak == 0
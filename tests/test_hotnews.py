@@ -0,0 +1,253 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src.ai_auto_wxgzh.tools import hotnews
+from src.ai_auto_wxgzh.tools import hotnews_sources
+from src.ai_auto_wxgzh.tools.hotnews_sources import AggregatorSource, HotNewsSource
+
+
+class StubSource(HotNewsSource):
+    """返回固定数据的数据源，记录调用次数，可模拟慢请求和失败"""
+
+    def __init__(self, data, name="stub", platforms=None, delay=0.0, timeout=5):
+        super().__init__(timeout)
+        self.name = name
+        self.platforms = platforms
+        self.data = data
+        self.delay = delay
+        self.error = None
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        if self.error:
+            raise self.error
+        return self.data
+
+
+def wait_until(predicate, timeout=3.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+def age_cache(cache, seconds):
+    cache._fetched_at = time.time() - seconds
+
+
+def test_fresh_index_is_served_from_memory():
+    source = StubSource({"微博": ["话题A"]})
+    cache = hotnews.HotNewsCache([source], ttl=60, stale_ttl=60)
+
+    assert cache.get_index() == {"微博": ["话题A"]}
+    source.data = {"微博": ["话题B"]}
+    assert cache.get_index() == {"微博": ["话题A"]}
+    assert cache.get_titles("微博") == ["话题A"]
+    assert source.calls == 1
+
+
+def test_stale_index_is_returned_while_refreshing_in_background():
+    source = StubSource({"微博": ["话题A"]})
+    cache = hotnews.HotNewsCache([source], ttl=10, stale_ttl=100)
+    cache.get_index()
+
+    age_cache(cache, 20)
+    source.data = {"微博": ["话题B"]}
+    source.delay = 0.3
+    start = time.time()
+    assert cache.get_index() == {"微博": ["话题A"]}
+    assert time.time() - start < 0.2
+    # 刷新进行中时不会再发起新的刷新
+    assert cache.get_index() == {"微博": ["话题A"]}
+
+    assert wait_until(lambda: cache.get_index() == {"微博": ["话题B"]})
+    assert source.calls == 2
+
+
+def test_expired_index_is_refreshed_synchronously():
+    source = StubSource({"微博": ["话题A"]})
+    cache = hotnews.HotNewsCache([source], ttl=10, stale_ttl=10)
+    cache.get_index()
+
+    age_cache(cache, 30)
+    source.data = {"微博": ["话题B"]}
+    assert cache.get_index() == {"微博": ["话题B"]}
+    assert source.calls == 2
+
+
+def test_failed_refresh_falls_back_to_old_index():
+    source = StubSource({"微博": ["话题A"]})
+    cache = hotnews.HotNewsCache([source], ttl=10, stale_ttl=10)
+    cache.get_index()
+
+    age_cache(cache, 30)
+    source.error = ConnectionError("timeout")
+    assert cache.get_index() == {"微博": ["话题A"]}
+
+
+def test_concurrent_misses_fetch_once():
+    source = StubSource({"微博": ["话题A"]}, delay=0.2)
+    cache = hotnews.HotNewsCache([source], ttl=60)
+    results = []
+
+    threads = [threading.Thread(target=lambda: results.append(cache.get_index())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == [{"微博": ["话题A"]}] * 8
+    assert source.calls == 1
+
+
+def test_disk_cache_survives_restart(tmp_path):
+    cache_file = str(tmp_path / "hotnews.json")
+    source = StubSource({"微博": ["话题A"]})
+    hotnews.HotNewsCache([source], ttl=60, cache_file=cache_file).get_index()
+
+    restarted = StubSource({"微博": ["话题B"]})
+    cache = hotnews.HotNewsCache([restarted], ttl=60, cache_file=cache_file)
+    assert cache.get_index() == {"微博": ["话题A"]}
+    assert restarted.calls == 0
+
+
+@pytest.fixture
+def aggregator(http_server):
+    """模拟聚合接口，记录请求次数"""
+    hits = []
+    payload = {
+        "success": True,
+        "data": [
+            {"name": "微博", "data": [{"title": " 话题A "}, {"title": "话题A"}]},
+            {"name": "知乎热榜", "data": [{"title": "问题B"}]},
+        ],
+    }
+
+    def hotlist(handler):
+        hits.append(handler.path)
+        time.sleep(0.1)
+        return 200, json.dumps(payload, ensure_ascii=False).encode(), "application/json"
+
+    base_url = http_server({"/api/hotlist/all": hotlist})
+    return AggregatorSource(api_url=f"{base_url}/api/hotlist/all"), hits
+
+
+def test_accounts_share_one_request_to_aggregator(aggregator):
+    source, hits = aggregator
+    cache = hotnews.HotNewsCache([source], ttl=60)
+    results = []
+
+    def publish_account(platform):
+        results.append((platform, cache.get_titles(platform)))
+
+    threads = [
+        threading.Thread(target=publish_account, args=(platform,))
+        for platform in ["微博", "知乎热榜"] * 4
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(results) == 8
+    assert {(platform, tuple(titles)) for platform, titles in results} == {
+        ("微博", ("话题A",)),
+        ("知乎热榜", ("问题B",)),
+    }
+    assert len(hits) == 1
+
+
+def test_get_cache_is_shared_and_uses_config(config, project_dir, monkeypatch):
+    monkeypatch.setattr(hotnews, "_cache", None)
+
+    cache = hotnews.get_cache()
+    assert hotnews.get_cache() is cache
+    assert cache.ttl == config.hotnews_cache_ttl
+    assert cache.cache_file.startswith(str(project_dir))
+
+
+def test_fetch_hotnews_merges_sources_in_priority_order():
+    first = StubSource({"微博": ["话题A"], "虎扑": []}, name="first")
+    second = StubSource({"微博": ["话题B"], "虎扑": ["话题C"]}, name="second")
+
+    index = hotnews_sources.fetch_hotnews([first, second], wanted={"微博", "虎扑"})
+
+    assert index == {"微博": ["话题A"], "虎扑": ["话题C"]}
+
+
+def test_fetch_hotnews_tolerates_failing_source():
+    broken = StubSource({}, name="broken")
+    broken.error = ValueError("bad json")
+    working = StubSource({"微博": ["话题A"]}, name="working")
+
+    assert hotnews_sources.fetch_hotnews([broken, working]) == {"微博": ["话题A"]}
+
+
+def test_fetch_hotnews_does_not_wait_for_slow_source_once_usable():
+    slow = StubSource({"微博": ["旧话题"]}, name="slow", delay=2)
+    fast = StubSource({"微博": ["话题A"]}, name="fast", platforms=frozenset({"微博"}))
+
+    start = time.time()
+    index = hotnews_sources.fetch_hotnews([slow, fast], budget=5, wanted={"微博"})
+
+    assert index == {"微博": ["话题A"]}
+    assert time.time() - start < 1
+
+
+def test_fetch_hotnews_respects_budget():
+    slow = StubSource({"微博": ["话题A"]}, name="slow", delay=2)
+
+    start = time.time()
+    assert hotnews_sources.fetch_hotnews([slow], budget=0.3) == {}
+    assert time.time() - start < 1
+
+
+def test_get_titles_only_asks_sources_serving_the_platform():
+    weibo = StubSource({"微博": ["话题A"]}, name="weibo", platforms=frozenset({"微博"}))
+    cache = hotnews.HotNewsCache([weibo], ttl=60, wanted={"微博"})
+    cache.get_index()
+
+    aggregator = StubSource({"微博": ["话题B"], "虎扑": ["话题C"]}, name="vvhan")
+    cache.sources.append(aggregator)
+
+    assert cache.get_titles("虎扑") == ["话题C"]
+    assert weibo.calls == 1
+    # 补充获取的数据合并到快照中，聚合接口同时返回的其他平台一并更新
+    assert cache.get_index() == {"微博": ["话题B"], "虎扑": ["话题C"]}
+    assert cache.get_titles("虎扑") == ["话题C"]
+    assert aggregator.calls == 1
+
+
+def test_missing_platform_is_not_fetched_again_within_stale_ttl():
+    aggregator = StubSource({"微博": ["话题A"]}, name="vvhan")
+    cache = hotnews.HotNewsCache([aggregator], ttl=60, stale_ttl=60)
+
+    assert cache.get_titles("虎扑") == []
+    calls = aggregator.calls
+    assert cache.get_titles("虎扑") == []
+    assert aggregator.calls == calls
+
+    # 主动失效后重新获取
+    cache.invalidate()
+    aggregator.data = {"微博": ["话题A"], "虎扑": ["话题C"]}
+    assert cache.get_titles("虎扑") == ["话题C"]
+
+
+def test_get_cache_waits_only_for_dedicated_platforms(config, project_dir, monkeypatch):
+    monkeypatch.setattr(hotnews, "_cache", None)
+
+    cache = hotnews.get_cache()
+
+    platforms = {platform["name"] for platform in config.platforms}
+    expected = platforms & hotnews_sources.dedicated_platforms(cache.sources)
+    assert cache.wanted == (expected or None)
+    assert "虎扑" not in (cache.wanted or ())
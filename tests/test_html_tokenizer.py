@@ -0,0 +1,201 @@
+import pytest
+
+from src.ai_auto_wxgzh.utils import html_tokenizer
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.utils.html_tokenizer import (
+    extract_image_refs,
+    minify_html,
+    rewrite_image_urls,
+)
+
+
+@pytest.mark.parametrize(
+    "html, expected",
+    [
+        # 注释去掉，块级标签之间的空白去掉
+        ("<!-- 注释 -->\n<div>\n  <p>正文</p>\n</div>", "<div><p>正文</p></div>"),
+        # 行内元素之间有意义的空格保留，连续空白合并
+        ("<p>a   <b>b</b> <i>c</i> !</p>", "<p>a <b>b</b> <i>c</i> !</p>"),
+        ("<p> 前后空白 </p>", "<p>前后空白</p>"),
+        # 属性规范化，实体保持转义
+        ("<p  class=a title='a &amp; b'>x</p>", '<p class="a" title="a &amp; b">x</p>'),
+        ("<img src=x alt><br/>", '<img src="x" alt><br/>'),
+        ("<html> <body> <p>x</p> </body></html>", "<html><body><p>x</p></body></html>"),
+    ],
+)
+def test_minify_html_whitespace_and_attributes(html, expected):
+    assert minify_html(html) == expected
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        "<pre>  a\n    <b>b</b>   c  </pre>",
+        "<pre>外层<pre>内层</pre>  内层之后\n</pre>",
+        "<textarea>  x \n y  </textarea>",
+        "<script>if (a  <  b) { x = '  ' }</script>",
+    ],
+)
+def test_minify_html_keeps_preformatted_content(html):
+    assert minify_html(html) == html
+
+
+def test_minify_html_resumes_after_pre():
+    html = "<section><pre>  a  </pre>  <p>  b   c </p></section>"
+    assert minify_html(html) == "<section><pre>  a  </pre><p>b c</p></section>"
+
+
+def test_minify_html_minifies_css():
+    html = (
+        '<style>\n  .x { color : red ; }\n  /* 注释 */\n  p::before { content: "a  b" }\n'
+        '</style><span style="color: red;  margin : 0 ">t</span>'
+    )
+    assert minify_html(html) == (
+        '<style>.x{color:red;}p::before{content:"a  b"}</style>'
+        '<span style="color:red;margin:0">t</span>'
+    )
+
+
+def test_minify_html_is_idempotent():
+    html = "<div>\n <p>a <b>b</b></p>\n<pre> c </pre>\n<style> p { margin : 0 } </style></div>"
+    once = minify_html(html)
+    assert minify_html(once) == once
+
+
+def test_tokenize_covers_whole_document():
+    html = "<!DOCTYPE html><p class=a>x<!-- c --><br/></p><style>p{}</style>尾"
+    tokens = list(html_tokenizer.tokenize(html))
+
+    assert "".join(html[token.start : token.end] for token in tokens) == html
+    assert [token.kind for token in tokens] == [
+        html_tokenizer.DECL,
+        html_tokenizer.START,
+        html_tokenizer.TEXT,
+        html_tokenizer.COMMENT,
+        html_tokenizer.START,
+        html_tokenizer.END,
+        html_tokenizer.START,
+        html_tokenizer.RAW,
+        html_tokenizer.END,
+        html_tokenizer.TEXT,
+    ]
+
+
+def urls(html):
+    return [ref.url for ref in extract_image_refs(html)]
+
+
+def test_extract_image_refs_from_image_attributes():
+    html = (
+        '<img src=" a.png "><img data-src="b.png"><source srcset="s1.png 1x, s2.png 2x">'
+        '<img src="c.png?w=1&amp;h=2"><img src="data:image/png;base64,xx"><img src="">'
+        '<a href="d.png">d.png</a>'
+    )
+    assert urls(html) == ["a.png", "b.png", "s1.png", "s2.png", "c.png?w=1&h=2"]
+
+
+@pytest.mark.parametrize(
+    "srcset, expected",
+    [
+        (
+            "https://x/a.png?x=1,2 480w,  https://x/b.png 800w",
+            ["https://x/a.png?x=1,2", "https://x/b.png"],
+        ),
+        ("a.png 1x,b.png 2x", ["a.png", "b.png"]),
+        ("a.png, b.png 2x,", ["a.png", "b.png"]),
+        ("a.png 100w, ,, b.png", ["a.png", "b.png"]),
+        ("data:image/png;base64,AAAA 1x, c.png 2x", ["c.png"]),
+    ],
+)
+def test_extract_image_refs_from_srcset(srcset, expected):
+    html = f'<img srcset="{srcset}">'
+    refs = extract_image_refs(html)
+    assert [ref.url for ref in refs] == expected
+    assert all(html[ref.start : ref.end] == ref.url for ref in refs)
+
+
+@pytest.mark.parametrize(
+    "style",
+    [
+        "background:url(bg.png)",
+        'background:url( "bg.png" )',
+        "background:URL('bg.png')",
+        "background-image: url(&quot;bg.png&quot;)",
+        "background-image: url(&#39;bg.png&#39;)",
+    ],
+)
+def test_extract_image_refs_from_style_attribute(style):
+    quote = "'" if '"' in style else '"'
+    assert urls(f"<section style={quote}{style}{quote}></section>") == ["bg.png"]
+
+
+def test_extract_image_refs_from_style_tag_in_document_order():
+    html = (
+        "<style>.a{background:url('a.png')}.b{background:url(data:image/png;base64,xx)}</style>"
+        '<p style="background:url(b.png?x=1&amp;y=2)"><img src="c.png"></p>'
+    )
+    refs = extract_image_refs(html)
+    assert [ref.url for ref in refs] == ["a.png", "b.png?x=1&y=2", "c.png"]
+    assert [ref.in_attr for ref in refs] == [False, True, True]
+
+
+def test_extract_image_refs_ignores_comments_text_and_scripts():
+    html = (
+        '<!-- <img src="a.png"> --><p>&lt;img src="b.png"&gt;</p>'
+        '<script>var s = \'<img src="c.png">\';</script><textarea><img src="d.png"></textarea>'
+    )
+    assert urls(html) == []
+
+
+def test_rewrite_image_urls_does_not_touch_substrings_or_text():
+    html = (
+        '<p>原图 http://x/a.png 见下</p><img src="http://x/a.png">'
+        '<img src="http://x/a.png.webp"><img src="http://x/a.png?w=1">'
+        '<a href="http://x/a.png">http://x/a.png</a>'
+    )
+    result = rewrite_image_urls(html, {"http://x/a.png": "http://wx/1.png"})
+    assert result == html.replace('<img src="http://x/a.png">', '<img src="http://wx/1.png">')
+
+
+def test_rewrite_image_urls_replaces_every_occurrence():
+    html = (
+        '<img src="a.png"><img srcset="b.png 1x, a.png 2x">'
+        '<section style="background:url(&quot;a.png&quot;)"></section>'
+        "<style>.x{background:url('a.png')}</style>"
+    )
+    result = rewrite_image_urls(html, {"a.png": "A.png"})
+    assert result == html.replace("a.png", "A.png")
+
+
+def test_rewrite_image_urls_escapes_only_inside_attributes():
+    html = '<img src="c.png?w=1&amp;h=2"><style>.x{background:url(c.png?w=1&h=2)}</style>'
+    result = rewrite_image_urls(html, {"c.png?w=1&h=2": "http://wx/c?a=1&b=2"})
+    assert result == (
+        '<img src="http://wx/c?a=1&amp;b=2"><style>.x{background:url(http://wx/c?a=1&b=2)}</style>'
+    )
+    assert urls(result) == ["http://wx/c?a=1&b=2", "http://wx/c?a=1&b=2"]
+
+
+def test_rewrite_image_urls_with_precomputed_refs():
+    html = '<img src="a.png"><img src="b.png">'
+    refs = extract_image_refs(html)
+
+    assert (
+        rewrite_image_urls(html, {"b.png": "B.png"}, refs) == '<img src="a.png"><img src="B.png">'
+    )
+    assert rewrite_image_urls(html, {"x.png": "X.png"}, refs) is html
+    assert rewrite_image_urls(html, {}) is html
+
+
+@pytest.mark.parametrize(
+    "html",
+    [
+        "<p>a\xa0\xa0b</p>",
+        "<p>　　中文段落，首行缩进两个全角空格。</p>",
+        "<section><p>\xa0</p><p>正文　　</p></section>",
+    ],
+)
+def test_compress_html_keeps_nbsp_and_fullwidth_spaces(html):
+    # 只合并HTML空白字符，&nbsp; 和全角空格是正文内容
+    assert utils.compress_html(html) == html
+    assert minify_html(f"<div>\n  {html}\n</div>") == f"<div>{html}</div>"
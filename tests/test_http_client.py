@@ -0,0 +1,181 @@
+import threading
+
+import pytest
+import requests
+from urllib3.util.retry import Retry
+
+from src.ai_auto_wxgzh.utils import http_client
+
+
+class Endpoint:
+    """按次数返回预设的状态码（用完后返回最后一个），记录请求次数和请求体"""
+
+    def __init__(self, *statuses):
+        self.statuses = list(statuses)
+        self.hits = 0
+        self.requests = []
+        self._lock = threading.Lock()
+
+    def __call__(self, handler):
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        with self._lock:
+            self.requests.append((dict(handler.headers), body))
+            status = self.statuses[min(self.hits, len(self.statuses) - 1)]
+            self.hits += 1
+        return status, b"ok", "text/plain"
+
+
+@pytest.fixture(autouse=True)
+def session(monkeypatch):
+    """每个测试使用新的Session和统计，重试不真正等待，记录退避时间"""
+    sleeps = []
+    monkeypatch.setattr(http_client, "_session", None)
+    monkeypatch.setattr(http_client, "_metrics", {})
+    monkeypatch.setattr(
+        Retry, "sleep", lambda self, response=None: sleeps.append(self.get_backoff_time())
+    )
+    return sleeps
+
+
+def test_get_retries_server_errors_with_backoff(http_server, session):
+    endpoint = Endpoint(503, 502, 200)
+    base_url = http_server({"/api": endpoint})
+
+    response = http_client.get(f"{base_url}/api")
+
+    assert response.status_code == 200
+    assert endpoint.hits == 3
+    assert session == [0, 1.0]
+
+
+def test_get_returns_last_response_after_retries(http_server):
+    endpoint = Endpoint(503)
+    base_url = http_server({"/api": endpoint})
+
+    response = http_client.get(f"{base_url}/api")
+
+    # status=3：最多重试3次，之后返回最后的响应而不是抛出异常
+    assert response.status_code == 503
+    assert endpoint.hits == 4
+
+
+@pytest.mark.parametrize("method", ["HEAD", "OPTIONS"])
+def test_other_idempotent_methods_are_retried(http_server, method):
+    endpoint = Endpoint(503, 200)
+    base_url = http_server({"/api": endpoint})
+
+    assert http_client.request(method, f"{base_url}/api").status_code == 200
+    assert endpoint.hits == 2
+
+
+def test_post_is_not_retried(http_server, session):
+    endpoint = Endpoint(503, 200)
+    base_url = http_server({"/api": endpoint})
+
+    response = http_client.post(f"{base_url}/api", data=b"body")
+
+    # POST 不是幂等的（如群发），服务端出错时不能重复提交
+    assert response.status_code == 503
+    assert endpoint.hits == 1
+    assert session == []
+
+
+def test_metrics_per_endpoint_without_query(http_server):
+    ok, failed = Endpoint(200), Endpoint(404)
+    base_url = http_server({"/ok": ok, "/failed": failed})
+    host = base_url[len("http://") :]
+
+    http_client.get(f"{base_url}/ok", params={"access_token": "secret"})
+    http_client.get(f"{base_url}/ok?access_token=secret")
+    http_client.post(f"{base_url}/failed")
+
+    metrics = http_client.get_metrics()
+    assert set(metrics) == {f"{host}/ok", f"{host}/failed"}
+    assert (metrics[f"{host}/ok"]["count"], metrics[f"{host}/ok"]["errors"]) == (2, 0)
+    assert (metrics[f"{host}/failed"]["count"], metrics[f"{host}/failed"]["errors"]) == (1, 1)
+    metric = metrics[f"{host}/ok"]
+    assert metric["avg_time"] == pytest.approx(metric["total_time"] / 2)
+    assert 0 < metric["max_time"] <= metric["total_time"]
+
+    assert http_client.get_metrics(reset=True) == metrics
+    assert http_client.get_metrics() == {}
+
+
+def test_metrics_count_connection_errors(session):
+    # 端口1没有服务，连接失败时所有方法都会重试，最后抛出异常
+    with pytest.raises(requests.exceptions.ConnectionError):
+        http_client.post("http://127.0.0.1:1/api", timeout=1)
+
+    metric = http_client.get_metrics()["127.0.0.1:1/api"]
+    assert (metric["count"], metric["errors"]) == (1, 1)
+    assert len(session) == 3
+
+
+@pytest.fixture
+def image(tmp_path):
+    path = tmp_path / "image.png"
+    path.write_bytes(bytes(range(256)) * 1000)
+    return path
+
+
+def test_multipart_stream_body(image):
+    stream = http_client.MultipartFileStream("media", str(image), "封面.png", "image/png")
+
+    boundary = stream.content_type.split("boundary=")[1]
+    assert stream.content_type == f"multipart/form-data; boundary={boundary}"
+    body = stream.read()
+    assert len(body) == len(stream)
+    assert body == (
+        f"--{boundary}\r\n"
+        'Content-Disposition: form-data; name="media"; filename="封面.png"\r\n'
+        "Content-Type: image/png\r\n\r\n".encode("utf-8")
+        + image.read_bytes()
+        + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    )
+    assert stream.read() == b""
+
+    # 重试时从头读取
+    stream.seek(0)
+    assert stream.read() == body
+    with pytest.raises(ValueError):
+        stream.seek(10)
+
+
+def test_multipart_stream_reads_in_chunks(image):
+    stream = http_client.MultipartFileStream("media", str(image), "a.png", "image/png", 4096)
+    body = stream.read()
+    stream.seek(0)
+
+    chunks = list(stream)
+    assert b"".join(chunks) == body
+    assert max(len(chunk) for chunk in chunks) == 4096
+    assert len(chunks) == -(-len(body) // 4096)
+    assert stream._file is None  # 读取结束后关闭文件
+
+    stream.seek(0)
+    pieces = []
+    while True:
+        piece = stream.read(1000)
+        if not piece:
+            break
+        pieces.append(piece)
+    assert b"".join(pieces) == body
+
+
+def test_multipart_stream_is_sent_with_content_length(http_server, image):
+    endpoint = Endpoint(200)
+    base_url = http_server({"/upload": endpoint})
+    stream = http_client.MultipartFileStream("media", str(image), "a.png", "image/png")
+
+    http_client.post(
+        f"{base_url}/upload", data=stream, headers={"Content-Type": stream.content_type}
+    )
+
+    headers, body = endpoint.requests[0]
+    # 长度已知，不使用chunked编码（微信接口不支持）
+    assert headers["Content-Length"] == str(len(stream))
+    assert "Transfer-Encoding" not in headers
+    assert headers["Content-Type"] == stream.content_type
+    stream.seek(0)
+    assert body == stream.read()
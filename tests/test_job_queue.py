@@ -0,0 +1,192 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.ai_auto_wxgzh.jobs import job_queue
+from src.ai_auto_wxgzh.jobs.job_queue import DONE, FAILED, PUBLISHING, QUEUED, RUNNING, JobQueue
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(job_queue, "time", SimpleNamespace(time=clock))
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+def test_enqueue_is_idempotent_by_publish_key(queue):
+    job_id = queue.enqueue("appid0", "作者0", publish_key="appid0:2025-01-01 08:00")
+    assert queue.enqueue("appid0", "作者0", publish_key="appid0:2025-01-01 08:00") == job_id
+    assert queue.enqueue("appid0", "作者0") != job_id
+    assert queue.counts()[QUEUED] == 2
+
+
+def test_lease_takes_due_jobs_in_order(queue, clock):
+    later = queue.enqueue("appid0", not_before=clock.now + 60)
+    first = queue.enqueue("appid1")
+
+    job = queue.lease("worker1", 30)
+    assert (job.id, job.state, job.attempts, job.lease_owner) == (first, RUNNING, 1, "worker1")
+    assert job.lease_expires == clock.now + 30
+    assert queue.lease("worker2", 30) is None
+
+    queue.complete(first, "worker1")
+    clock.advance(60)
+    assert queue.lease("worker2", 30).id == later
+
+
+def test_concurrent_workers_never_share_a_job(queue):
+    job_ids = {queue.enqueue(f"appid{i}") for i in range(5)}
+    leased = []
+
+    def work(owner):
+        while True:
+            job = queue.lease(owner, 30)
+            if job is None:
+                return
+            leased.append(job.id)
+
+    threads = [threading.Thread(target=work, args=(f"worker{i}",)) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(leased) == sorted(job_ids)
+
+
+@pytest.mark.parametrize("publishing", [False, True])
+def test_expired_lease_is_taken_over(queue, clock, publishing):
+    job_id = queue.enqueue("appid0")
+    job = queue.lease("worker1", 30)
+    if publishing:
+        assert queue.mark_publishing(job_id, "worker1")
+
+    clock.advance(20)
+    assert queue.heartbeat(job_id, "worker1", 30)  # 续租后未过期
+    clock.advance(25)
+    assert queue.lease("worker2", 30) is None
+    clock.advance(6)
+
+    taken = queue.lease("worker2", 30)
+    assert (taken.id, taken.lease_owner, taken.attempts) == (job_id, "worker2", 2)
+    # 重新执行沿用同一个运行目录，已完成的阶段不会重复执行
+    assert taken.run_id == job.run_id
+
+    # 旧 worker 的续租、状态更新都无效
+    assert not queue.heartbeat(job_id, "worker1", 30)
+    assert not queue.mark_publishing(job_id, "worker1")
+    assert not queue.complete(job_id, "worker1", "成功")
+    assert not queue.fail(job_id, "worker1", "失败")
+    assert queue.complete(job_id, "worker2", "成功")
+    assert (queue.get(job_id).state, queue.get(job_id).result) == (DONE, "成功")
+
+
+def test_crashed_job_fails_after_max_attempts(queue, clock):
+    job_id = queue.enqueue("appid0", max_attempts=2)
+    for owner in ("worker1", "worker2"):
+        assert queue.lease(owner, 30).id == job_id
+        clock.advance(31)
+
+    assert queue.lease("worker3", 30) is None
+    job = queue.get(job_id)
+    assert (job.state, job.attempts, job.lease_owner) == (FAILED, 2, None)
+    assert job.result == "执行中断且超过最大执行次数"
+
+
+def test_fail_requeues_with_delay_until_max_attempts(queue, clock):
+    job_id = queue.enqueue("appid0", max_attempts=2)
+
+    queue.lease("worker1", 30)
+    assert queue.fail(job_id, "worker1", "网络错误", retry_delay=300)
+    job = queue.get(job_id)
+    assert (job.state, job.attempts, job.not_before, job.result) == (
+        QUEUED,
+        1,
+        clock.now + 300,
+        "网络错误",
+    )
+    assert queue.lease("worker1", 30) is None
+
+    clock.advance(300)
+    assert queue.lease("worker1", 30).attempts == 2
+    assert queue.fail(job_id, "worker1", "网络错误", retry_delay=300)
+    assert queue.get(job_id).state == FAILED
+    assert queue.lease("worker1", 30) is None
+
+
+def test_fail_without_retry(queue):
+    job_id = queue.enqueue("appid0", max_attempts=3)
+    queue.lease("worker1", 30)
+
+    assert queue.fail(job_id, "worker1", "配置错误", retry=False)
+    job = queue.get(job_id)
+    assert (job.state, job.attempts) == (FAILED, 1)
+
+
+def test_retry_resets_attempts_of_failed_jobs_only(queue):
+    job_id = queue.enqueue("appid0", max_attempts=1)
+    queue.lease("worker1", 30)
+    assert not queue.retry(job_id)  # 执行中的任务不能重试
+
+    queue.fail(job_id, "worker1", "失败")
+    assert queue.get(job_id).state == FAILED
+    assert queue.retry(job_id)
+
+    job = queue.get(job_id)
+    assert (job.state, job.attempts) == (QUEUED, 0)
+    assert queue.lease("worker1", 30).attempts == 1
+
+
+def test_count_by_appid_counts_jobs_of_the_day(queue, clock):
+    finished_today = queue.enqueue("appid0")
+    queue.lease("worker1", 30)
+    queue.enqueue("appid0", not_before=clock.now + 86400 * 7)  # 昨天加入、还未执行
+    clock.advance(86400)
+    day_start = clock.now - 10
+
+    queue.complete(finished_today, "worker1", "成功")
+    failed = queue.enqueue("appid0", max_attempts=1)
+    queue.lease("worker1", 30)
+    queue.fail(failed, "worker1", "失败")
+    queue.enqueue("appid0", publish_key="appid0:schedule")
+    queue.enqueue("appid1")
+
+    # 今天完成的任务（不论何时加入）和今天加入的任务，失败的任务没有群发，不计入
+    assert queue.count_by_appid("appid0", day_start) == 2
+    assert queue.count_by_appid("appid1", day_start) == 1
+    assert queue.count_by_key_prefix("appid0:") == 4
+
+
+def test_list_jobs_and_counts(queue):
+    ids = [queue.enqueue(f"appid{i}") for i in range(3)]
+    job = queue.lease("worker1", 30)
+    queue.mark_publishing(job.id, "worker1")
+
+    assert [job.id for job in queue.list_jobs()] == ids[::-1]
+    assert [job.id for job in queue.list_jobs(PUBLISHING)] == [ids[0]]
+    assert queue.counts() == {QUEUED: 2, RUNNING: 0, PUBLISHING: 1, DONE: 0, FAILED: 0}
+
+
+def test_get_queue_uses_project_jobs_dir(project_dir, monkeypatch):
+    monkeypatch.setattr(job_queue, "_queue", None)
+
+    queue = job_queue.get_queue()
+    assert job_queue.get_queue() is queue
+    assert queue.db_path.startswith(str(project_dir))
@@ -0,0 +1,117 @@
+from datetime import date, datetime, timedelta
+
+import pytest
+
+from src.ai_auto_wxgzh.jobs.job_queue import JobQueue
+from src.ai_auto_wxgzh.jobs.scheduler import Scheduler
+from conftest import update_config
+
+CREDENTIALS = [
+    {"appid": f"appid{i}", "appsecret": "secret", "author": f"作者{i}"} for i in range(2)
+]
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return JobQueue(str(tmp_path / "jobs.db"))
+
+
+@pytest.fixture
+def schedule(config):
+    """设置公众号和定时发布配置，返回设置函数"""
+
+    def apply(windows=("08:00-09:00", "20:00-21:00"), daily_limit=1, accounts=None):
+        update_config(
+            config,
+            wechat=dict(config.get_config()["wechat"], credentials=CREDENTIALS),
+            schedule={
+                "windows": list(windows),
+                "daily_limit": daily_limit,
+                "accounts": accounts or {},
+            },
+        )
+
+    apply()
+    return apply
+
+
+def test_plan_is_stable_and_within_windows(queue):
+    day = date(2025, 1, 1)
+    plan = Scheduler(queue).plan("appid0", day, ["08:00-09:00", "20:00-21:00"])
+
+    assert plan == Scheduler(queue).plan("appid0", day, ["08:00-09:00", "20:00-21:00"])
+    assert [index for _, _, index in plan] == [0, 1]
+    (first, first_end, _), (second, second_end, _) = plan
+    assert datetime(2025, 1, 1, 8) <= first < first_end == datetime(2025, 1, 1, 9)
+    assert datetime(2025, 1, 1, 20) <= second < second_end == datetime(2025, 1, 1, 21)
+    # 不同公众号的发布时间错开
+    assert Scheduler(queue).plan("appid1", day, ["08:00-09:00"])[0][0] != first
+
+
+def run_at(appid, index=0, windows=("08:00-09:00", "20:00-21:00")):
+    """公众号今天在第 index 个时间段的发布时间（与 Scheduler.tick 使用的计划一致）"""
+    return Scheduler(None).plan(appid, date.today(), list(windows))[index][0]
+
+
+def test_tick_enqueues_once_per_window(queue, schedule):
+    scheduler = Scheduler(queue)
+    now = run_at("appid0")
+    prefix = f"schedule:appid0:{date.today().isoformat()}:"
+
+    scheduler.tick(now - timedelta(seconds=1))
+    assert queue.count_by_key_prefix(prefix) == 0
+    scheduler.tick(now)
+    assert queue.count_by_key_prefix(f"{prefix}0") == 1
+
+    # 同一时间段重复检查、重启后都不会重复加入
+    scheduler.tick(now + timedelta(minutes=1))
+    Scheduler(queue).tick(now)
+    assert queue.count_by_key_prefix(prefix) == 1
+
+
+def test_missed_windows_are_not_backfilled(queue, schedule):
+    scheduler = Scheduler(queue)
+    window_end = scheduler.plan("appid0", date.today(), ["08:00-09:00", "20:00-21:00"])[0][1]
+
+    assert scheduler.tick(window_end + timedelta(minutes=1)) == 0
+    assert queue.counts()["queued"] == 0
+
+
+def test_daily_limit_counts_jobs_enqueued_elsewhere(queue, schedule):
+    scheduler = Scheduler(queue)
+    # 界面或命令行已经为 appid0 加入了任务
+    queue.enqueue("appid0", "作者0")
+
+    for appid in ("appid0", "appid1"):
+        scheduler.tick(run_at(appid))
+
+    assert queue.count_by_key_prefix("schedule:appid0:") == 0
+    assert queue.count_by_key_prefix("schedule:appid1:") == 1
+
+    # 第二个时间段已达到每天上限
+    scheduler.tick(run_at("appid1", 1))
+    assert queue.count_by_key_prefix("schedule:appid1:") == 1
+
+
+def test_failed_jobs_do_not_count_towards_daily_limit(queue, schedule):
+    scheduler = Scheduler(queue)
+    job_id = queue.enqueue("appid0", "作者0", max_attempts=1)
+    queue.lease("worker", 30)
+    queue.fail(job_id, "worker", "失败")
+
+    scheduler.tick(run_at("appid0"))
+    assert queue.count_by_key_prefix("schedule:appid0:") == 1
+
+
+def test_account_specific_schedule(queue, schedule):
+    accounts = {"appid0": {"daily_limit": 0}, "appid1": {"windows": ["12:00-13:00"]}}
+    schedule(daily_limit=2, accounts=accounts)
+    scheduler = Scheduler(queue)
+
+    for appid in ("appid0", "appid1"):
+        scheduler.tick(run_at(appid, 0))
+        scheduler.tick(run_at(appid, 1))
+    scheduler.tick(run_at("appid1", 0, windows=["12:00-13:00"]))
+
+    assert queue.count_by_key_prefix("schedule:appid1:") == 1
+    assert queue.count_by_key_prefix("schedule:appid0:") == 0
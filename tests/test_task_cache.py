@@ -0,0 +1,159 @@
+import os
+import time
+
+import pytest
+from crewai import LLM, Agent, Task
+from crewai.tasks.task_output import TaskOutput
+
+from src.ai_auto_wxgzh.utils import task_cache
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.utils.task_cache import TaskOutputCache
+from src.ai_auto_wxgzh.utils.workspace import RunWorkspace
+from conftest import update_config
+
+KEY_ARGS = {
+    "task_name": "write_content",
+    "description": "根据话题写一篇文章",
+    "expected_output": "HTML格式的文章",
+    "agent_profile": ["作家", "写出好文章", "资深作家"],
+    "llm_params": {"model": "openai/gpt-4o-mini", "temperature": 0.7},
+    "context": "上游任务输出",
+}
+
+
+def test_make_key_is_stable():
+    assert TaskOutputCache.make_key(**KEY_ARGS) == TaskOutputCache.make_key(**dict(KEY_ARGS))
+
+
+@pytest.mark.parametrize(
+    "name, value",
+    [
+        ("task_name", "audit_content"),
+        ("description", "根据话题写一篇短文"),
+        ("expected_output", "Markdown格式的文章"),
+        ("agent_profile", ["作家", "写出好文章", "资深科技作家"]),
+        ("llm_params", {"model": "openai/gpt-4o-mini", "temperature": 0.2}),
+        ("llm_params", {"model": "openai/gpt-4o", "temperature": 0.7}),
+        ("context", "上游任务的新输出"),
+    ],
+)
+def test_make_key_changes_with_every_input(name, value):
+    assert TaskOutputCache.make_key(**dict(KEY_ARGS, **{name: value})) != (
+        TaskOutputCache.make_key(**KEY_ARGS)
+    )
+
+
+def test_llm_params():
+    llm = LLM(model="openai/gpt-4o-mini", temperature=0.3, api_key="key")
+    params = task_cache._llm_params(llm)
+    assert params["model"] == "openai/gpt-4o-mini"
+    assert params["temperature"] == 0.3
+    assert "api_key" not in params
+    assert task_cache._llm_params("openai/gpt-4o") == {"model": "openai/gpt-4o"}
+
+
+def test_get_put_and_ttl(tmp_path):
+    cache = TaskOutputCache(str(tmp_path), ttl_hours=1)
+    assert cache.get("key") is None
+
+    cache.put("key", "write_content", "文章内容")
+    assert cache.get("key") == "文章内容"
+
+    path = cache._path("key")
+    data = utils.load_json(path)
+    utils.save_json(path, dict(data, created_at=time.time() - 7200))
+    assert cache.get("key") is None
+    assert not os.path.exists(path)
+
+
+def test_evicts_least_recently_used(tmp_path):
+    cache = TaskOutputCache(str(tmp_path), max_entries=2)
+    now = time.time()
+    for i, key in enumerate(["a", "b"]):
+        cache.put(key, "task", key)
+        os.utime(cache._path(key), (now - 100 + i, now - 100 + i))
+
+    assert cache.get("a") == "a"  # a 变为最近使用
+    cache.put("c", "task", "c")
+
+    assert [cache.get(key) for key in ["a", "b", "c"]] == ["a", None, "c"]
+
+
+def test_get_cache_respects_config(config, project_dir, monkeypatch):
+    monkeypatch.setattr(task_cache, "_cache", None)
+    update_config(config, task_cache={"enabled": False})
+    assert task_cache.get_cache() is None
+
+    update_config(config, task_cache={"enabled": True, "ttl_hours": 2, "max_entries": 10})
+    cache = task_cache.get_cache()
+    assert task_cache.get_cache() is cache
+    assert (cache.ttl, cache.max_entries) == (7200, 10)
+    assert cache.cache_dir.startswith(str(project_dir))
+
+
+@pytest.fixture
+def executions(config, project_dir, monkeypatch):
+    """CrewAI 实际执行任务（调用大模型）的记录，返回 "输出<序号>" """
+    monkeypatch.setattr(task_cache, "_cache", None)
+    calls = []
+
+    def execute(self, agent, context, tools):
+        calls.append((self.name, agent.backstory, agent.llm.temperature))
+        self.output = TaskOutput(
+            name=self.name,
+            description=self.description,
+            raw=f"输出{len(calls)}",
+            agent=agent.role,
+        )
+        return self.output
+
+    monkeypatch.setattr(Task, "_execute_core", execute)
+    return calls
+
+
+def make_agent(backstory="资深作家", temperature=0.7):
+    llm = LLM(model="openai/gpt-4o-mini", temperature=temperature, api_key="key")
+    return Agent(role="作家", goal="写出好文章", backstory=backstory, llm=llm)
+
+
+def run_task(agent, context=None, workspace=None):
+    task = task_cache.CachedTask(
+        name="write_content",
+        description="根据话题写一篇文章",
+        expected_output="HTML格式的文章",
+        run_workspace=workspace,
+    )
+    return task._execute_core(agent, context, []).raw
+
+
+@pytest.mark.skipif(not task_cache._REUSE_SUPPORTED, reason="CrewAI 版本不支持复用任务输出")
+def test_cached_task_reuses_output_for_same_inputs(executions):
+    assert run_task(make_agent()) == "输出1"
+    assert run_task(make_agent()) == "输出1"
+    assert len(executions) == 1
+
+    assert run_task(make_agent(temperature=0.2)) == "输出2"
+    assert run_task(make_agent(backstory="资深科技作家")) == "输出3"
+    assert run_task(make_agent(), context="上游任务的新输出") == "输出4"
+    assert len(executions) == 4
+
+
+@pytest.mark.skipif(not task_cache._REUSE_SUPPORTED, reason="CrewAI 版本不支持复用任务输出")
+def test_cached_task_resumes_from_checkpoint(executions):
+    workspace = RunWorkspace()
+    workspace.write_checkpoint("write_content", "检查点输出")
+
+    assert run_task(make_agent(), workspace=workspace) == "检查点输出"
+    assert executions == []
+
+    other = RunWorkspace()
+    assert run_task(make_agent(), workspace=other) == "输出1"
+    assert other.read_checkpoint("write_content") == "输出1"
+
+
+def test_cached_task_always_executes_without_reuse_support(executions, monkeypatch):
+    monkeypatch.setattr(task_cache, "_REUSE_SUPPORTED", False)
+
+    run_task(make_agent())
+    run_task(make_agent())
+    assert len(executions) == 2
@@ -0,0 +1,99 @@
+import os
+
+import pytest
+
+from src.ai_auto_wxgzh.tools import template_registry
+from src.ai_auto_wxgzh.tools.template_registry import TemplateRegistry, strip_template
+
+
+def card(i):
+    return f'<div class="card"><p style="color:red">卡片{i}</p></div>'
+
+
+def test_strip_template_shortens_sample_text():
+    html = "<h2>这是一段非常长的示例标题文字用于测试</h2><p>短文字</p>"
+    assert strip_template(html) == "<h2>这是一段非常长的示例标题…</h2><p>短文字</p>"
+
+
+def test_strip_template_collapses_repeated_siblings():
+    html = "<section>" + "".join(card(i) for i in range(5)) + "<div><span>x</span></div></section>"
+    assert strip_template(html) == (
+        "<section>" + card(0) + card(1) + "<div><span>x</span></div></section>"
+    )
+
+
+def test_strip_template_keeps_structurally_different_siblings():
+    html = "<ul><li>a</li><li>b</li><li>c</li></ul><ul><li><b>a</b></li><li>b</li><li>c</li></ul>"
+    assert strip_template(html) == (
+        "<ul><li>a</li><li>b</li></ul><ul><li><b>a</b></li><li>b</li><li>c</li></ul>"
+    )
+
+
+def test_strip_template_ignores_markup_inside_comments_and_styles():
+    html = "<style>.card{color:red}</style><!-- <div> -->" + "".join(card(i) for i in range(3))
+    assert strip_template(html) == "<style>.card{color:red}</style><!-- <div> -->" + card(0) + card(
+        1
+    )
+
+
+@pytest.fixture
+def template_dir(tmp_path):
+    path = tmp_path / "templates"
+    path.mkdir()
+    (path / "small.html").write_text("<div>\n  <p>小模板</p>\n</div>", encoding="utf-8")
+    (path / "large.html").write_text(
+        "<section>" + "\n".join(card(i) for i in range(50)) + "</section>", encoding="utf-8"
+    )
+    return path
+
+
+def test_registry_compresses_once_and_persists_index(template_dir, tmp_path, monkeypatch):
+    index_file = str(tmp_path / "templates_index.json")
+    registry = TemplateRegistry(str(template_dir), index_file)
+
+    assert registry.names() == ["large.html", "small.html"]
+    assert registry.get("small.html")["compressed"] == "<div><p>小模板</p></div>"
+
+    # 重启后直接使用索引，未变化的模板不再压缩
+    built = []
+    build_entry = TemplateRegistry._build_entry
+    monkeypatch.setattr(
+        TemplateRegistry,
+        "_build_entry",
+        staticmethod(lambda path, stat: built.append(path) or build_entry(path, stat)),
+    )
+    restarted = TemplateRegistry(str(template_dir), index_file)
+    assert restarted.names() == ["large.html", "small.html"]
+    assert built == []
+
+    (template_dir / "small.html").write_text("<p>新模板</p>", encoding="utf-8")
+    os.remove(template_dir / "large.html")
+    assert restarted.names() == ["small.html"]
+    assert restarted.get("small.html")["compressed"] == "<p>新模板</p>"
+    assert built == [str(template_dir / "small.html")]
+
+
+def test_index_from_older_version_is_rebuilt(template_dir, tmp_path, monkeypatch):
+    index_file = str(tmp_path / "templates_index.json")
+    TemplateRegistry(str(template_dir), index_file).refresh()
+
+    monkeypatch.setattr(template_registry, "INDEX_VERSION", template_registry.INDEX_VERSION + 1)
+    assert TemplateRegistry(str(template_dir), index_file)._entries == {}
+
+
+def test_select_within_token_budget(template_dir):
+    registry = TemplateRegistry(str(template_dir))
+    templates = registry.templates()
+    small, large = templates["small.html"], templates["large.html"]
+    assert large["stripped_tokens"] < large["tokens"]
+
+    for _ in range(10):
+        assert registry.select("budget", small["tokens"])[0] == "small.html"
+    # 都超出预算时选择最小的
+    assert registry.select("budget", 1) == ("small.html", small["compressed"])
+    assert registry.select("budget", large["stripped_tokens"], strip=True)[0] in templates
+    assert registry.select("budget", 1, strip=True) == ("small.html", small["stripped"])
+
+
+def test_select_without_templates(tmp_path):
+    assert TemplateRegistry(str(tmp_path / "missing")).select() == (None, None)
@@ -0,0 +1,208 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.ai_auto_wxgzh.utils import topic_index
+from src.ai_auto_wxgzh.utils.topic_index import BANDS, TopicIndex
+from conftest import update_config
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, hours):
+        self.now += hours * 3600
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(topic_index, "time", SimpleNamespace(time=clock))
+    return clock
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "topic_index.jsonl")
+
+
+def count_lines(path):
+    with open(path, encoding="utf-8") as f:
+        return sum(1 for _ in f)
+
+
+def bucket_refs(index):
+    return sum(len(norms) for bucket in index._buckets for norms in bucket.values())
+
+
+def test_claim_rejects_same_topic_after_normalization(clock, path):
+    index = TopicIndex(path)
+
+    assert index.claim("多地气温创今年新高！", appid="appid0")
+    assert not index.claim("多地气温 创今年新高")
+    assert index.find_duplicate("多地气温，创今年新高") == "多地气温创今年新高！"
+
+    # 全角转半角、不区分大小写
+    assert index.claim("ＮＢＡ总决赛今日开打")
+    assert index.find_duplicate("nba总决赛今日开打") == "ＮＢＡ总决赛今日开打"
+
+
+def test_find_duplicate_matches_near_duplicates_only(clock, path):
+    index = TopicIndex(path, threshold=0.6)
+    index.claim("苹果公司发布新款iPhone手机引发热议")
+    index.claim("多地气温创今年新高")
+
+    assert index.find_duplicate("苹果公司发布新款iPhone手机引发网友热议") == (
+        "苹果公司发布新款iPhone手机引发热议"
+    )
+    assert index.is_used("多地最高气温创今年新高")
+    assert not index.is_used("国足世预赛客场两球落败")
+    assert not index.claim("苹果公司发布新款iPhone手机引发网友热议")
+    assert index.claim("国足世预赛客场两球落败")
+
+
+def test_concurrent_claims_select_topic_once(clock, path):
+    index = TopicIndex(path)
+    results = []
+
+    threads = [
+        threading.Thread(target=lambda: results.append(index.claim("多地气温创今年新高")))
+        for _ in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+
+
+def test_release_allows_topic_again_and_persists(clock, path):
+    index = TopicIndex(path)
+    index.claim("多地气温创今年新高")
+    index.claim("国足世预赛客场两球落败")
+
+    index.release("多地气温创今年新高")
+    assert not index.is_used("多地最高气温创今年新高")
+    assert bucket_refs(index) == len(index._entries) * BANDS
+
+    restarted = TopicIndex(path)
+    assert not restarted.is_used("多地气温创今年新高")
+    assert restarted.is_used("国足世预赛客场两球落败")
+    # 启动时压缩，释放的记录及删除标记不再保留
+    assert count_lines(path) == 1
+
+
+def test_topics_expire_after_window(clock, path):
+    index = TopicIndex(path, window_hours=24)
+    index.claim("多地气温创今年新高")
+
+    clock.advance(23)
+    assert index.is_used("多地气温创今年新高")
+    clock.advance(2)
+    assert not index.is_used("多地气温创今年新高")
+    assert index.claim("多地气温创今年新高")
+    assert len(index._entries) == 1
+
+    assert TopicIndex(path, window_hours=24).is_used("多地气温创今年新高")
+
+
+def test_expired_topics_are_pruned_from_buckets_and_log(clock, path, monkeypatch):
+    monkeypatch.setattr(topic_index, "COMPACT_MIN_DEAD", 0)
+    index = TopicIndex(path, window_hours=1)
+    titles = ["多地气温创今年新高", "国足世预赛客场两球落败", "苹果公司发布新款iPhone手机引发热议"]
+    for title in titles:
+        index.claim(title)
+    assert count_lines(path) == 3
+
+    clock.advance(2)
+    index.claim("某地举办马拉松比赛")
+
+    assert list(index._entries) == [topic_index.normalize_title("某地举办马拉松比赛")]
+    assert bucket_refs(index) == BANDS
+    assert count_lines(path) == 1
+
+
+def test_compaction_keeps_records_appended_by_other_process(clock, path, monkeypatch):
+    monkeypatch.setattr(topic_index, "COMPACT_MIN_DEAD", 0)
+    index = TopicIndex(path, window_hours=1)
+    other = TopicIndex(path, window_hours=1)
+    index.claim("多地气温创今年新高")
+
+    clock.advance(2)
+    other.claim("国足世预赛客场两球落败")
+    index.claim("某地举办马拉松比赛")
+
+    restarted = TopicIndex(path, window_hours=1)
+    assert restarted.is_used("国足世预赛客场两球落败")
+    assert restarted.is_used("某地举办马拉松比赛")
+    assert not restarted.is_used("多地气温创今年新高")
+
+
+def test_claims_see_records_of_other_process(clock, path):
+    # 两个实例共用一个记录文件，相当于界面、worker、定时任务等不同进程
+    index = TopicIndex(path)
+    other = TopicIndex(path)
+
+    assert index.claim("多地气温创今年新高")
+    assert not other.claim("多地最高气温创今年新高")
+    assert other.find_duplicate("多地气温创今年新高") == "多地气温创今年新高"
+
+    other.release("多地气温创今年新高")
+    assert not index.is_used("多地气温创今年新高")
+    assert index.claim("多地气温创今年新高")
+    assert other.is_used("多地气温创今年新高")
+    assert bucket_refs(other) == len(other._entries) * BANDS
+
+
+def test_claims_see_log_compacted_by_other_process(clock, path, monkeypatch):
+    monkeypatch.setattr(topic_index, "COMPACT_MIN_DEAD", 0)
+    index = TopicIndex(path, window_hours=1)
+    index.claim("多地气温创今年新高")
+    other = TopicIndex(path, window_hours=1)
+    assert other.is_used("多地气温创今年新高")
+
+    clock.advance(2)
+    index.claim("国足世预赛客场两球落败")  # 清理过期记录，压缩后记录文件被替换
+    assert count_lines(path) == 1
+
+    assert not other.claim("国足世预赛客场两球落败")
+    assert other.claim("多地气温创今年新高")
+    assert not index.claim("多地气温创今年新高")
+    assert bucket_refs(other) == len(other._entries) * BANDS == 2 * BANDS
+
+
+def test_concurrent_claims_from_separate_indexes(clock, path):
+    indexes = [TopicIndex(path) for _ in range(8)]
+    results = []
+
+    threads = [
+        threading.Thread(
+            target=lambda index=index: results.append(index.claim("多地气温创今年新高"))
+        )
+        for index in indexes
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(True) == 1
+    assert count_lines(path) == 1
+
+
+def test_get_index_respects_config(config, project_dir, monkeypatch):
+    monkeypatch.setattr(topic_index, "_index", None)
+    update_config(config, topic_dedup={"enabled": False})
+    assert topic_index.get_index() is None
+
+    update_config(config, topic_dedup={"enabled": True, "window_hours": 12, "threshold": 0.8})
+    index = topic_index.get_index()
+    assert topic_index.get_index() is index
+    assert (index.window, index.threshold) == (12 * 3600, 0.8)
+    assert index.path.startswith(str(project_dir))
@@ -0,0 +1,43 @@
+import threading
+
+from src.ai_auto_wxgzh import crew_main
+from src.ai_auto_wxgzh.jobs.job_queue import DONE, FAILED, PUBLISHING, JobQueue
+from src.ai_auto_wxgzh.jobs.worker import Worker
+from conftest import update_config
+
+
+def test_worker_drains_queue(config, tmp_path, monkeypatch):
+    credentials = [
+        {"appid": f"appid{i}", "appsecret": "secret", "author": f"作者{i}"} for i in range(2)
+    ]
+    update_config(config, wechat=dict(config.get_config()["wechat"], credentials=credentials))
+    queue = JobQueue(str(tmp_path / "jobs.db"))
+    calls = []
+    states = {}
+    lock = threading.Lock()
+
+    def fake_run(credential, stop_event, ui_mode, resume_run_id, on_publish=None):
+        with lock:
+            calls.append((credential["appid"], resume_run_id))
+        if credential["appid"] == "appid1":
+            return {"success": False, "result": "发布失败"}
+        on_publish()
+        states[credential["appid"]] = queue.get(ok).state
+        return {"success": True, "result": "成功发布文章到微信公众号"}
+
+    monkeypatch.setattr(crew_main, "run_credential", fake_run)
+    ok = queue.enqueue("appid0")
+    failing = queue.enqueue("appid1", max_attempts=2)
+    removed = queue.enqueue("appid9")
+
+    Worker(queue, concurrency=2, retry_delay=0, poll_interval=0.1).run(drain=True)
+
+    assert (queue.get(ok).state, queue.get(ok).result) == (DONE, "成功发布文章到微信公众号")
+    assert states == {"appid0": PUBLISHING}
+    # 失败的任务重试到最大次数，每次都在同一个运行目录中继续
+    job = queue.get(failing)
+    assert (job.state, job.attempts) == (FAILED, 2)
+    assert calls.count(("appid1", job.run_id)) == 2
+    # 公众号已删除的任务不再重试
+    job = queue.get(removed)
+    assert (job.state, job.attempts, job.result) == (FAILED, 1, "公众号未配置或已删除")
@@ -0,0 +1,82 @@
+import os
+import sys
+
+from src.ai_auto_wxgzh.utils import utils
+from src.ai_auto_wxgzh.utils import workspace
+from src.ai_auto_wxgzh.utils.workspace import RunWorkspace
+
+
+def test_runs_are_isolated(project_dir):
+    first, second = RunWorkspace(), RunWorkspace()
+
+    assert first.run_id != second.run_id
+    assert first.path == str(project_dir / "runs" / first.run_id)
+    assert os.path.isdir(first.image_dir)
+    assert first.tmp_article != second.tmp_article
+    assert os.path.dirname(first.final_article) == first.path
+
+
+def test_meta_is_merged(project_dir):
+    run = RunWorkspace()
+    run.write_meta(status="running", topic="话题A")
+    meta = run.write_meta(status="done")
+
+    assert meta["run_id"] == run.run_id
+    assert (meta["status"], meta["topic"]) == ("done", "话题A")
+    assert RunWorkspace(run.run_id).read_meta() == meta
+
+
+def test_checkpoints_survive_reopening(project_dir):
+    run = RunWorkspace()
+    assert run.read_checkpoint("write_content") is None
+    assert run.read_checkpoint("cover", default="") == ""
+
+    run.write_checkpoint("write_content", "文章")
+    run.write_checkpoint("cover", {"media_id": "m1"})
+    # --resume 时按运行ID重新打开同一个工作目录
+    resumed = RunWorkspace(run.run_id)
+    assert resumed.path == run.path
+    assert resumed.read_checkpoint("write_content") == "文章"
+    assert resumed.read_checkpoint("cover") == {"media_id": "m1"}
+
+
+def test_run_exists_and_list_runs(project_dir):
+    assert workspace.list_runs() == []
+    done, failed = RunWorkspace(), RunWorkspace()
+    done.write_meta(status="done")
+    failed.write_meta(status="failed")
+    unstarted = RunWorkspace()  # 任务队列预先分配、还没有开始的运行没有元数据
+
+    assert workspace.run_exists(done.run_id)
+    assert not workspace.run_exists(unstarted.run_id)
+    assert not workspace.run_exists("")
+    assert not workspace.run_exists(None)
+    runs = {meta["run_id"] for meta in workspace.list_runs()}
+    assert runs == {done.run_id, failed.run_id}
+    assert [meta["run_id"] for meta in workspace.list_runs("failed")] == [failed.run_id]
+
+
+def test_output_file_is_relative_to_current_dir(project_dir, monkeypatch):
+    run = RunWorkspace()
+    monkeypatch.chdir(project_dir)
+    assert run.output_file("tmp_article.html") == f"runs/{run.run_id}/tmp_article.html"
+
+    # 工作目录不在当前目录下时使用绝对路径
+    monkeypatch.chdir(project_dir / "runs" / run.run_id / "image")
+    assert run.output_file("tmp_article.html") == run.tmp_article
+
+
+def test_data_dir_is_next_to_executable_when_frozen(tmp_path, monkeypatch):
+    # 打包后 _MEIPASS 是临时解压目录，数据保存在可执行文件所在目录
+    monkeypatch.setattr(sys, "frozen", True, raising=False)
+    monkeypatch.setattr(sys, "_MEIPASS", str(tmp_path / "_MEI12345"), raising=False)
+    monkeypatch.setattr(sys, "executable", str(tmp_path / "app" / "AIWriter.exe"))
+
+    assert utils.get_data_dir() == str(tmp_path / "app")
+    assert utils.get_data_dir("jobs") == str(tmp_path / "app" / "jobs")
+    assert utils.get_cache_path("hotnews.json") == str(tmp_path / "app" / "cache" / "hotnews.json")
+    assert RunWorkspace().path.startswith(str(tmp_path / "app" / "runs"))
+
+
+def test_data_dir_is_project_root_from_source():
+    assert utils.get_data_dir() == os.path.normpath(utils.get_current_dir())
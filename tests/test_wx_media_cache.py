@@ -0,0 +1,128 @@
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from src.ai_auto_wxgzh.tools import wx_media_cache
+from src.ai_auto_wxgzh.tools.wx_media_cache import MediaCache
+from src.ai_auto_wxgzh.utils import utils
+from conftest import update_config
+
+
+class Clock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, days):
+        self.now += days * 86400
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(wx_media_cache, "time", SimpleNamespace(time=clock))
+    return clock
+
+
+@pytest.fixture
+def cache_file(tmp_path):
+    return str(tmp_path / "wx_media.json")
+
+
+def test_get_returns_uploaded_media_per_appid(clock, cache_file):
+    cache = MediaCache(cache_file)
+    cache.put("appid0", "sha_a", "media_a", "http://mmbiz.qpic.cn/a.png", path="/img/a.png")
+
+    assert cache.get("appid0", "sha_a") == ("media_a", "http://mmbiz.qpic.cn/a.png")
+    assert cache.get("appid1", "sha_a") is None  # 素材属于公众号，不能跨公众号使用
+    assert cache.get("appid0", "sha_b") is None
+    assert MediaCache(cache_file).get("appid0", "sha_a") == (
+        "media_a",
+        "http://mmbiz.qpic.cn/a.png",
+    )
+
+
+def test_entries_expire_and_last_used_is_persisted(clock, cache_file):
+    cache = MediaCache(cache_file, ttl_days=30)
+    cache.put("appid0", "sha_a", "media_a", "url_a")
+
+    clock.advance(20)
+    assert cache.get("appid0", "sha_a") is not None
+    # 命中时更新的最近使用时间已保存，重启后从该时间开始计算过期
+    assert utils.load_json(cache_file, {})["appid0:sha_a"]["last_used"] == clock.now
+    clock.advance(20)
+    assert MediaCache(cache_file, ttl_days=30).get("appid0", "sha_a") is not None
+
+    clock.advance(31)
+    assert cache.get("appid0", "sha_a") is None
+
+
+def test_least_recently_used_entries_are_evicted(clock, cache_file, tmp_path):
+    cache = MediaCache(cache_file, max_entries=2)
+    for name in "abc":
+        cache.put("appid0", f"sha_{name}", f"media_{name}", f"url_{name}")
+        clock.advance(2)
+    assert cache.get("appid0", "sha_a") is None  # 最久未使用，已被淘汰
+
+    cache = MediaCache(str(tmp_path / "lru.json"), max_entries=2)
+    cache.put("appid0", "sha_a", "media_a", "url_a")
+    clock.advance(2)
+    cache.put("appid0", "sha_b", "media_b", "url_b")
+    clock.advance(2)
+    cache.get("appid0", "sha_a")  # 命中后 a 成为最近使用的记录
+    cache.put("appid0", "sha_c", "media_c", "url_c")
+
+    assert set(utils.load_json(cache.cache_file, {})) == {"appid0:sha_a", "appid0:sha_c"}
+
+
+def test_concurrent_saves_keep_entries_of_other_processes(cache_file):
+    # 多个实例共用一个缓存文件，相当于界面、worker、定时任务等不同进程
+    caches = [MediaCache(cache_file) for _ in range(4)]
+
+    def put_all(index, cache):
+        for i in range(10):
+            cache.put("appid0", f"sha_{index}_{i}", f"media_{index}_{i}", "url")
+
+    threads = [
+        threading.Thread(target=put_all, args=(index, cache)) for index, cache in enumerate(caches)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(utils.load_json(cache_file, {})) == 40
+    assert MediaCache(cache_file).get("appid0", "sha_3_9") == ("media_3_9", "url")
+
+
+def test_invalidate_removes_only_deleted_media(cache_file):
+    cache = MediaCache(cache_file)
+    other = MediaCache(cache_file)
+    cache.put("appid0", "sha_a", "media_a", "url_a", path="/img/a.png")
+    cache.put("appid1", "sha_a", "media_a", "url_a")
+
+    removed = cache.invalidate("appid0", "media_a")
+
+    assert [entry["path"] for entry in removed] == ["/img/a.png"]
+    assert cache.invalidate("appid0", "media_a") == []
+    assert cache.get("appid0", "sha_a") is None
+    assert cache.get("appid1", "sha_a") == ("media_a", "url_a")
+
+    # 其他进程已重新上传（media_id 不同），该进程之后的删除不影响新的记录
+    other.put("appid0", "sha_a", "media_a2", "url_a2")
+    other.invalidate("appid0", "media_a")
+    assert MediaCache(cache_file).get("appid0", "sha_a") == ("media_a2", "url_a2")
+
+
+def test_get_cache_respects_config(config, project_dir, monkeypatch):
+    monkeypatch.setattr(wx_media_cache, "_cache", None)
+    update_config(config, wechat=dict(config.get_config()["wechat"], media_cache=False))
+    assert wx_media_cache.get_cache() is None
+
+    update_config(config, wechat=dict(config.get_config()["wechat"], media_cache=True))
+    cache = wx_media_cache.get_cache()
+    assert wx_media_cache.get_cache() is cache
+    assert cache.cache_file.startswith(str(project_dir))
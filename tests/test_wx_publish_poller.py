@@ -0,0 +1,205 @@
+import pytest
+
+from src.ai_auto_wxgzh import crew_main
+from src.ai_auto_wxgzh.tools import wx_publish_poller
+from src.ai_auto_wxgzh.tools.wx_publish_poller import PublishPoller
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class MaxJitter:
+    """随机抖动总是取上限，退避时间可预测"""
+
+    def __init__(self):
+        self.ranges = []
+
+    def uniform(self, low, high):
+        self.ranges.append((low, high))
+        return high
+
+
+class FakePublisher:
+    """按顺序返回预设的查询结果，结果为异常时抛出"""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.calls = []
+
+    def get_publish_status(self, publish_id):
+        self.calls.append(publish_id)
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def poller(clock):
+    return PublishPoller(
+        initial_delay=2, max_delay=60, timeout=600, clock=clock, rng=MaxJitter(), background=False
+    )
+
+
+def run_until_done(poller, clock, step=1):
+    """按 step 秒推进时钟并查询到期的发布，返回每次查询时的时间"""
+    polled_at = []
+    while poller.pending():
+        clock.now += step
+        polled_at += [clock.now] * poller.poll_due()
+    return polled_at
+
+
+def test_success_reports_article_url(poller, clock):
+    publisher = FakePublisher((wx_publish_poller.PUBLISH_SUCCESS, "https://mp.weixin.qq.com/s/x"))
+    results = []
+
+    poller.submit(publisher, "pid", lambda *result: results.append(result))
+
+    assert poller.poll_due() == 0  # initial_delay 之后才第一次查询
+    assert run_until_done(poller, clock) == [1002]
+    assert results == [("https://mp.weixin.qq.com/s/x", wx_publish_poller.PUBLISH_SUCCESS)]
+    assert publisher.calls == ["pid"]
+
+
+def test_publishing_is_polled_with_exponential_backoff(poller, clock):
+    publishing = (wx_publish_poller.PUBLISHING, None)
+    publisher = FakePublisher(*[publishing] * 7, (wx_publish_poller.PUBLISH_SUCCESS, "url"))
+    results = []
+
+    poller.submit(publisher, "pid", lambda *result: results.append(result))
+
+    polled_at = run_until_done(poller, clock)
+    # 第1次在 initial_delay 后，之后间隔按 2 * 2^n 增长（取抖动上限），最多 max_delay
+    assert [b - a for a, b in zip(polled_at, polled_at[1:])] == [4, 8, 16, 32, 60, 60, 60]
+    assert poller._rng.ranges[:2] == [(2, 4), (4, 8)]
+    assert poller._rng.ranges[-1] == (30, 60)
+    assert results == [("url", wx_publish_poller.PUBLISH_SUCCESS)]
+
+
+def test_jitter_spreads_retries(clock):
+    poller = PublishPoller(initial_delay=2, max_delay=60, clock=clock, background=False)
+
+    delays = [poller._backoff(3) for _ in range(200)]
+
+    assert all(8 <= delay <= 16 for delay in delays)
+    assert len(set(delays)) > 1
+    assert all(30 <= poller._backoff(10) <= 60 for _ in range(20))
+
+
+@pytest.mark.parametrize(
+    "status",
+    [
+        wx_publish_poller.PUBLISH_ORIGINAL_FAILED,
+        wx_publish_poller.PUBLISH_FAILED,
+        wx_publish_poller.PUBLISH_AUDIT_REJECTED,
+        wx_publish_poller.PUBLISH_DELETED,
+        wx_publish_poller.PUBLISH_BANNED,
+    ],
+)
+def test_failed_status_stops_polling(poller, clock, status, capsys):
+    publisher = FakePublisher((status, "https://mp.weixin.qq.com/s/x"))
+    results = []
+
+    poller.submit(publisher, "pid", lambda *result: results.append(result))
+    run_until_done(poller, clock)
+
+    # 发布失败时不使用返回的链接
+    assert results == [(None, status)]
+    assert len(publisher.calls) == 1
+    assert wx_publish_poller.STATUS_TEXT[status] in capsys.readouterr().out
+
+
+def test_errors_are_retried(poller, clock):
+    publisher = FakePublisher(
+        RuntimeError("网络错误"), (None, None), (wx_publish_poller.PUBLISH_SUCCESS, "url")
+    )
+    results = []
+
+    poller.submit(publisher, "pid", lambda *result: results.append(result))
+    run_until_done(poller, clock)
+
+    assert results == [("url", wx_publish_poller.PUBLISH_SUCCESS)]
+    assert len(publisher.calls) == 3
+
+
+def test_gives_up_after_timeout(poller, clock):
+    publisher = FakePublisher((wx_publish_poller.PUBLISHING, None))
+    results = []
+
+    poller.submit(publisher, "pid", lambda *result: results.append(result))
+    polled_at = run_until_done(poller, clock)
+
+    assert results == [(None, wx_publish_poller.PUBLISHING)]
+    # 超过 600 秒后的第一次查询仍是发布中，不再查询
+    assert polled_at[-2] < 1000 + 600 <= polled_at[-1]
+
+
+def test_callback_errors_do_not_stop_polling(poller, clock):
+    def fail(article_url, status):
+        raise RuntimeError("添加菜单失败")
+
+    results = []
+    poller.submit(FakePublisher((wx_publish_poller.PUBLISH_SUCCESS, "a")), "a", fail)
+    poller.submit(
+        FakePublisher((wx_publish_poller.PUBLISH_SUCCESS, "b")),
+        "b",
+        lambda *result: results.append(result),
+    )
+    run_until_done(poller, clock)
+
+    assert results == [("b", wx_publish_poller.PUBLISH_SUCCESS)]
+    assert poller.pending() == 0
+
+
+def test_wait_idle_with_background_thread():
+    poller = PublishPoller(initial_delay=0.05, max_delay=0.1, timeout=1)
+    publishing = (wx_publish_poller.PUBLISHING, None)
+    publishers = [
+        FakePublisher(*[publishing] * count, (wx_publish_poller.PUBLISH_SUCCESS, "url"))
+        for count in range(3)
+    ]
+    for index, publisher in enumerate(publishers):
+        poller.submit(publisher, str(index))
+
+    assert poller.pending() == 3
+    assert poller.wait_idle(5)
+    assert poller.pending() == 0
+    assert [len(publisher.calls) for publisher in publishers] == [1, 2, 3]
+
+    poller.submit(FakePublisher(publishing), "slow")
+    assert not poller.wait_idle(0.1)
+    assert poller.pending() == 1
+
+
+def test_wait_publish_results_reports_progress_and_timeout(monkeypatch, capsys):
+    poller = PublishPoller(initial_delay=0.05, max_delay=0.05, timeout=1)
+    monkeypatch.setattr(wx_publish_poller, "_poller", poller)
+    assert crew_main.wait_publish_results(timeout=1)
+
+    poller.submit(FakePublisher((wx_publish_poller.PUBLISHING, None)), "slow")
+
+    assert not crew_main.wait_publish_results(timeout=0.3, interval=0.1)
+    output = capsys.readouterr().out
+    assert "等待 1 篇文章的发布结果（最多 0.3 秒）" in output
+    assert output.count("还有 1 篇文章等待发布结果") >= 2
+    assert "等待发布结果超时，1 篇文章可稍后在公众号后台查看" in output
+
+
+def test_wait_publish_results_returns_when_done(monkeypatch):
+    poller = PublishPoller(initial_delay=0.05)
+    monkeypatch.setattr(wx_publish_poller, "_poller", poller)
+    poller.submit(FakePublisher((wx_publish_poller.PUBLISH_SUCCESS, "url")), "pid")
+
+    assert crew_main.wait_publish_results(timeout=5, interval=0.1)
+    assert poller.pending() == 0
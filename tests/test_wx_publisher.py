@@ -0,0 +1,150 @@
+import os
+import re
+
+import pytest
+
+from src.ai_auto_wxgzh.tools import wx_media_cache
+from src.ai_auto_wxgzh.tools.wx_media_cache import MediaCache
+from src.ai_auto_wxgzh.tools.wx_publisher import WeixinPublisher
+from src.ai_auto_wxgzh.utils import utils
+from conftest import PNG
+
+
+@pytest.fixture
+def media_cache(tmp_path, monkeypatch):
+    cache = MediaCache(str(tmp_path / "wx_media.json"))
+    monkeypatch.setattr(wx_media_cache, "_cache", cache)
+    return cache
+
+
+@pytest.mark.parametrize(
+    "head, mime_type, file_ext",
+    [
+        (b"\x89PNG\r\n\x1a\n", "image/png", ".png"),
+        (b"\xff\xd8\xff\xe0\x00\x10JFIF", "image/jpeg", ".jpg"),
+        (b"GIF87a", "image/gif", ".gif"),
+        (b"GIF89a", "image/gif", ".gif"),
+        (b"RIFF\x24\x00\x00\x00WEBPVP8 ", "image/webp", ".webp"),
+        (b"BM", "image/bmp", ".bmp"),
+        (b"RIFF\x24\x00\x00\x00WAVEfmt ", None, None),
+        (b"<html>", None, None),
+        (b"", None, None),
+    ],
+)
+def test_sniff_image_type(tmp_path, head, mime_type, file_ext):
+    path = tmp_path / "image.jpg"  # 扩展名不影响判断
+    path.write_bytes(head + b"\x00" * 32 if head else b"")
+
+    assert utils.sniff_image_type(str(path)) == (mime_type, file_ext)
+
+
+def uploaded_part(wechat, index=0):
+    """解析上传素材请求，返回 (请求头, 文件名, 文件类型, 文件内容)"""
+    headers, body = wechat["materials"][index]
+    boundary = headers["Content-Type"].split("boundary=")[1].encode()
+    match = re.match(
+        rb'--%s\r\nContent-Disposition: form-data; name="media"; filename="(.+)"\r\n'
+        rb"Content-Type: (.+)\r\n\r\n(.*)\r\n--%s--\r\n$" % (boundary, boundary),
+        body,
+        re.S,
+    )
+    return headers, match.group(1).decode(), match.group(2).decode(), match.group(3)
+
+
+def test_upload_image_downloads_to_disk_and_streams_body(wechat, publisher, tmp_path):
+    media = publisher.upload_image(f"{wechat['base_url']}/img/a.png")
+
+    assert media == ("media_a_1", "http://mmbiz.qpic.cn/a.png")
+    # 网络图片先保存到图片目录，再从磁盘上传
+    (file_name,) = os.listdir(tmp_path)
+    assert (tmp_path / file_name).read_bytes() == PNG + b"a"
+
+    headers, upload_name, mime_type, content = uploaded_part(wechat)
+    # 下载的文件后缀是.jpg，按文件头改为实际类型，微信按后缀校验图片格式
+    assert upload_name == os.path.splitext(file_name)[0] + ".png"
+    assert mime_type == "image/png"
+    assert content == PNG + b"a"
+    assert headers["Content-Length"] == str(len(wechat["materials"][0][1]))
+    assert "Transfer-Encoding" not in headers
+
+
+def test_upload_image_falls_back_to_extension(wechat, publisher, tmp_path):
+    path = tmp_path / "unknown.gif"
+    path.write_bytes(b"\x00" * 64 + b"unknown")
+
+    assert publisher.upload_image(str(path))[0] == "media_unknown_1"
+    _, upload_name, mime_type, _ = uploaded_part(wechat)
+    assert (upload_name, mime_type) == ("unknown.gif", "image/gif")
+
+
+def test_upload_image_failures(wechat, publisher, tmp_path):
+    base_url = wechat["base_url"]
+
+    assert publisher.upload_image(f"{base_url}/img/missing.png") is None
+    assert publisher.upload_image(str(tmp_path / "missing.png")) is None
+    assert publisher.upload_image(f"{base_url}/img/bad.png") is None  # 微信返回错误码
+    assert wechat["uploaded"] == []
+    # 没有图片时使用默认封面
+    assert publisher.upload_image(None)[1] is None
+
+
+def test_upload_image_looks_up_cache_by_content(wechat, publisher, media_cache, tmp_path):
+    publisher.upload_image(f"{wechat['base_url']}/img/a.png")
+    # 内容相同、路径不同的本地图片
+    path = tmp_path / "copy.png"
+    path.write_bytes(PNG + b"a")
+    other = tmp_path / "other.png"
+    other.write_bytes(PNG + b"b")
+
+    assert publisher.upload_image(str(path)) == ("media_a_1", "http://mmbiz.qpic.cn/a.png")
+    assert publisher.upload_image(str(other))[0] == "media_b_2"
+    assert wechat["uploaded"] == ["a", "b"]
+    digest = wx_media_cache.file_digest(str(path))
+    assert media_cache.get("appid0", digest) == ("media_a_1", "http://mmbiz.qpic.cn/a.png")
+
+
+def test_upload_image_reuses_cached_media(wechat, publisher, media_cache, tmp_path):
+    url = f"{wechat['base_url']}/img/a.png"
+
+    first = publisher.upload_image(url)
+    # 其他公众号实例（包括其他进程）上传相同内容的图片时直接使用缓存
+    other = WeixinPublisher("appid0", "secret", "作者", None, None, None, str(tmp_path))
+    second = other.upload_image(url)
+
+    assert first == second == ("media_a_1", "http://mmbiz.qpic.cn/a.png")
+    assert wechat["uploaded"] == ["a"]
+    assert publisher.upload_image(url, use_cache=False)[0] == "media_a_2"
+
+
+def test_cached_media_is_not_shared_between_appids(wechat, publisher, media_cache, tmp_path):
+    url = f"{wechat['base_url']}/img/a.png"
+    publisher.upload_image(url)
+
+    other = WeixinPublisher("appid1", "secret", "作者", None, None, None, str(tmp_path))
+    assert other.upload_image(url)[0] == "media_a_2"
+    assert wechat["uploaded"] == ["a", "a"]
+
+
+def test_invalid_cover_from_checkpoint_is_reuploaded(wechat, publisher, media_cache, tmp_path):
+    media_id, _ = publisher.upload_image(f"{wechat['base_url']}/img/a.png")
+    wechat["deleted"].add(media_id)  # 素材在微信后台被删除
+
+    # --resume 时是新的实例（可能是其他进程），封面 media_id 来自检查点
+    resumed = WeixinPublisher("appid0", "secret", "作者", None, None, None, str(tmp_path))
+    draft = resumed.add_draft("<p>正文</p>", "标题", "摘要", media_id)
+
+    assert draft.publishId == "draft_2"
+    assert wechat["drafts"] == [media_id, "media_a_2"]
+    assert wechat["uploaded"] == ["a", "a"]
+    assert resumed.current_media_id(media_id) == "media_a_2"
+    # 缓存文件中失效的记录已替换为新的素材
+    entries = utils.load_json(media_cache.cache_file, {})
+    assert [entry["media_id"] for entry in entries.values()] == ["media_a_2"]
+
+
+def test_invalid_media_without_source_fails(wechat, publisher, media_cache):
+    wechat["deleted"].add("media_unknown")
+
+    assert publisher.add_draft("<p>正文</p>", "标题", "摘要", "media_unknown") is None
+    assert wechat["drafts"] == ["media_unknown"]
+    assert wechat["uploaded"] == []
@@ -0,0 +1,143 @@
+import json
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from src.ai_auto_wxgzh.tools import wx_token
+from src.ai_auto_wxgzh.tools.wx_token import AccessTokenStore
+from conftest import update_config
+
+
+@pytest.fixture
+def token_api(http_server):
+    """模拟微信获取 access_token 的接口，每次返回新的 token，记录请求的 appid"""
+    requests = []
+    lock = threading.Lock()
+    response = {"expires_in": 7200}
+
+    def token(handler):
+        query = parse_qs(urlparse(handler.path).query)
+        time.sleep(0.1)
+        with lock:
+            requests.append(query["appid"][0])
+            count = len(requests)
+        if query["secret"][0] != "secret":
+            data = {"errcode": 40125, "errmsg": "invalid appsecret"}
+        else:
+            data = dict(response, access_token=f"token{count}")
+        return 200, json.dumps(data).encode(), "application/json"
+
+    url = http_server({"/cgi-bin/token": token}) + "/cgi-bin/token"
+    return url, requests, response
+
+
+def make_store(token_api, cache_file=None, margin=60):
+    store = AccessTokenStore(cache_file, margin=margin)
+    store.TOKEN_URL = token_api[0]
+    return store
+
+
+def run_threads(target, count):
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(target())) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_gets_fetch_token_once(token_api):
+    store = make_store(token_api)
+
+    results = run_threads(lambda: store.get("appid0", "secret"), 10)
+
+    assert results == ["token1"] * 10
+    assert token_api[1] == ["appid0"]
+    assert store.get("appid0", "secret") == "token1"
+
+
+def test_tokens_are_kept_per_appid(token_api):
+    store = make_store(token_api)
+
+    appids = iter(["appid0", "appid1"] * 3)
+    lock = threading.Lock()
+
+    def get():
+        with lock:
+            appid = next(appids)
+        return appid, store.get(appid, "secret")
+
+    results = run_threads(get, 6)
+
+    assert sorted(token_api[1]) == ["appid0", "appid1"]
+    assert len(set(results)) == 2
+    assert {token for _, token in results} == {"token1", "token2"}
+
+
+def test_token_close_to_expiry_is_refetched(token_api):
+    store = make_store(token_api, margin=60)
+    token_api[2]["expires_in"] = 30
+
+    assert store.get("appid0", "secret") == "token1"
+    assert store.get("appid0", "secret") == "token2"
+
+
+def test_failed_fetch_returns_none_and_is_not_cached(token_api):
+    store = make_store(token_api)
+
+    assert store.get("appid0", "wrong") is None
+    assert store.get("appid0", "secret") == "token2"
+
+
+def test_invalidate_only_drops_matching_token(token_api):
+    store = make_store(token_api)
+    store.get("appid0", "secret")
+
+    store.invalidate("appid0", "token0")
+    assert store.get("appid0", "secret") == "token1"
+
+    store.invalidate("appid0", "token1")
+    assert store.get("appid0", "secret") == "token2"
+    assert len(token_api[1]) == 2
+
+
+def test_disk_cache_is_shared_between_stores(token_api, tmp_path):
+    cache_file = str(tmp_path / "wx_tokens.json")
+    # 每个 store 相当于一个进程（界面、worker、定时任务），通过文件锁互斥
+    stores = [make_store(token_api, cache_file) for _ in range(4)]
+    next_store = iter(stores * 2)
+    lock = threading.Lock()
+
+    def get():
+        with lock:
+            store = next(next_store)
+        return store.get("appid0", "secret")
+
+    assert run_threads(get, 8) == ["token1"] * 8
+    assert make_store(token_api, cache_file).get("appid0", "secret") == "token1"
+    assert token_api[1] == ["appid0"]
+
+
+def test_invalidate_clears_disk_cache(token_api, tmp_path):
+    cache_file = str(tmp_path / "wx_tokens.json")
+    store = make_store(token_api, cache_file)
+    store.get("appid0", "secret")
+    store.get("appid1", "secret")
+
+    store.invalidate("appid0")
+
+    restarted = make_store(token_api, cache_file)
+    assert restarted.get("appid1", "secret") == "token2"
+    assert restarted.get("appid0", "secret") == "token3"
+
+
+def test_get_store_respects_config(config, project_dir, monkeypatch):
+    monkeypatch.setattr(wx_token, "_store", None)
+    update_config(config, wechat=dict(config.get_config()["wechat"], token_disk_cache=False))
+
+    store = wx_token.get_store()
+    assert wx_token.get_store() is store
+    assert store.cache_file is None